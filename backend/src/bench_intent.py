@@ -0,0 +1,98 @@
+"""
+Intent classifier against the rule cascade.
+
+    python bench_intent.py [--queries dataset/eval_queries.json] [--repeat 200]
+
+Labels every eval query, plus the classifier's held-out training examples,
+three ways:
+
+    rules       Controller.analyze_query without a classifier
+    classifier  the trained model alone (argmax, no fallback)
+    combined    what the pipeline runs: the model, rules below min_confidence
+
+and prints accuracy and the mean time per query. The query embedding is
+timed separately: the pipeline computes it for the vector search anyway,
+so "classifier" and "combined" reuse it while "rules" may embed again in
+its semantic fallback. Run train_intent.py first.
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from controller import Controller
+from inference import LocalEncoder
+from intent_classifier import IntentClassifier
+from train_intent import build_examples, load_config
+
+BASE_DIR = Path(__file__).parent
+QUERIES = BASE_DIR / "dataset" / "eval_queries.json"
+
+MODES = ('rules', 'classifier', 'combined')
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the intent classifier with the rules")
+    parser.add_argument("--queries", default=str(QUERIES))
+    parser.add_argument("--repeat", type=int, default=200, help="Timing repetitions per query")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Same split as train_intent.py")
+    parser.add_argument("--verbose", action="store_true", help="Print every disagreement")
+    args = parser.parse_args()
+
+    config = load_config()
+    encoder = LocalEncoder.from_config(config)
+    classifier = IntentClassifier.from_config(config, dim=encoder.dim)
+    if classifier is None:
+        raise SystemExit("No intent classifier model; run train_intent.py first")
+
+    lexicon = config.get('lexicon', {})
+    rules = Controller(config, encoder, lexicon=lexicon)
+    combined = Controller(config, encoder, lexicon=lexicon, classifier=classifier)
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        sets = {'eval': [(item['query'], item['intent']) for item in json.load(f)]}
+    examples, _ = build_examples(config)
+    split = int(len(examples) * (1 - args.holdout))
+    sets['held out'] = [(text, intent) for text, intent, _ in examples[split:]]
+
+    # (set, mode) -> [hits, total, microseconds]
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    embed_us = []
+    for name, items in sets.items():
+        for text, expected in items:
+            embedding, micros = timed(lambda: encoder.encode([text])[0], max(1, args.repeat // 20))
+            embed_us.append(micros)
+            unit = Controller._unit(embedding)
+            labels = {}
+            labels['rules'], micros_rules = timed(lambda: rules.analyze_query(text)['intent'], args.repeat)
+            labels['classifier'], micros_model = timed(lambda: classifier.predict(unit)[0], args.repeat)
+            labels['combined'], micros_both = timed(
+                lambda: combined.analyze_query(text, embedding=embedding)['intent'], args.repeat
+            )
+            for mode, micros in zip(MODES, (micros_rules, micros_model, micros_both)):
+                row = totals[(name, mode)]
+                row[0] += labels[mode] == expected
+                row[1] += 1
+                row[2] += micros
+            if args.verbose and len(set(labels.values()) | {expected}) > 1:
+                print(f"{text!r}: expected {expected}, {labels}")
+
+    print(f"\n{'set':<10}{'mode':<12}{'accuracy':>10}{'us/query':>12}")
+    for name in sets:
+        for mode in MODES:
+            hits, total, micros = totals[(name, mode)]
+            print(f"{name:<10}{mode:<12}{hits / total:>10.3f}{micros / total:>12.1f}")
+    print(f"\nquery embedding (shared with search): {sum(embed_us) / len(embed_us):.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compiled profanity filter against better_profanity.
+
+    python bench_profanity.py [--repeat 200] [--fuzz 5000]
+
+Times contains_profanity() and censor() on typical inputs (short queries,
+answer-length paragraphs, leetspeak and multi-word phrases) with both
+implementations loaded from the same config, and checks that they return
+the same thing on those inputs plus --fuzz random word salads.
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import yaml
+from better_profanity import Profanity
+
+from profanity_filter import ProfanityFilter, default_words
+
+CONFIG = Path(__file__).parent / "config" / "config.yaml"
+
+SAMPLES = {
+    'query': "Where can I go surfing in Puraran Beach this weekend?",
+    'tagalog': "Saan pwede mag-surf sa Catanduanes, at magkano ang bayad?",
+    'leet': "this place is sh1t and the f*cking tour guide was a b1tch",
+    'phrase': "some son of a bitch took my bull shit blow-job of a seat",
+    'answer': (
+        "Puraran Beach in Baras is famous for the Majestic wave, a right-hand "
+        "reef break that works best from August to October. Boards can be "
+        "rented near the resorts for around 500 pesos a day, and local guides "
+        "offer lessons for beginners. Binurong Point is a short drive away if "
+        "you want a hike with views of the Pacific. "
+    ) * 3,
+}
+
+FILLER = ["the", "beach", "Catanduanes", "a", "I", "of", "surf", "hell.", "Damn!", "class", "fuck's", "1", "cup"]
+SEPARATORS = [" ", "  ", "-", "_", ". ", ", ", "!", "\n"]
+
+
+def timed(fn, text, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def word_salad(rng, words):
+    parts = []
+    for _ in range(rng.randint(0, 9)):
+        word = rng.choice(FILLER) if rng.random() < 0.7 else rng.choice(words)
+        parts.append(rng.choice(SEPARATORS) + word)
+    return ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled profanity filter")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--fuzz", type=int, default=5000, help="Random texts to compare outputs on")
+    args = parser.parse_args()
+
+    with open(CONFIG, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    started = time.perf_counter()
+    reference = Profanity()
+    reference.add_censor_words(config['profanity'])
+    reference_load = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    compiled = ProfanityFilter.from_config(config)
+    compiled_load = (time.perf_counter() - started) * 1000
+    print(f"load: better_profanity {reference_load:.0f} ms, compiled {compiled_load:.0f} ms {compiled.stats()}")
+
+    print(f"\n{'input':<10}{'chars':>7}{'op':>10}{'better_profanity us':>22}{'compiled us':>14}{'speedup':>9}")
+    for name, text in SAMPLES.items():
+        assert reference.censor(text) == compiled.censor(text), name
+        for op in ('contains', 'censor'):
+            ref_fn = reference.contains_profanity if op == 'contains' else reference.censor
+            new_fn = compiled.contains_profanity if op == 'contains' else compiled.censor
+            ref_us = timed(ref_fn, text, max(1, args.repeat // 10))
+            new_us = timed(new_fn, text, args.repeat)
+            print(f"{name:<10}{len(text):>7}{op:>10}{ref_us:>22.1f}{new_us:>14.1f}{ref_us / new_us:>8.0f}x")
+
+    rng = random.Random(0)
+    words = default_words() + config['profanity']
+    mismatches = 0
+    for _ in range(args.fuzz):
+        text = word_salad(rng, words)
+        if reference.censor(text) != compiled.censor(text):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"[MISMATCH] {text!r}\n  {reference.censor(text)!r}\n  {compiled.censor(text)!r}")
+    print(f"\nfuzz: {args.fuzz - mismatches}/{args.fuzz} identical")
+
+
+if __name__ == "__main__":
+    main()
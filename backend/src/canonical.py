@@ -0,0 +1,207 @@
+import re
+import unicodedata
+
+from lexicon import merge_keywords
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Question words -> the question they ask; kept so "where" and "how" never share a key
+QUESTION_CLASSES = {
+    'where': ['where', 'saan', 'nasaan', 'hain', 'sain', 'saen'],
+    'how': ['how', 'paano', 'pano', 'papano'],
+    'what': ['what', 'ano', 'anong', 'which'],
+    'when': ['when', 'kailan', 'nuarin'],
+    'who': ['who', 'sino', 'siisay', 'sisay'],
+    'why': ['why', 'bakit', 'tano'],
+    'cost': ['how much', 'magkano', 'pira', 'ilan', 'price', 'cost'],
+}
+
+# Words that make the next place an origin or a destination ("from Virac to Baras")
+DIRECTION_WORDS = {
+    'from': 'from', 'mula': 'from', 'galing': 'from', 'hali': 'from',
+    'to': 'to', 'papunta': 'to', 'patungo': 'to', 'hanggang': 'to', 'pakadto': 'to',
+}
+
+# Function words that do not change what is being asked (negations stay in).
+# Activity verbs (do, go, get, stay, eat) are not here: "what can I do in
+# Puraran" asks something different from "what is Puraran"
+STOPWORDS = frozenset("""
+a about an and any are as at be can could does for from i in into
+is it me my of on or our please s should some tell that the there this to us we will
+with would you your
+ako ang ba baga daw din ito ka kami kayo ko lang mag maka may mayroon meron mga na
+nag ng nga pa pag po pwede puwede sa si tayo yung igwa digdi an kan
+""".split())
+
+# "do" before one of these is the auxiliary ("how do I get"), not the activity
+AUXILIARY_DO = ('do', frozenset(['i', 'we', 'you', 'they']))
+
+# Descriptors dropped from a place name to form its short alias ("Puraran Beach" -> "puraran")
+GENERIC_PLACE_WORDS = frozenset(['beach', 'falls', 'point', 'church', 'resort', 'inn', 'island', 'lagoon'])
+
+
+def fold(text):
+    """Lowercase, strip accents, punctuation to spaces, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(TOKEN_PATTERN.findall(text))
+
+
+def stem(word):
+    """Light English suffix stripping; the same word always gets the same stem"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 5 and word.endswith('ing'):
+        word = word[:-3]
+    elif len(word) > 4 and word.endswith('ed'):
+        word = word[:-2]
+    elif len(word) > 4 and word.endswith('es') and word[-3] in 'sxz':
+        return word[:-2]
+    elif len(word) > 4 and word.endswith('ches'):
+        return word[:-2]
+    elif len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    # swimming -> swimm -> swim
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        word = word[:-1]
+    return word
+
+
+# ============================================================================
+# QUERY CANONICALIZER
+# ============================================================================
+class QueryCanonicalizer:
+    """Maps differently worded questions to one cache key
+
+        "Where can I surf in Puraran?"     -> "place:puraran_beach surfing where"
+        "where to surf puraran"            -> "place:puraran_beach surfing where"
+        "saan pwede mag-surf sa Puraran"   -> "place:puraran_beach surfing where"
+
+    Steps: fold case, accents and punctuation; replace place names and
+    their short aliases with the gazetteer name; map question words to
+    the question they ask; drop English/Tagalog/Bikol function words;
+    stem; map keywords of the synonym topics (config keywords plus the
+    lexicon) to their topic; then sort and de-duplicate. A query with nothing left after
+    that keeps its folded text, so short distinct inputs do not collide.
+
+    Sorting loses word order, so a place right after a direction word
+    keeps it: "from Virac to Baras" -> "from:place:virac to:place:baras",
+    never the same key as the opposite route. Only a place directly after
+    the word counts; in "what is there to do in Puraran" the "to" belongs
+    to the verb.
+    """
+    def __init__(self, places, keywords, question_classes=QUESTION_CLASSES, stopwords=STOPWORDS,
+                 synonym_topics=None, other_places=(), place_aliases=None, direction_words=DIRECTION_WORDS):
+        self.stopwords = stopwords
+        self.directions = direction_words
+        self.questions = {}
+        phrases = {}
+        for name, words in question_classes.items():
+            for word in words:
+                if ' ' in word:
+                    phrases[word] = name
+                else:
+                    self.questions[word] = name
+
+        # Keywords of a synonym topic become the topic name: single words by
+        # token (and stem), phrases in the folded text. Topics that group
+        # related but different things (bank vs. hospital) are left out
+        self.synonyms = {}
+        for topic, words in keywords.items():
+            if synonym_topics is not None and topic not in synonym_topics:
+                continue
+            for word in words:
+                folded = fold(word)
+                if ' ' in folded:
+                    phrases[folded] = topic
+                elif folded:
+                    self.synonyms.setdefault(stem(folded), topic)
+                    self.synonyms.setdefault(folded, topic)
+
+        # Place names and aliases -> one token each. A short alias shared by
+        # two places is ambiguous, so only their full names count
+        aliases = {}
+        shorts = {}
+        for name in places:
+            folded = fold(name)
+            aliases[folded] = self._place_token(name)
+            short = ' '.join(word for word in folded.split() if word not in GENERIC_PLACE_WORDS)
+            if short and short != folded:
+                shorts.setdefault(short, set()).add(name)
+        for short, names in shorts.items():
+            if len(names) == 1 and short not in aliases:
+                aliases[short] = self._place_token(names.pop())
+        # Other known names (municipalities, protected spellings) keep their own token
+        for name in other_places:
+            aliases.setdefault(fold(name), self._place_token(name))
+        for alias, name in (place_aliases or {}).items():
+            aliases[fold(alias)] = self._place_token(name)
+
+        replacements = {**phrases, **aliases}
+        self.replacements = replacements
+        # Longest first so "majestic puraran beach resort" wins over "puraran"
+        self.pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(key) for key in sorted(replacements, key=len, reverse=True)) + r')\b'
+        ) if replacements else None
+
+    @staticmethod
+    def _place_token(name):
+        return 'place:' + fold(name).replace(' ', '_')
+
+    @classmethod
+    def from_config(cls, config):
+        canonical_conf = config.get('canonical', {})
+        return cls(
+            places=list(config.get('places', {})),
+            keywords=merge_keywords(config.get('keywords', {}), config.get('lexicon')),
+            synonym_topics=canonical_conf.get('synonym_topics'),
+            other_places=config.get('protected_places', []),
+            place_aliases=canonical_conf.get('place_aliases')
+        )
+
+    def canonicalize(self, text):
+        """Cache key for text"""
+        folded = fold(text)
+        if not folded:
+            return text.strip().lower()
+
+        # Phrases become "@<n>" placeholders (folded text has no "@") so
+        # their position relative to direction words survives
+        phrase_tokens = []
+        if self.pattern is not None:
+            def take(match):
+                phrase_tokens.append(self.replacements[match.group(1)])
+                return f' @{len(phrase_tokens) - 1} '
+            rest = self.pattern.sub(take, folded)
+        else:
+            rest = folded
+
+        tokens = set()
+        direction = None
+        words = rest.split()
+        auxiliary, subjects = AUXILIARY_DO
+        for index, word in enumerate(words):
+            if word.startswith('@'):
+                token = phrase_tokens[int(word[1:])]
+                if direction and token.startswith('place:'):
+                    token = f'{direction}:{token}'
+                tokens.add(token)
+                direction = None
+                continue
+            direction = self.directions.get(word)
+            if direction:
+                continue
+            if word in self.questions:
+                tokens.add(self.questions[word])
+                continue
+            if word in self.stopwords:
+                continue
+            if word == auxiliary and index + 1 < len(words) and words[index + 1] in subjects:
+                continue
+            if word in self.synonyms:
+                tokens.add(self.synonyms[word])
+                continue
+            stemmed = stem(word)
+            tokens.add(self.synonyms.get(stemmed, stemmed))
+
+        return ' '.join(sorted(tokens)) if tokens else folded
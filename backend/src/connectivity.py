@@ -0,0 +1,132 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from logger import get_logger
+
+log = get_logger("network")
+
+CONFIG = Path(__file__).parent / "config" / "config.yaml"
+
+
+# ============================================================================
+# CONNECTIVITY MONITOR
+# ============================================================================
+class ConnectivityMonitor:
+    """Background prober that keeps an up-to-date online/offline flag
+
+    A daemon thread requests internet.test_url every cache_duration seconds
+    (every retry_interval while offline, so recovery is noticed quickly).
+    Request paths only read `online`, so an offline Pi answers from local
+    data at once instead of waiting for each network call to time out.
+    Callers that see a network failure can report_failure() to flip the
+    flag and schedule an immediate re-probe.
+    """
+    def __init__(self, test_url="https://www.google.com", timeout=2, interval=60, retry_interval=10):
+        self.test_url = test_url
+        self.timeout = timeout
+        self.interval = interval
+        self.retry_interval = retry_interval
+
+        self.online = True
+        self.last_checked = None
+        self.last_change = time.time()
+        self.counters = {'probes': 0, 'failures': 0, 'reported_failures': 0, 'transitions': 0}
+
+        # DNS lookups ignore the HTTP timeout; the pool lets a probe be abandoned
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="connectivity")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        internet_conf = config.get('internet', {})
+        return cls(
+            test_url=internet_conf.get('test_url', "https://www.google.com"),
+            timeout=internet_conf.get('timeout', 2),
+            interval=internet_conf.get('cache_duration', 60),
+            retry_interval=internet_conf.get('retry_interval', 10)
+        )
+
+    def start(self):
+        """Probe once (bounded by timeout) so the first request sees real state, then keep probing"""
+        if self._thread is not None:
+            return
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="connectivity-monitor", daemon=True)
+        self._thread.start()
+        log.info("Connectivity monitor started", online=self.online, test_url=self.test_url)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval if self.online else self.retry_interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.check()
+
+    def _probe(self):
+        import httpx
+        # Any HTTP response at all means the network path works
+        httpx.head(self.test_url, timeout=self.timeout)
+        return True
+
+    def check(self):
+        """Probe now and update the flag; returns the new state"""
+        self.counters['probes'] += 1
+        try:
+            online = self._executor.submit(self._probe).result(timeout=self.timeout + 0.5)
+        except Exception:
+            # Timed out, no route, DNS failure...
+            online = False
+        if not online:
+            self.counters['failures'] += 1
+        self._set(online)
+        self.last_checked = time.time()
+        return online
+
+    def report_failure(self):
+        """A network call just failed: go offline now and re-probe soon"""
+        self.counters['reported_failures'] += 1
+        self._set(False)
+        self._wake.set()
+
+    def _set(self, online):
+        if online != self.online:
+            self.online = online
+            self.last_change = time.time()
+            self.counters['transitions'] += 1
+            log.warning("Connectivity changed", online=online)
+
+    def stats(self):
+        return {
+            'online': self.online,
+            'last_checked': round(time.time() - self.last_checked, 1) if self.last_checked else None,
+            'since_change': round(time.time() - self.last_change, 1),
+            **self.counters
+        }
+
+
+# One monitor per process, shared by the pipeline and the PDF routes
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor(config=None):
+    """The process-wide ConnectivityMonitor, started on first use"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            if config is None:
+                with open(CONFIG, 'r', encoding='utf-8') as f:
+                    config = yaml.safe_load(f)
+            _monitor = ConnectivityMonitor.from_config(config)
+            _monitor.start()
+        return _monitor
@@ -1,22 +1,35 @@
-from sentence_transformers import util
-import torch
+import numpy as np
+from lexicon import merge_keywords, merge_words
+from logger import get_logger
+
+log = get_logger("controller")
 
 class Controller:
-    def __init__(self, config, embedding_model):
-        self.greetings = [
-            'hi', 'hello', 'hey', 'kumusta', 'good morning', 
-            'good afternoon', 'good evening', 'musta', 'kamusta'
-        ]
-
-        self.question_indicator = [
-            'what', 'where', 'how', 'when', 'who', 'why', 'which',
-            'can', 'is', 'are', 'do', 'does', 'will', 'should',
-            'ano', 'saan', 'paano', 'kailan', 'sino', 'bakit',
-            'may', 'meron', 'pwede', 'gusto'
-        ]
-
-        self.tourism_keywords = config['keywords']
-        self.embedding_model = embedding_model
+    GREETINGS = [
+        'hi', 'hello', 'hey', 'kumusta', 'good morning', 
+        'good afternoon', 'good evening', 'musta', 'kamusta'
+    ]
+
+    QUESTION_INDICATORS = [
+        'what', 'where', 'how', 'when', 'who', 'why', 'which',
+        'can', 'is', 'are', 'do', 'does', 'will', 'should',
+        'ano', 'saan', 'paano', 'kailan', 'sino', 'bakit',
+        'may', 'meron', 'pwede', 'gusto'
+    ]
+
+    def __init__(self, config, encoder, lexicon=None, classifier=None):
+        self.greetings = list(self.GREETINGS)
+        self.question_indicator = list(self.QUESTION_INDICATORS)
+
+        # Untranslated (translation: off) queries also need the native vocabulary
+        if lexicon:
+            self.greetings = merge_words(self.greetings, lexicon.get('greetings'))
+            self.question_indicator = merge_words(self.question_indicator, lexicon.get('question_words'))
+        self.tourism_keywords = merge_keywords(config['keywords'], lexicon)
+        # LocalEncoder or InferenceClient: encode(texts) -> float32 array
+        self.encoder = encoder
+        # Trained IntentClassifier; the rules below are its low-confidence fallback
+        self.classifier = classifier
 
         # Setup semantic search
         self.keywords_topic = []
@@ -27,8 +40,14 @@ class Controller:
                 self.keywords_topic.append(topic)
                 all_kw_text.append(k)
 
-        print("Caching keyword embeddings...")
-        self.cached_kw_embeddings = self.embedding_model.encode(all_kw_text, convert_to_tensor=True)
+        log.info("Caching keyword embeddings", keywords=len(all_kw_text))
+        self.cached_kw_embeddings = self._unit(self.encoder.encode(all_kw_text))
+
+    @staticmethod
+    def _unit(vectors):
+        """Row-normalize so cosine similarity is a plain dot product"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
 
     def _is_gibberish(self, text):
         """Detect gibberish patterns"""
@@ -64,21 +83,29 @@ class Controller:
         
         return False
 
-    def check_semantic_match(self, user_input):
+    def check_semantic_match(self, user_input, embedding=None):
         """Semantic matching with higher threshold"""
-        query_embedding = self.embedding_model.encode(user_input, convert_to_tensor=True)
-        cosine_scores = util.cos_sim(query_embedding, self.cached_kw_embeddings)[0]
-        best_score, best_index = torch.max(cosine_scores, dim=0)
+        if embedding is None:
+            embedding = self.encoder.encode([user_input])[0]
+        query_embedding = self._unit(embedding)
+        cosine_scores = self.cached_kw_embeddings @ query_embedding
+        best_index = int(np.argmax(cosine_scores))
+        best_score = cosine_scores[best_index]
         
         # Raised threshold to reduce false positives
         if best_score > 0.7:  # Changed from 0.6
-            matched_topic = self.keywords_topic[best_index.item()]
-            print(f"[DEBUG] Semantic Match: '{user_input}' → '{matched_topic}' (Score: {best_score:.2f})")
+            matched_topic = self.keywords_topic[best_index]
+            log.debug("Semantic keyword match", topic=matched_topic, score=float(best_score))
             return True
         
         return False
 
-    def analyze_query(self, user_input):
+    def analyze_query(self, user_input, semantic=True, embedding=None):
+        """Classify a query: the trained classifier when confident, else the rules
+
+        embedding is the query's embedding if the caller already has one;
+        semantic=False skips the rules' embedding fallback.
+        """
         query_lower = user_input.lower().strip()
         words = query_lower.split()
 
@@ -91,6 +118,23 @@ class Controller:
                 "reason": "too_short"
             }
 
+        # Classifier on the query embedding: intent and topic in one pass
+        if self.classifier is not None and embedding is not None:
+            intent, confidence, topic, topic_confidence = self.classifier.predict(self._unit(embedding))
+            if confidence >= self.classifier.min_confidence:
+                analysis = {
+                    "intent": intent,
+                    "is_valid": intent != 'nonsense',
+                    "confidence": confidence,
+                    "reason": "classifier"
+                }
+                # The topic head only learned from tourism queries
+                if intent == 'tourism_query':
+                    analysis["topic"] = topic
+                    analysis["topic_confidence"] = topic_confidence
+                return analysis
+            log.debug("Classifier unsure, using rules", intent=intent, confidence=confidence)
+
         # Rule 1.5: Gibberish detection BEFORE semantic matching
         if self._is_gibberish(query_lower):
             return {
@@ -111,8 +155,8 @@ class Controller:
                 break
         
         # Semantic match as fallback (only for legitimate-looking text)
-        if not has_tourism_keyword and not self._is_gibberish(query_lower):
-            has_tourism_keyword = self.check_semantic_match(query_lower)
+        if semantic and not has_tourism_keyword and not self._is_gibberish(query_lower):
+            has_tourism_keyword = self.check_semantic_match(query_lower, embedding)
             
         # Rule 2: Greeting + Question
         if has_greeting and (has_question_word or has_tourism_keyword):
@@ -0,0 +1,51 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's budget ran out before the work it cannot skip"""
+    def __init__(self, stage):
+        super().__init__(f"Deadline exceeded before {stage}")
+        self.stage = stage
+
+
+# ============================================================================
+# REQUEST DEADLINE
+# ============================================================================
+class Deadline:
+    """Absolute time budget for one request, on the monotonic clock
+
+    Created when the request arrives and handed down through
+    Pipeline.ask, so time spent waiting for a pipeline thread counts
+    against it too. `reserve` seconds are kept back for the stages that
+    always run (search, answer assembly); optional stages may only spend
+    what is left beyond that.
+    """
+    def __init__(self, expires_at, reserve=0.0):
+        self.expires_at = expires_at
+        self.reserve = reserve
+
+    @classmethod
+    def after(cls, seconds, reserve=0.0):
+        """Deadline `seconds` from now, or None for no budget"""
+        if not seconds:
+            return None
+        return cls(time.monotonic() + seconds, reserve)
+
+    @classmethod
+    def from_config(cls, config):
+        deadline_conf = (config or {}).get('deadline', {})
+        return cls.after(deadline_conf.get('budget'), deadline_conf.get('reserve', 0.0))
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def spare(self):
+        """Seconds optional stages may still use"""
+        return max(0.0, self.remaining() - self.reserve)
+
+    def allows(self, seconds):
+        """True if an optional stage needing `seconds` fits in the spare budget"""
+        return self.spare() >= seconds
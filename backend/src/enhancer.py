@@ -0,0 +1,562 @@
+import asyncio
+import concurrent.futures
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from enhancer_backends import build_backends
+from metrics import REGISTRY
+from profanity_filter import ProfanityFilter
+from logger import get_logger
+
+log = get_logger("enhancer")
+
+
+# ============================================================================
+# BACKGROUND ENHANCER
+# ============================================================================
+class BackgroundEnhancer:
+    """Asyncio worker pool for answer enhancement
+
+    Runs its own event loop in a daemon thread so the synchronous Pipeline
+    can hand jobs over without blocking. The rewriting itself is delegated
+    to the first available backend (see enhancer_backends): by default
+    Gemini, falling back to the local llama.cpp model when there is no API
+    key or the network is down.
+
+    Jobs are keyed on the normalized query: a duplicate of a pending or
+    in-flight job is coalesced instead of queued again. Pending jobs are
+    served fresh misses first, then retries of raw cache hits, and within
+    each tier by how often the query has been asked.
+
+    Workers pack several pending jobs into one request, up to a token
+    budget, and fall back to single-job calls for anything the batch
+    response does not answer cleanly.
+
+    With a JobStore attached, every job is written through to disk and
+    leased before processing. Failed jobs are released for a later retry
+    instead of being lost, and the backlog is reloaded on start and polled
+    periodically, so restarts and network outages only delay enhancement.
+    """
+    TIER_FRESH = 0
+    TIER_RETRY = 1
+
+    def __init__(self, api_key, cache, config, job_store=None, backends=None, connectivity=None, profanity=None):
+        self.cache = cache
+        self.config = config
+        self.job_store = job_store
+        self.profanity = profanity or ProfanityFilter.from_config(config)
+        self.backends = backends if backends is not None else build_backends(config, api_key, connectivity)
+
+        enhancer_conf = config.get('enhancer', {})
+        self.num_workers = enhancer_conf.get('workers', 4)
+        self.job_deadline = enhancer_conf.get('job_deadline', 60)
+        self.stale_after = enhancer_conf.get('stale_after', 600)
+        self.max_queue = enhancer_conf.get('max_queue', 1000)
+        self.max_tracked_queries = enhancer_conf.get('max_tracked_queries', 10000)
+        self.batch_size = enhancer_conf.get('batch_size', 8)
+        self.batch_token_budget = enhancer_conf.get('batch_token_budget', 2000)
+        self.retry_delay = enhancer_conf.get('retry_delay', 60)
+        self.max_attempts = enhancer_conf.get('max_attempts', 5)
+        self.recover_interval = enhancer_conf.get('recover_interval', 30)
+        self.backend_poll = enhancer_conf.get('backend_poll', 5)
+
+        self.loop = None
+        self.job_queue = None
+        self.worker_thread = None
+        self.running = False
+        self._ready = threading.Event()
+        self._stop_event = None
+
+        # Scheduling state - only touched from the event loop thread
+        self.pending = {}
+        self.in_flight = set()
+        self.ask_counts = {}
+        self._seq = 0
+        self._waiters = {}
+        self._recent = OrderedDict()
+        self.counters = {
+            'enqueued': 0, 'coalesced': 0, 'dropped': 0, 'completed': 0,
+            'failed': 0, 'batches': 0, 'recovered': 0, 'spilled': 0, 'deferred': 0
+        }
+        self.backend_counts = {backend.name: 0 for backend in self.backends}
+
+    def start(self):
+        """Start the event loop thread and its workers"""
+        if self.worker_thread is not None:
+            log.warning("Already running")
+            return
+
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.worker_thread.start()
+        self._ready.wait(timeout=5)
+        names = ', '.join(backend.name for backend in self.backends)
+        log.info("Background workers started", workers=self.num_workers, backends=names)
+
+    def stop(self):
+        """Stop workers and close the HTTP client"""
+        self.running = False
+        if self.loop and self._stop_event:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+        if self.worker_thread:
+            self.worker_thread.join(timeout=5)
+        log.info("Background workers stopped")
+
+    def enqueue(self, query, raw_facts, raw_answer, retry=False, question=None):
+        """Add enhancement job to queue (safe to call from any thread)
+
+        query is the cache key the answer is stored under; question is the
+        user's wording, which the backends are prompted with (default: query).
+        retry marks a re-enqueue from a raw cache hit, which is scheduled
+        behind fresh cache misses.
+        """
+        if not self.running or self.loop is None:
+            log.warning("Not running, job dropped", query=query[:50])
+            return
+
+        now = time.time()
+        job = {
+            'query': query,
+            'question': question or query,
+            'raw_facts': raw_facts,
+            'raw_answer': raw_answer,
+            'timestamp': now,
+            'tier': self.TIER_RETRY if retry else self.TIER_FRESH
+        }
+        self.loop.call_soon_threadsafe(self._put, job)
+
+    def subscribe(self, query):
+        """Future resolved with the enhanced answer for query (None if it is not coming)
+
+        Call after enqueue() from the same thread: callbacks run in order on
+        the loop, so the job is already registered when the subscription is.
+        """
+        future = concurrent.futures.Future()
+        if not self.running or self.loop is None:
+            future.set_result(None)
+            return future
+        self.loop.call_soon_threadsafe(self._subscribe, query, future)
+        return future
+
+    def _subscribe(self, query, future):
+        if query in self._recent:
+            future.set_result(self._recent[query])
+        elif query in self.pending or query in self.in_flight:
+            self._waiters.setdefault(query, []).append(future)
+        else:
+            future.set_result(None)
+
+    def _notify(self, query, enhanced):
+        if enhanced:
+            # Covers a subscriber that arrives just after its job finished
+            self._recent[query] = enhanced
+            self._recent.move_to_end(query)
+            while len(self._recent) > 256:
+                self._recent.popitem(last=False)
+        for future in self._waiters.pop(query, []):
+            if not future.done():
+                future.set_result(enhanced)
+
+    def stats(self):
+        """Queue depth and coalescing counters"""
+        return {
+            'queue_depth': len(self.pending),
+            'in_flight': len(self.in_flight),
+            'durable': self.job_store is not None,
+            'backends': {
+                backend.name: {'available': backend.available(), 'completed': self.backend_counts[backend.name]}
+                for backend in self.backends
+            },
+            **self.counters
+        }
+
+    # ------------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------------
+    def _priority(self, job):
+        """Lower sorts first: tier, then log2 of how often the query was asked"""
+        asks = self.ask_counts.get(job['query'], 1)
+        return (job['tier'], -int(math.log2(asks)))
+
+    def _count_ask(self, key):
+        if key not in self.ask_counts and len(self.ask_counts) >= self.max_tracked_queries:
+            # Forget the least asked half rather than growing without bound
+            keep = sorted(self.ask_counts.items(), key=lambda kv: kv[1], reverse=True)
+            self.ask_counts = dict(keep[:self.max_tracked_queries // 2])
+        self.ask_counts[key] = self.ask_counts.get(key, 0) + 1
+
+    def _push(self, job):
+        self._seq += 1
+        job['seq'] = self._seq
+        job['priority'] = self._priority(job)
+        self.job_queue.put_nowait((job['priority'], job['seq'], job['query']))
+
+    def _put(self, job):
+        key = job['query']
+        self._count_ask(key)
+
+        if key in self.in_flight:
+            self.counters['coalesced'] += 1
+            return
+
+        existing = self.pending.get(key)
+        if existing is not None:
+            self.counters['coalesced'] += 1
+            if job['tier'] < existing['tier']:
+                # A fresh miss carries the real facts; prefer them over a retry's cached answer
+                existing['tier'] = job['tier']
+                existing['raw_facts'] = job['raw_facts']
+                self._persist(existing)
+            # Re-queue only when the job moves up; the old heap entry goes stale
+            if self._priority(existing) < existing['priority']:
+                self._push(existing)
+            return
+
+        if len(self.pending) >= self.max_queue:
+            if self._persist(job):
+                # Left on disk; the recovery poll loads it once the queue drains
+                self.counters['spilled'] += 1
+            else:
+                self.counters['dropped'] += 1
+                log.warning("Queue full, job dropped", max_queue=self.max_queue, query=key[:50])
+            return
+
+        self._persist(job)
+        self.pending[key] = job
+        self.counters['enqueued'] += 1
+        self._push(job)
+        log.debug("Job queued", query=key[:50], priority=job['priority'])
+
+    def _claim(self, entry):
+        """Move a heap entry's job to in-flight, or None if superseded or leased elsewhere"""
+        _, seq, key = entry
+        job = self.pending.get(key)
+        if job is None or job['seq'] != seq:
+            return None
+        del self.pending[key]
+
+        if self.job_store is not None:
+            try:
+                job['lease'] = self.job_store.claim(key)
+            except sqlite3.Error as e:
+                log.error("Job store claim failed", error=str(e))
+                job['lease'] = None
+            if job['lease'] is None:
+                # Another worker process holds it, or it is waiting out a retry delay
+                return None
+
+        job['attempts'] = job.get('attempts', 0) + 1
+        # Set once a backend call starts; until then the claim's attempt is refundable
+        job['sent'] = False
+        # Set when the job goes back for another try; its subscribers keep waiting
+        job['requeued'] = False
+        # The time limit runs from here, not from enqueue: waiting in a backlog costs nothing
+        job['deadline'] = time.time() + self.job_deadline
+        if job['attempts'] == 1:
+            # Queue lag: how long a fresh answer waited before enhancement began
+            REGISTRY.observe('pathfinder_stage_seconds', time.time() - job['timestamp'], stage='enhancer_queue')
+        self.in_flight.add(key)
+        return job
+
+    # ------------------------------------------------------------------------
+    # Durability
+    # ------------------------------------------------------------------------
+    def _persist(self, job):
+        if self.job_store is None:
+            return False
+        try:
+            self.job_store.put(job)
+            return True
+        except sqlite3.Error as e:
+            log.error("Job store write failed", error=str(e))
+            return False
+
+    def _complete(self, job):
+        """Remove a finished (or abandoned) job from the store"""
+        if self.job_store is not None and job.get('lease'):
+            try:
+                self.job_store.complete(job['query'], job['lease'])
+            except sqlite3.Error as e:
+                log.error("Job store complete failed", error=str(e))
+
+    def _retry_later(self, job):
+        """Hand a failed job back to the store for another attempt, or give up
+
+        Only a job that reached a backend has spent an attempt; one that
+        never got that far gets the claim's attempt back.
+        """
+        if self.job_store is None or not job.get('lease'):
+            return
+        if not job.get('sent'):
+            job['attempts'] -= 1
+            try:
+                self.job_store.release(job['query'], job['lease'], retry_in=self.retry_delay, refund=True)
+                job['requeued'] = True
+            except sqlite3.Error as e:
+                log.error("Job store release failed", error=str(e))
+            return
+        if job['attempts'] >= self.max_attempts:
+            self.counters['dropped'] += 1
+            log.warning("Giving up on job", attempts=job['attempts'], query=job['query'][:50])
+            self._complete(job)
+            return
+        try:
+            self.job_store.release(job['query'], job['lease'], retry_in=self.retry_delay)
+            job['requeued'] = True
+        except sqlite3.Error as e:
+            log.error("Job store release failed", error=str(e))
+
+    def _defer(self, job):
+        """Put back a job no backend could run, due now and without spending an attempt"""
+        self.counters['deferred'] += 1
+        job['attempts'] -= 1
+        job['requeued'] = True
+        if self.job_store is not None and job.get('lease'):
+            try:
+                self.job_store.release(job['query'], job['lease'], refund=True)
+            except sqlite3.Error as e:
+                log.error("Job store release failed", error=str(e))
+            job['lease'] = None
+        if job['query'] not in self.pending:
+            self.pending[job['query']] = job
+            self._push(job)
+        log.debug("No backend available, job deferred", query=job['query'][:50])
+
+    def _recover(self):
+        """Load due jobs from the store that are not already queued here"""
+        room = self.max_queue - len(self.pending)
+        if self.job_store is None or room <= 0:
+            return 0
+        try:
+            rows = self.job_store.ready(limit=room, exclude=set(self.pending) | self.in_flight)
+        except sqlite3.Error as e:
+            log.error("Job store read failed", error=str(e))
+            return 0
+
+        for row in rows:
+            job = {
+                'query': row['query'],
+                'question': row['question'] or row['query'],
+                'raw_facts': row['raw_facts'],
+                'raw_answer': row['raw_answer'],
+                'timestamp': row['enqueued_at'],
+                'tier': row['tier'],
+                'attempts': row['attempts']
+            }
+            self.pending[job['query']] = job
+            self._push(job)
+        if rows:
+            self.counters['recovered'] += len(rows)
+            log.info("Recovered jobs from the job store", jobs=len(rows))
+        return len(rows)
+
+    def _prune_waiters(self):
+        """Forget subscribers that gave up on a job released to the store"""
+        for query in list(self._waiters):
+            futures = [future for future in self._waiters[query] if not future.done()]
+            if futures:
+                self._waiters[query] = futures
+            else:
+                del self._waiters[query]
+
+    async def _recover_loop(self):
+        while True:
+            self._prune_waiters()
+            self._recover()
+            await asyncio.sleep(self.recover_interval)
+
+    @staticmethod
+    def _estimate_tokens(job):
+        # ~4 characters per token is close enough for budgeting
+        return (len(job['question']) + len(job['raw_facts'])) // 4 + 10
+
+    async def _next_batch(self):
+        """Wait for the best pending job, then top up with more up to the token budget"""
+        job = None
+        while job is None:
+            # Claiming spends an attempt, so during an outage leave the backlog untouched
+            while self._backend() is None:
+                await asyncio.sleep(self.backend_poll)
+            entry = await self.job_queue.get()
+            self.job_queue.task_done()
+            if self._backend() is None:
+                # Went away while this worker was waiting for a job
+                self.job_queue.put_nowait(entry)
+                continue
+            job = self._claim(entry)
+
+        batch = [job]
+        budget = self.batch_token_budget - self._estimate_tokens(job)
+        while len(batch) < self.batch_size and not self.job_queue.empty():
+            entry = self.job_queue.get_nowait()
+            self.job_queue.task_done()
+            candidate = self.pending.get(entry[2])
+            if candidate is None or candidate['seq'] != entry[1]:
+                continue
+            cost = self._estimate_tokens(candidate)
+            if cost > budget:
+                # Leave it for the next batch
+                self.job_queue.put_nowait(entry)
+                break
+            claimed = self._claim(entry)
+            if claimed is not None:
+                budget -= cost
+                batch.append(claimed)
+        return batch
+
+    # ------------------------------------------------------------------------
+    # Event loop
+    # ------------------------------------------------------------------------
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            self.loop.close()
+
+    async def _main(self):
+        self.job_queue = asyncio.PriorityQueue()
+        self._stop_event = asyncio.Event()
+        for backend in self.backends:
+            await backend.start()
+        workers = [asyncio.create_task(self._worker_loop(i)) for i in range(self.num_workers)]
+        if self.job_store is not None:
+            workers.append(asyncio.create_task(self._recover_loop()))
+        self._ready.set()
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            for backend in self.backends:
+                await backend.close()
+
+    async def _worker_loop(self, worker_id):
+        """Worker coroutine - processes batches until cancelled"""
+        while True:
+            jobs = await self._next_batch()
+            try:
+                await self._process_batch(jobs)
+            except Exception as e:
+                self.counters['failed'] += len(jobs)
+                log.exception("Job processing failed", jobs=len(jobs))
+            finally:
+                for job in jobs:
+                    self.in_flight.discard(job['query'])
+                    # Tell subscribers the answer is not coming, unless it still
+                    # is (no-op for jobs already notified by _finish)
+                    if not job.get('requeued'):
+                        self._notify(job['query'], None)
+
+    def _is_live(self, job):
+        """Drop jobs that went stale, and defer jobs that ran out of time"""
+        now = time.time()
+        if now - job['timestamp'] > self.stale_after:
+            self.counters['dropped'] += 1
+            log.debug("Stale job dropped", query=job['query'][:50])
+            self._complete(job)
+            return False
+        if job['deadline'] <= now:
+            self.counters['dropped'] += 1
+            log.debug("Deadline passed, job deferred", query=job['query'][:50])
+            self._retry_later(job)
+            return False
+        return True
+
+    async def _process_batch(self, jobs):
+        jobs = [job for job in jobs if self._is_live(job)]
+        if not jobs:
+            return
+
+        results = {}
+        backend = self._backend()
+        if len(jobs) > 1 and backend is not None and backend.supports_batch:
+            log.debug("Processing batch", jobs=len(jobs), backend=backend.name)
+            self.counters['batches'] += 1
+            for job in jobs:
+                job['sent'] = True
+            deadline = min(job['deadline'] for job in jobs)
+            try:
+                results = await asyncio.wait_for(
+                    backend.enhance_batch(jobs, deadline),
+                    timeout=deadline - time.time()
+                ) or {}
+            except asyncio.TimeoutError:
+                log.warning("Batch deadline exceeded", jobs=len(jobs))
+            self.backend_counts[backend.name] += len(results)
+            if len(results) < len(jobs):
+                log.debug("Partial batch, retrying the rest singly", answered=len(results), jobs=len(jobs))
+
+        leftover = [job for job in jobs if job['query'] not in results]
+        singles = [job for job in leftover if self._is_live(job)]
+        answers = await asyncio.gather(*(self._process_single(job) for job in singles))
+        for job, enhanced in zip(singles, answers):
+            if enhanced:
+                results[job['query']] = enhanced
+
+        for job in jobs:
+            if job in leftover and job not in singles:
+                continue  # dropped while the batch was in flight
+            await self._finish(job, results.get(job['query']))
+
+    def _backend(self):
+        """First backend that can take work right now"""
+        for backend in self.backends:
+            if backend.available():
+                return backend
+        return None
+
+    async def _process_single(self, job):
+        log.debug("Processing job", query=job['query'][:50])
+        # Re-check availability per attempt: a failed Gemini call may have just gone offline
+        tried = set()
+        while True:
+            backend = self._backend()
+            if backend is None or backend.name in tried:
+                return None
+            tried.add(backend.name)
+            job['sent'] = True
+            try:
+                enhanced = await asyncio.wait_for(
+                    backend.enhance(job),
+                    timeout=job['deadline'] - time.time()
+                )
+            except asyncio.TimeoutError:
+                log.warning("Job deadline exceeded", query=job['query'][:50])
+                return None
+            if enhanced:
+                self.backend_counts[backend.name] += 1
+                return enhanced
+
+    async def _finish(self, job, enhanced):
+        if not enhanced and self._backend() is None:
+            # Every backend went away mid-job: an outage, not a failure of this job
+            self._defer(job)
+            return
+        if not enhanced:
+            self.counters['failed'] += 1
+            log.info("Enhancement failed, keeping raw answer", query=job['query'][:50], version="raw")
+            self._retry_later(job)
+            return
+
+        # Chroma and the profanity filter are blocking - keep them off the loop
+        enhanced, success = await asyncio.to_thread(self._store, job['query'], enhanced, job['question'])
+        # Either way there is nothing left to retry: the cache update is idempotent
+        self._complete(job)
+        self._notify(job['query'], enhanced)
+        if success:
+            self.counters['completed'] += 1
+            log.info("Job completed and cached", query=job['query'][:50], version="enhanced")
+        else:
+            log.warning("Enhanced but cache update failed", query=job['query'][:50])
+
+    def _store(self, query, enhanced, question=None):
+        """Censor the enhanced answer and write it to the cache"""
+        enhanced = self.profanity.censor(enhanced)
+        return enhanced, self.cache.update(query, enhanced, question=question)
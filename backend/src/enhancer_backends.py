@@ -0,0 +1,407 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+from logger import get_logger
+
+log = get_logger("enhancer")
+
+BASE_DIR = Path(__file__).parent
+MODELS_DIR = BASE_DIR.parent / "models"
+
+DEFAULT_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+PERSONA = "You are Pathfinder — a calm, polite, helpful, always excited Catanduanes tourism assistant. Your responses should sound gentle, clear, and factual, while maintaining a friendly tone."
+
+INSTRUCTIONS = """Respond in a helpful way using only the information from the facts.
+If the facts partially match the query, answer as best as possible using the facts.
+Do not make up information not in the facts.
+Respond in the same language as the tourist's question.
+
+Use only the information from the facts. Summarize the facts into a cohesive answer. Do not just list them one by one.
+Give a single, concise, and natural-sounding sentence, include all the facts and the place mentioned.
+Connect the ideas naturally (e.g., use "You can also try..." instead of just a comma).
+Do not add greetings or extra commentary be direct yet kind. You may include exclamation marks to sound excited.
+If you detect any profanity in any language, return "I am unable to process that language. Please ask your question politely so I can assist you with Catanduanes tourism."""
+
+
+# ============================================================================
+# BACKEND INTERFACE
+# ============================================================================
+class EnhancerBackend:
+    """Turns raw facts into an enhanced answer
+
+    Backends run on the enhancer's event loop. enhance() returns the
+    answer text or None; enhance_batch() returns {query: answer} for the
+    jobs it could answer and leaves the rest to enhance(). Only backends
+    with supports_batch are sent batches.
+    """
+    name = "base"
+    supports_batch = False
+
+    def available(self):
+        """Whether this backend can take work right now"""
+        return True
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def enhance(self, job):
+        raise NotImplementedError
+
+    async def enhance_batch(self, jobs, deadline):
+        return {}
+
+
+# ============================================================================
+# GEMINI (ONLINE)
+# ============================================================================
+class GeminiBackend(EnhancerBackend):
+    """Gemini generateContent over a shared keep-alive client"""
+    name = "gemini"
+    supports_batch = True
+    RETRY_STATUS = (429, 503)
+
+    def __init__(self, api_key, config, connectivity=None):
+        self.api_key = api_key
+        # ConnectivityMonitor: while it reports offline, skip Gemini without a request
+        self.connectivity = connectivity
+
+        enhancer_conf = config.get('enhancer', {})
+        self.max_in_flight = enhancer_conf.get('max_in_flight', 4)
+        self.request_timeout = enhancer_conf.get('request_timeout', 10)
+        self.max_retries = enhancer_conf.get('max_retries', 4)
+        self.backoff_base = enhancer_conf.get('backoff_base', 0.5)
+        self.backoff_max = enhancer_conf.get('backoff_max', 30)
+        self.offline_backoff = enhancer_conf.get('offline_backoff', 30)
+
+        # GEMINI_API_BASE points the enhancer at a stand-in server for offline testing
+        self.api_base = os.getenv('GEMINI_API_BASE', enhancer_conf.get('api_base', DEFAULT_API_BASE)).rstrip('/')
+        # Use the alias that always points to the current stable model
+        self.model_name = enhancer_conf.get('model_name', 'gemini-flash-latest')
+
+        self.offline_until = 0
+        self._client = None
+        self._semaphore = None
+
+    def available(self):
+        if self.connectivity is not None and not self.connectivity.online:
+            return False
+        return bool(self.api_key) and time.time() >= self.offline_until
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._client = httpx.AsyncClient(
+            timeout=self.request_timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight
+            )
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honouring Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    async def _post(self, prompt, deadline, max_output_tokens=600, json_output=False):
+        """POST one generateContent request, retrying 429/503 and network errors"""
+        url = f"{self.api_base}/models/{self.model_name}:generateContent?key={self.api_key}"
+        generation_config = {'temperature': 0.7, 'maxOutputTokens': max_output_tokens}
+        if json_output:
+            generation_config['responseMimeType'] = 'application/json'
+        payload = {
+            'contents': [{'parts': [{'text': prompt}]}],
+            'generationConfig': generation_config
+        }
+
+        network_errors = 0
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(url, json=payload)
+
+                if response.status_code == 200:
+                    try:
+                        return self._parse_response(response.json())
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        # A malformed body is not worth retrying; the caller falls back per job
+                        log.warning("Malformed Gemini response", error=type(e).__name__)
+                        return None
+
+                if response.status_code not in self.RETRY_STATUS:
+                    log.warning("Gemini API error", status=response.status_code)
+                    return None
+
+                retry_after = response.headers.get('Retry-After')
+                log.info("Gemini API busy", status=response.status_code, attempt=attempt + 1, max_attempts=self.max_retries + 1)
+            except httpx.TransportError as e:
+                network_errors += 1
+                log.info("Gemini network error", error=type(e).__name__, attempt=attempt + 1, max_attempts=self.max_retries + 1)
+
+            if attempt == self.max_retries:
+                break
+
+            delay = self._backoff_delay(attempt, retry_after)
+            if time.time() + delay >= deadline:
+                log.info("Backoff would exceed job deadline, giving up")
+                break
+            await asyncio.sleep(delay)
+
+        if network_errors and network_errors == attempt + 1:
+            # Every attempt failed to connect: step aside so the offline backends take over
+            self.offline_until = time.time() + self.offline_backoff
+            log.warning("Gemini unreachable, using offline backends", seconds=self.offline_backoff)
+            if self.connectivity is not None:
+                self.connectivity.report_failure()
+        return None
+
+    async def enhance(self, job):
+        """Handles Safety Refusals, Empty Responses and retryable errors"""
+        prompt = f"""{PERSONA}
+
+USER QUESTION: {job['question']}
+FACTUAL INFO: {job['raw_facts']}
+
+{INSTRUCTIONS}"""
+        return await self._post(prompt, job['deadline'])
+
+    async def enhance_batch(self, jobs, deadline):
+        """Enhance several jobs in one request: JSON array in, JSON array out
+
+        Returns {query: answer} for every item that came back well-formed;
+        anything missing is left for the caller to retry singly.
+        """
+        items = [
+            {'id': idx, 'question': job['question'], 'facts': job['raw_facts']}
+            for idx, job in enumerate(jobs)
+        ]
+        prompt = f"""{PERSONA}
+
+You will receive a JSON array of tourist questions, each with its factual info.
+Answer every item independently, following these rules for each answer:
+
+{INSTRUCTIONS}
+
+Return ONLY a JSON array with one object per input item, in the same order, shaped like {{"id": <input id>, "answer": "<answer text>"}}.
+
+ITEMS:
+{json.dumps(items, ensure_ascii=False)}"""
+
+        text = await self._post(
+            prompt, deadline,
+            max_output_tokens=min(8192, 300 * len(jobs)),
+            json_output=True
+        )
+        return self._split_batch_response(text, jobs)
+
+    def _split_batch_response(self, text, jobs):
+        if not text:
+            return {}
+
+        # Models sometimes wrap JSON in a markdown fence despite the mime type
+        text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text.strip())
+        try:
+            answers = json.loads(text)
+        except json.JSONDecodeError:
+            log.warning("Batch response is not valid JSON")
+            return {}
+        if not isinstance(answers, list):
+            return {}
+
+        results = {}
+        for item in answers:
+            if not isinstance(item, dict):
+                continue
+            idx = item.get('id')
+            answer = item.get('answer')
+            if isinstance(idx, int) and 0 <= idx < len(jobs) and isinstance(answer, str) and answer.strip():
+                results[jobs[idx]['query']] = answer.strip()
+        return results
+
+    def _parse_response(self, result):
+        # Check if we have candidates
+        if 'candidates' not in result or not result['candidates']:
+            return None
+
+        candidate = result['candidates'][0]
+
+        # CHECK 1: Did the model finish successfully?
+        if 'content' not in candidate:
+            return None
+
+        # CHECK 2: Does the content have parts?
+        content = candidate['content']
+        if 'parts' not in content or not content['parts']:
+            return None
+
+        # Success
+        return content['parts'][0]['text'].strip()
+
+
+# ============================================================================
+# LLAMA.CPP (OFFLINE)
+# ============================================================================
+class LlamaCppBackend(EnhancerBackend):
+    """Local GGUF model via llama-cpp-python, for kiosks without connectivity
+
+    Generation runs on a single dedicated thread with a capped llama.cpp
+    thread count and lowered scheduling priority, so it soaks up idle CPU
+    without starving the request path. The model is loaded on first use.
+    """
+    name = "llama"
+
+    def __init__(self, config):
+        llama_conf = config.get('enhancer', {}).get('llama', {})
+        model_file = llama_conf.get('model_file') or config.get('rewriter', {}).get('model_file')
+        self.model_path = None
+        if model_file:
+            path = Path(model_file)
+            self.model_path = str(path if path.is_absolute() else MODELS_DIR / path)
+
+        self.n_threads = llama_conf.get('n_threads') or max(1, (os.cpu_count() or 2) // 2)
+        self.n_ctx = llama_conf.get('n_ctx', 2048)
+        self.max_tokens = llama_conf.get('max_tokens', 200)
+        self.nice = llama_conf.get('nice', 10)
+
+        self.llm = None
+        self._load_failed = False
+        self._executor = None
+
+        try:
+            import llama_cpp  # noqa: F401
+            self._importable = True
+        except ImportError:
+            self._importable = False
+
+    def available(self):
+        return (
+            self._importable
+            and not self._load_failed
+            and self.model_path is not None
+            and os.path.exists(self.model_path)
+        )
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="llama-enhancer",
+            initializer=self._lower_priority
+        )
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _lower_priority(self):
+        # Threads llama.cpp spawns from here inherit the nice value (Linux)
+        if hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            except OSError:
+                pass
+
+    def _load(self):
+        if self.llm is not None:
+            return self.llm
+        try:
+            from llama_cpp import Llama
+            self.llm = Llama(
+                model_path=self.model_path,
+                n_ctx=self.n_ctx,
+                n_threads=self.n_threads,
+                n_gpu_layers=0,
+                verbose=False,
+            )
+            log.info("llama.cpp model loaded", model=os.path.basename(self.model_path), threads=self.n_threads)
+        except Exception as e:
+            log.error("Failed to load llama.cpp model", error=str(e))
+            self._load_failed = True
+        return self.llm
+
+    def _generate(self, job):
+        llm = self._load()
+        if llm is None:
+            return None
+
+        prompt = f"""<|im_start|>system
+{PERSONA}
+
+{INSTRUCTIONS}
+<|im_end|>
+<|im_start|>user
+USER QUESTION: {job['question']}
+FACTUAL INFO: {job['raw_facts']}
+<|im_end|>
+<|im_start|>assistant
+"""
+        output = llm(
+            prompt,
+            max_tokens=self.max_tokens,
+            stop=["<|im_end|>"],
+            temperature=0.3,
+            echo=False
+        )
+        text = output['choices'][0]['text'].strip()
+        return text or None
+
+    async def enhance(self, job):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._generate, job)
+        except Exception as e:
+            log.error("llama.cpp generation failed", error=str(e))
+            return None
+
+
+# ============================================================================
+# STUB (TESTING / NO MODEL)
+# ============================================================================
+class StubBackend(EnhancerBackend):
+    """Deterministic stand-in: returns the raw answer unchanged"""
+    name = "stub"
+
+    async def enhance(self, job):
+        return job['raw_answer']
+
+    async def enhance_batch(self, jobs, deadline):
+        return {job['query']: job['raw_answer'] for job in jobs}
+
+
+def build_backends(config, api_key, connectivity=None):
+    """Backends in fallback order for the configured enhancer.backend
+
+    'auto' tries Gemini first and falls back to the local model whenever
+    Gemini is unavailable (no key, or the network is down).
+    """
+    choice = config.get('enhancer', {}).get('backend', 'auto')
+    if choice == 'gemini':
+        return [GeminiBackend(api_key, config, connectivity)]
+    if choice == 'llama':
+        return [LlamaCppBackend(config)]
+    if choice == 'stub':
+        return [StubBackend()]
+    if choice != 'auto':
+        log.warning("Unknown enhancer backend, using auto", backend=choice)
+    return [GeminiBackend(api_key, config, connectivity), LlamaCppBackend(config)]
@@ -1,11 +1,13 @@
 import re
+from lexicon import merge_indicators, merge_keywords, merge_words
 
 class EntityExtractor:
     """Extract structured entities from user queries"""
     
-    def __init__(self, config):
+    def __init__(self, config, lexicon=None):
         self.config = config
         self.places = config['places']
+        self.keywords = merge_keywords(config['keywords'], lexicon)
         
         # Entity patterns
         self.budget_indicators = {
@@ -34,6 +36,17 @@ class EntityExtractor:
             'weekend': ['weekend', 'saturday', 'sunday'],
             'weekday': ['weekday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday']
         }
+        
+        self.near_words = ['near', 'close to', 'around', 'malapit']
+        
+        # Native words for untranslated (translation: off) queries
+        if lexicon:
+            entities = lexicon.get('entities', {})
+            self.budget_indicators = merge_indicators(self.budget_indicators, entities.get('budget'))
+            self.skill_levels = merge_indicators(self.skill_levels, entities.get('skill_level'))
+            self.group_types = merge_indicators(self.group_types, entities.get('group_type'))
+            self.time_periods = merge_indicators(self.time_periods, entities.get('time_period'))
+            self.near_words = merge_words(self.near_words, entities.get('near'))
     
     def extract(self, user_input):
         """
@@ -72,7 +85,7 @@ class EntityExtractor:
         """Extract activity types from query using word boundaries"""
         found = []
         
-        for topic, keywords in self.config['keywords'].items():
+        for topic, keywords in self.keywords.items():
             # Build pattern with word boundaries
             pattern = r'\b(' + '|'.join(map(re.escape, keywords)) + r')\b'
             if re.search(pattern, query_lower):
@@ -121,7 +134,7 @@ class EntityExtractor:
     def _extract_proximity(self, query_lower):
         """Extract proximity indicators using word boundaries"""
         proximity_patterns = {
-            'near': r'\b(near|close to|around|malapit)\b',
+            'near': r'\b(' + '|'.join(map(re.escape, self.near_words)) + r')\b',
             'in': r'\b(in|at|sa)\b',
             'from': r'\bfrom\b'
         }
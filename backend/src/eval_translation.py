@@ -0,0 +1,118 @@
+"""
+Retrieval with and without query translation, side by side.
+
+    python eval_translation.py [--k 3] [--queries dataset/eval_queries.json]
+
+Every query in the eval set goes through the retrieval half of Pipeline.ask
+twice:
+
+    on   protect + translate to English, English-only rules
+    off  the query as typed, rules extended with the config lexicon
+
+A query is a hit when any retrieved title (within the RAG confidence
+threshold) contains one of its expected titles. Prints recall@k and intent
+accuracy per language, plus the mean time spent before the vector search
+(the translation round trip that "off" removes). Needs the embedding model
+and the Chroma index; run it online, or "on" only measures cached
+translations.
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from controller import Controller
+from entity_extractor import EntityExtractor
+from pipeline import Pipeline
+
+BASE_DIR = Path(__file__).parent
+QUERIES = BASE_DIR / "dataset" / "eval_queries.json"
+
+MODES = ('on', 'off')
+
+
+def retrieve(pipeline, text, where_filter, k):
+    """Titles of the top-k matches search() would accept"""
+    results = pipeline.collection.query(query_texts=[text], n_results=k, where=where_filter)
+    threshold = pipeline.config['rag']['confidence_threshold']
+    return [
+        metadata.get('title', '')
+        for metadata, distance in zip(results['metadatas'][0], results['distances'][0])
+        if distance <= threshold
+    ]
+
+
+def is_hit(titles, expected):
+    expected = [e.lower() for e in expected]
+    return any(e in title.lower() for title in titles for e in expected)
+
+
+def run(pipeline, stages, item, mode, k):
+    controller, extractor = stages[mode]
+    started = time.perf_counter()
+    text = pipeline.protect(item['query']) if mode == 'on' else item['query']
+    understand_ms = (time.perf_counter() - started) * 1000
+
+    intent = controller.analyze_query(text)['intent']
+    titles = []
+    if item['expected']:
+        where_filter = pipeline.build_where_filter(extractor.extract(text))
+        titles = retrieve(pipeline, text, where_filter, k)
+    return text, intent, titles, understand_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall with translation on and off")
+    parser.add_argument("--queries", default=str(QUERIES))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true", help="Print every query and its results")
+    args = parser.parse_args()
+
+    with open(args.queries, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+
+    pipeline = Pipeline()
+    lexicon = pipeline.config.get('lexicon', {})
+    stages = {
+        'on': (Controller(pipeline.config, pipeline.encoder), EntityExtractor(pipeline.config)),
+        'off': (
+            Controller(pipeline.config, pipeline.encoder, lexicon=lexicon),
+            EntityExtractor(pipeline.config, lexicon=lexicon)
+        ),
+    }
+
+    # (mode, lang) -> [retrieval hits, retrieval queries, intent hits, queries, understand ms]
+    totals = defaultdict(lambda: [0, 0, 0, 0, 0.0])
+    for item in items:
+        for mode in MODES:
+            text, intent, titles, understand_ms = run(pipeline, stages, item, mode, args.k)
+            for key in ((mode, item['lang']), (mode, 'all')):
+                row = totals[key]
+                if item['expected']:
+                    row[0] += is_hit(titles, item['expected'])
+                    row[1] += 1
+                row[2] += intent == item['intent']
+                row[3] += 1
+                row[4] += understand_ms
+            if args.verbose:
+                print(f"[{mode:>3}] {item['query']!r} -> {text!r} | {intent} | {titles}")
+
+    stats = pipeline.translator.stats()
+    if stats['timeouts'] or stats['errors'] or stats['offline']:
+        print(f"[WARN] Some translations fell back to the original text: {stats}")
+
+    langs = sorted({item['lang'] for item in items}) + ['all']
+    print(f"\n{'lang':<6}{'mode':<6}{f'recall@{args.k}':>10}{'intent':>10}{'pre-search ms':>15}")
+    for lang in langs:
+        for mode in MODES:
+            hits, retrieval_total, intent_hits, total, ms = totals[(mode, lang)]
+            recall = hits / retrieval_total if retrieval_total else 0.0
+            print(f"{lang:<6}{mode:<6}{recall:>10.2f}{intent_hits / total:>10.2f}{ms / total:>15.1f}")
+
+    pipeline.enhancer.stop()
+
+
+if __name__ == "__main__":
+    main()
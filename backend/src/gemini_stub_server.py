@@ -0,0 +1,95 @@
+"""
+Local stand-in for the Gemini generateContent API.
+
+Lets the background enhancer run end to end without network access or an
+API key quota. Point the enhancer at it with:
+
+    python gemini_stub_server.py --port 8765
+    GEMINI_API_BASE=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=stub python -m src.main
+
+Single prompts are answered with "Enhanced: <facts>". Batch prompts (a JSON
+array after the ITEMS: marker) are answered with a JSON array of
+{"id", "answer"} objects, so batching and the per-job fallback can be
+exercised by toggling --garble-batch.
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1beta/models/<model>:generateContent"""
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    options = None
+    stats = {"requests": 0, "batches": 0, "busy": 0}
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.stats["requests"] += 1
+
+        if not re.search(r"/models/[^/]+:generateContent$", self.path.split("?")[0]):
+            return self._send(404, {"error": {"message": "Not found"}})
+
+        if self.options.latency:
+            time.sleep(self.options.latency)
+
+        if random.random() < self.options.busy_rate:
+            self.stats["busy"] += 1
+            return self._send(503, {"error": {"message": "The model is overloaded"}}, {"Retry-After": "1"})
+
+        prompt = body["contents"][0]["parts"][0]["text"]
+        return self._send(200, {
+            "candidates": [{"content": {"parts": [{"text": self._answer(prompt)}]}}]
+        })
+
+    def _answer(self, prompt):
+        if "ITEMS:" in prompt:
+            self.stats["batches"] += 1
+            items = json.loads(prompt.split("ITEMS:", 1)[1])
+            if self.options.garble_batch:
+                return "Sure! Here are your answers: " + "; ".join(item["facts"] for item in items)
+            return json.dumps([{"id": item["id"], "answer": f"Enhanced: {item['facts']}"} for item in items])
+
+        facts = re.search(r"FACTUAL INFO: (.*)", prompt)
+        return f"Enhanced: {facts.group(1) if facts else ''}"
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        print(f"[STUB GEMINI] {self.address_string()} {fmt % args}")
+
+
+def make_server(host="127.0.0.1", port=8765, latency=0.0, busy_rate=0.0, garble_batch=False):
+    StubGeminiHandler.options = argparse.Namespace(latency=latency, busy_rate=busy_rate, garble_batch=garble_batch)
+    return ThreadingHTTPServer((host, port), StubGeminiHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--busy-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--garble-batch", action="store_true", help="Return non-JSON text for batch prompts")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.busy_rate, args.garble_batch)
+    print(f"[STUB GEMINI] Listening on http://{args.host}:{args.port}/v1beta")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,385 @@
+"""
+Embedding model and vector store access, in-process or through the sidecar.
+
+In 'local' mode the Pipeline loads one SentenceTransformer (LocalEncoder)
+and opens Chroma itself, as before. In 'sidecar' mode both live in
+inference_server.py and the Pipeline talks to it over a Unix socket through
+InferenceClient, so web workers never import torch, sentence-transformers
+or chromadb.
+
+Wire format, both directions: a 5-byte header (body length uint32, code
+uint8), then a body of (json length uint32, json, raw float32 data). Small
+structured data travels as JSON; embeddings travel as packed little-endian
+float32 with their shape in the JSON.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from logger import get_logger
+
+log = get_logger("inference")
+
+BASE_DIR = Path(__file__).parent
+MODELS_DIR = BASE_DIR.parent / "models"
+
+
+# ============================================================================
+# LOCAL ENCODER
+# ============================================================================
+class LocalEncoder:
+    """The one SentenceTransformer instance shared by search, cache and controller"""
+    def __init__(self, model_path, torch_threads=None):
+        # Heavy imports stay here so thin sidecar clients never pay for them
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    @classmethod
+    def from_config(cls, config, torch_threads=None):
+        model_path = os.path.join(MODELS_DIR, config['rag']['model_path'])
+        # Fallback to direct model name if local path doesn't exist
+        if not os.path.exists(model_path):
+            model_path = config['rag']['model_path']
+        return cls(model_path, torch_threads=torch_threads)
+
+    def encode(self, texts):
+        """float32 array of shape (len(texts), dim)"""
+        return self.model.encode(
+            list(texts), convert_to_numpy=True, show_progress_bar=False
+        ).astype(np.float32, copy=False)
+
+
+class EncoderEmbeddingFunction:
+    """Chroma embedding function backed by an already-loaded encoder
+
+    Produces the same vectors as chromadb's SentenceTransformerEmbeddingFunction
+    for the same model, so existing collections stay valid.
+    """
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    def __call__(self, input):
+        return self.encoder.encode(input).tolist()
+
+
+# ============================================================================
+# VECTOR STORE
+# ============================================================================
+def dataset_hash(dataset_path):
+    hasher = hashlib.md5()
+    try:
+        with open(dataset_path, 'rb') as f:
+            hasher.update(f.read())
+        return hasher.hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class VectorStore:
+    """Chroma client with the knowledge base and cache collections"""
+    def __init__(self, config, encoder, dataset_path, db_path):
+        import chromadb
+
+        self.config = config
+        self.client = chromadb.PersistentClient(path=db_path)
+        self.embedding = EncoderEmbeddingFunction(encoder)
+        self.collection = self._open_knowledge_base(dataset_path, db_path)
+        self.cache_collection = self._open_cache()
+
+    def get(self, name):
+        """Collection by name, for RPC dispatch"""
+        if name == self.collection.name:
+            return self.collection
+        if name == self.cache_collection.name:
+            return self.cache_collection
+        raise KeyError(f"Unknown collection: {name}")
+
+    def _open_cache(self):
+        collection_name = self.config.get('cache', {}).get('collection_name', 'query_cache')
+        # Try to get or create persistent cache collection
+        try:
+            collection = self.client.get_collection(name=collection_name, embedding_function=self.embedding)
+            log.info("Loaded cache collection", entries=collection.count())
+        except Exception:
+            collection = self.client.create_collection(
+                name=collection_name,
+                embedding_function=self.embedding,
+                metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+            )
+            log.info("Created cache collection")
+        return collection
+
+    def _open_knowledge_base(self, dataset_path, db_path):
+        current_data_hash = dataset_hash(dataset_path)
+        stored_hash = None
+        hash_file_path = os.path.join(db_path, self.config['system']['hash_file'])
+
+        if os.path.exists(hash_file_path):
+            with open(hash_file_path, 'r') as f:
+                stored_hash = f.read().strip()
+
+        collection_name = self.config['rag']['collection_name']
+        try:
+            # This is the STATIC collection (your original dataset)
+            collection = self.client.get_collection(name=collection_name, embedding_function=self.embedding)
+            if stored_hash == current_data_hash and current_data_hash is not None:
+                log.info("Using existing static dataset index")
+                return collection
+            log.info("Static dataset index rebuild required")
+        except Exception:
+            pass
+
+        try:
+            self.client.delete_collection(name=collection_name)
+        except Exception:
+            pass
+
+        collection = self.client.create_collection(name=collection_name, embedding_function=self.embedding)
+        self._load_dataset(collection, dataset_path)
+
+        os.makedirs(db_path, exist_ok=True)
+        with open(hash_file_path, 'w') as f:
+            f.write(current_data_hash)
+        log.info("Static dataset index rebuilt")
+        return collection
+
+    def _load_dataset(self, collection, dataset_path):
+        try:
+            with open(dataset_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            log.error("Dataset not found", path=dataset_path)
+            exit(1)
+        except json.JSONDecodeError as e:
+            log.error("Invalid dataset JSON", path=dataset_path, error=str(e))
+            exit(1)
+
+        documents = []
+        metadatas = []
+        ids = []
+
+        for idx, item in enumerate(data):
+            if 'input' not in item or 'output' not in item:
+                continue
+
+            documents.append(item['input'])
+
+            meta = {
+                "question": item['input'],
+                "answer": item['output'],
+                "title": item.get('title', 'General Info'),
+                "topic": item.get('topic', 'General'),
+                "summary_offline": item.get('summary_offline', item['output'])
+            }
+
+            # Optional filters
+            for field in ['budget', 'location', 'activities', 'group_type', 'skill_level']:
+                if field in item:
+                    meta[field] = item[field]
+
+            metadatas.append(meta)
+            ids.append(str(idx))
+
+        collection.add(documents=documents, metadatas=metadatas, ids=ids)
+        log.info("Loaded dataset", pairs=len(documents))
+
+
+# ============================================================================
+# WIRE PROTOCOL
+# ============================================================================
+OP_PING = 1
+OP_ENCODE = 2
+OP_QUERY = 3
+OP_ADD = 4
+OP_UPDATE = 5
+OP_COUNT = 6
+
+# Safe to resend when the reply is lost: a retried add would write twice
+READ_ONLY_OPS = frozenset([OP_PING, OP_ENCODE, OP_QUERY, OP_COUNT])
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+HEADER = struct.Struct("!IB")
+JSON_LENGTH = struct.Struct("!I")
+MAX_FRAME = 64 * 1024 * 1024
+
+
+class InferenceError(Exception):
+    """The sidecar could not be reached or failed to serve a call"""
+
+
+def pack_frame(code, doc, array=None):
+    meta = json.dumps(doc, separators=(',', ':')).encode('utf-8')
+    data = b'' if array is None else np.ascontiguousarray(array, dtype='<f4').tobytes()
+    body = JSON_LENGTH.pack(len(meta)) + meta + data
+    return HEADER.pack(len(body), code) + body
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return buffer
+
+
+def read_frame(sock):
+    """(code, doc, flat float32 array or None), or None if the peer closed"""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    length, code = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise InferenceError(f"Frame too large: {length} bytes")
+    body = _recv_exact(sock, length)
+    if body is None:
+        return None
+    (meta_length,) = JSON_LENGTH.unpack_from(body)
+    doc = json.loads(bytes(body[JSON_LENGTH.size:JSON_LENGTH.size + meta_length]))
+    data = body[JSON_LENGTH.size + meta_length:]
+    array = np.frombuffer(data, dtype='<f4') if data else None
+    return code, doc, array
+
+
+# ============================================================================
+# SIDECAR CLIENT
+# ============================================================================
+class InferenceClient:
+    """Encoder and collection access through the inference sidecar
+
+    Keeps one connection per calling thread (pipeline executor threads and
+    the enhancer's store thread). Read-only calls reconnect and retry once
+    if the sidecar restarted; writes fail instead, since the first try may
+    have been applied before its reply was lost.
+    """
+    def __init__(self, socket_path, timeout=30, connect_timeout=60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+        self.dim = None
+
+    @classmethod
+    def from_config(cls, config):
+        inference_conf = config.get('inference', {})
+        return cls(
+            os.getenv('INFERENCE_SOCKET', inference_conf.get('socket', '/tmp/pathfinder-inference.sock')),
+            timeout=inference_conf.get('timeout', 30),
+            connect_timeout=inference_conf.get('connect_timeout', 60)
+        )
+
+    def _connect(self):
+        # The sidecar may still be loading the model when the web tier starts
+        give_up_at = time.time() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except OSError as e:
+                sock.close()
+                if time.time() >= give_up_at:
+                    raise InferenceError(f"Inference sidecar unreachable at {self.socket_path}: {e}")
+                time.sleep(0.5)
+
+    def _drop(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def call(self, op, doc, array=None):
+        """Send one request and return the (doc, array) reply"""
+        frame = pack_frame(op, doc, array)
+        attempts = 2 if op in READ_ONLY_OPS else 1
+        for attempt in range(attempts):
+            if getattr(self._local, 'sock', None) is None:
+                self._local.sock = self._connect()
+            try:
+                self._local.sock.sendall(frame)
+                reply = read_frame(self._local.sock)
+            except OSError as e:
+                self._drop()
+                if attempt == attempts - 1:
+                    raise InferenceError(f"Inference call failed: {e}")
+                continue
+            if reply is None:
+                self._drop()
+                if attempt == attempts - 1:
+                    raise InferenceError("Inference sidecar closed the connection")
+                continue
+
+            status, reply_doc, reply_array = reply
+            if status == STATUS_ERROR:
+                raise InferenceError(reply_doc.get('error', 'unknown error'))
+            return reply_doc, reply_array
+
+    def ping(self):
+        doc, _ = self.call(OP_PING, {})
+        self.dim = doc.get('dim')
+        return doc
+
+    def close(self):
+        """Close this thread's connection; the next call reconnects"""
+        self._drop()
+
+    def encode(self, texts):
+        doc, array = self.call(OP_ENCODE, {'texts': list(texts)})
+        return array.reshape(doc['shape'])
+
+    def collection(self, name):
+        return RemoteCollection(self, name)
+
+
+class RemoteCollection:
+    """The subset of the Chroma collection API the pipeline uses, over RPC"""
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=10, where=None, include=None):
+        doc = {'collection': self.name, 'n_results': n_results, 'where': where, 'include': include}
+        array = None
+        if query_embeddings is not None:
+            array = np.asarray(query_embeddings, dtype=np.float32)
+            doc['shape'] = list(array.shape)
+        else:
+            doc['texts'] = list(query_texts)
+
+        results, embeddings = self.client.call(OP_QUERY, doc, array)
+        rows = results.pop('embedding_rows', None)
+        dim = results.pop('dim', None)
+        if rows is not None:
+            flat = embeddings.reshape(-1, dim) if embeddings is not None else np.zeros((0, dim or 0), np.float32)
+            offsets = np.cumsum([0] + rows)
+            results['embeddings'] = [flat[offsets[i]:offsets[i + 1]] for i in range(len(rows))]
+        return results
+
+    def add(self, documents, metadatas, ids):
+        self.client.call(OP_ADD, {'collection': self.name, 'documents': documents, 'metadatas': metadatas, 'ids': ids})
+
+    def update(self, ids, metadatas=None, documents=None):
+        self.client.call(OP_UPDATE, {'collection': self.name, 'ids': ids, 'metadatas': metadatas, 'documents': documents})
+
+    def count(self):
+        doc, _ = self.client.call(OP_COUNT, {'collection': self.name})
+        return doc['count']
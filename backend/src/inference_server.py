@@ -0,0 +1,162 @@
+"""
+Inference sidecar: owns the embedding model and Chroma for all web workers.
+
+Run it once per machine, then start the API with inference.mode: sidecar:
+
+    python inference_server.py --socket /tmp/pathfinder-inference.sock
+    WEB_CONCURRENCY=4 python -m src.main
+
+Each web worker then needs only a socket instead of its own copy of
+MiniLM, torch and the HNSW index.
+"""
+
+import argparse
+import os
+import socketserver
+import threading
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from inference import (
+    LocalEncoder, VectorStore, pack_frame, read_frame,
+    OP_PING, OP_ENCODE, OP_QUERY, OP_ADD, OP_UPDATE, OP_COUNT,
+    STATUS_OK, STATUS_ERROR
+)
+from logger import configure as configure_logging, get_logger
+
+# Named for the process rather than __name__, which is "__main__" when run as a script
+log = get_logger("sidecar")
+
+BASE_DIR = Path(__file__).parent
+DATASET = BASE_DIR / "dataset" / "dataset.json"
+CONFIG = BASE_DIR / "config" / "config.yaml"
+CHROMA_STORAGE = BASE_DIR.parent.parent / "chroma_storage"
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    """Serves request frames on one client connection until it closes"""
+    encoder = None
+    store = None
+    slots = None
+
+    def handle(self):
+        while True:
+            try:
+                frame = read_frame(self.request)
+            except Exception as e:
+                log.warning("Bad frame, closing connection", error=str(e))
+                return
+            if frame is None:
+                return
+
+            op, doc, array = frame
+            try:
+                # Model and index work is CPU-bound: cap how much runs at once
+                with self.slots:
+                    reply = self.dispatch(op, doc, array)
+                self.request.sendall(pack_frame(STATUS_OK, *reply))
+            except Exception as e:
+                log.error("Error serving request", op=op, error=f"{type(e).__name__}: {e}")
+                self.request.sendall(pack_frame(STATUS_ERROR, {'error': f"{type(e).__name__}: {e}"}))
+
+    def dispatch(self, op, doc, array):
+        if op == OP_PING:
+            return {'dim': self.encoder.dim, 'pid': os.getpid()}, None
+
+        if op == OP_ENCODE:
+            embeddings = self.encoder.encode(doc['texts'])
+            return {'shape': list(embeddings.shape)}, embeddings
+
+        collection = self.store.get(doc['collection'])
+
+        if op == OP_QUERY:
+            kwargs = {'n_results': doc['n_results'], 'where': doc.get('where')}
+            if doc.get('include'):
+                kwargs['include'] = doc['include']
+            if array is not None:
+                kwargs['query_embeddings'] = array.reshape(doc['shape']).tolist()
+            else:
+                kwargs['query_texts'] = doc['texts']
+            return self._pack_results(collection.query(**kwargs))
+
+        if op == OP_ADD:
+            collection.add(documents=doc['documents'], metadatas=doc['metadatas'], ids=doc['ids'])
+            return {}, None
+
+        if op == OP_UPDATE:
+            kwargs = {'ids': doc['ids']}
+            if doc.get('metadatas') is not None:
+                kwargs['metadatas'] = doc['metadatas']
+            if doc.get('documents') is not None:
+                kwargs['documents'] = doc['documents']
+            collection.update(**kwargs)
+            return {}, None
+
+        if op == OP_COUNT:
+            return {'count': collection.count()}, None
+
+        raise ValueError(f"Unknown op {op}")
+
+    def _pack_results(self, results):
+        """Chroma query results as JSON, with any embeddings moved to the binary part"""
+        doc = {
+            key: results.get(key)
+            for key in ('ids', 'documents', 'metadatas', 'distances')
+            if results.get(key) is not None
+        }
+        embeddings = results.get('embeddings')
+        if embeddings is None:
+            return doc, None
+
+        rows = [np.asarray(row, dtype=np.float32).reshape(-1, self.encoder.dim) for row in embeddings]
+        doc['embedding_rows'] = [len(row) for row in rows]
+        doc['dim'] = self.encoder.dim
+        return doc, np.concatenate(rows) if any(len(row) for row in rows) else None
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, config_path=str(CONFIG), dataset_path=str(DATASET), db_path=str(CHROMA_STORAGE)):
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    configure_logging(config)
+
+    inference_conf = config.get('inference', {})
+    threads = inference_conf.get('threads') or os.cpu_count() or 1
+
+    # One model instance: the Chroma collections embed through it as well
+    InferenceHandler.encoder = LocalEncoder.from_config(config, torch_threads=inference_conf.get('torch_threads'))
+    InferenceHandler.store = VectorStore(config, InferenceHandler.encoder, dataset_path, db_path)
+    InferenceHandler.slots = threading.BoundedSemaphore(threads)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = InferenceServer(socket_path, InferenceHandler)
+    os.chmod(socket_path, 0o660)
+    log.info("Listening", socket=socket_path, threads=threads, dim=InferenceHandler.encoder.dim)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pathfinder inference sidecar (embedding model + Chroma)")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: inference.socket from config)")
+    parser.add_argument("--config", default=str(CONFIG))
+    parser.add_argument("--dataset", default=str(DATASET))
+    parser.add_argument("--db", default=str(CHROMA_STORAGE))
+    args = parser.parse_args()
+
+    socket_path = args.socket or os.getenv('INFERENCE_SOCKET')
+    if socket_path is None:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            socket_path = yaml.safe_load(f).get('inference', {}).get('socket', '/tmp/pathfinder-inference.sock')
+    serve(socket_path, args.config, args.dataset, args.db)
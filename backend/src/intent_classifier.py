@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from inference import MODELS_DIR
+from logger import get_logger
+
+log = get_logger("intent")
+
+
+def softmax(scores):
+    scores = scores - scores.max()
+    exp = np.exp(scores)
+    return exp / exp.sum()
+
+
+# ============================================================================
+# INTENT CLASSIFIER
+# ============================================================================
+class IntentClassifier:
+    """Linear intent + topic classifier over the query embedding
+
+    One (labels x dim) weight matrix holds both heads, so a query costs a
+    single matrix-vector product on the unit-normalized embedding the
+    pipeline already computes for search. Trained offline by
+    train_intent.py; the controller falls back to its rules when the
+    intent confidence is below min_confidence.
+    """
+    def __init__(self, weights, bias, intents, topics, min_confidence=0.75):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.intents = list(intents)
+        self.topics = list(topics)
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def load(cls, path, min_confidence=0.75):
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            data['weights'], data['bias'],
+            [str(label) for label in data['intents']], [str(label) for label in data['topics']],
+            min_confidence=min_confidence
+        )
+
+    @classmethod
+    def from_config(cls, config, dim=None):
+        """The trained model named in config, or None (rules only) if there is none"""
+        classifier_conf = config.get('intent_classifier', {})
+        model_file = classifier_conf.get('model_file')
+        if not model_file:
+            return None
+        path = os.path.join(MODELS_DIR, model_file)
+        if not os.path.exists(path):
+            log.info("No intent classifier model, using rules only", path=path)
+            return None
+        classifier = cls.load(path, classifier_conf.get('min_confidence', 0.75))
+        if dim is not None and classifier.weights.shape[1] != dim:
+            log.warning(
+                "Intent classifier was trained for another embedding model, using rules only",
+                expected=dim, found=classifier.weights.shape[1]
+            )
+            return None
+        log.info("Intent classifier loaded", intents=len(classifier.intents), topics=len(classifier.topics))
+        return classifier
+
+    def save(self, path):
+        np.savez(
+            path, weights=self.weights, bias=self.bias,
+            intents=np.array(self.intents), topics=np.array(self.topics)
+        )
+
+    def predict(self, embedding):
+        """(intent, confidence, topic, topic confidence) for a unit-normalized embedding"""
+        scores = self.weights @ embedding + self.bias
+        n = len(self.intents)
+        intent_probs = softmax(scores[:n])
+        topic_probs = softmax(scores[n:])
+        intent = int(np.argmax(intent_probs))
+        topic = int(np.argmax(topic_probs))
+        return self.intents[intent], float(intent_probs[intent]), self.topics[topic], float(topic_probs[topic])
@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+from logger import get_logger
+
+log = get_logger("jobs")
+
+
+# ============================================================================
+# DURABLE ENHANCER JOB STORE
+# ============================================================================
+class JobStore:
+    """SQLite (WAL) backed store for pending enhancer jobs
+
+    Jobs are keyed on the normalized query, so re-enqueueing is an upsert.
+    Processing is at-least-once: a worker claims a job by taking a lease
+    that expires after visibility_timeout seconds, and a job whose lease
+    lapses (crash, restart, recycled worker) becomes claimable again.
+    Completion deletes the row only while the caller still holds the lease,
+    so finishing the same job twice is harmless.
+    """
+    def __init__(self, db_path, visibility_timeout=120):
+        self.db_path = str(db_path)
+        self.visibility_timeout = visibility_timeout
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS enhancer_jobs (
+                query TEXT PRIMARY KEY,
+                raw_facts TEXT NOT NULL,
+                raw_answer TEXT NOT NULL,
+                tier INTEGER NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_token TEXT,
+                available_at REAL NOT NULL DEFAULT 0
+            )
+        """)
+        # Added after the first release: the user's wording, when it differs from the cache key
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(enhancer_jobs)")}
+        if 'question' not in columns:
+            self.conn.execute("ALTER TABLE enhancer_jobs ADD COLUMN question TEXT")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_enhancer_jobs_ready ON enhancer_jobs (available_at, tier, enqueued_at)"
+        )
+        log.info("Job store ready", path=self.db_path, pending=self.count())
+
+    def put(self, job):
+        """Insert a job, or merge it into the existing row for the same query"""
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO enhancer_jobs (query, question, raw_facts, raw_answer, tier, enqueued_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(query) DO UPDATE SET
+                    raw_facts = CASE WHEN excluded.tier < tier THEN excluded.raw_facts ELSE raw_facts END,
+                    raw_answer = CASE WHEN excluded.tier < tier THEN excluded.raw_answer ELSE raw_answer END,
+                    tier = MIN(tier, excluded.tier)
+            """, (job['query'], job.get('question'), job['raw_facts'], job['raw_answer'], job['tier'], job['timestamp']))
+
+    def claim(self, query):
+        """Lease a job for processing; returns the lease token, or None if unavailable"""
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute("""
+                UPDATE enhancer_jobs
+                SET lease_token = ?, available_at = ?, attempts = attempts + 1
+                WHERE query = ? AND available_at <= ?
+            """, (token, now + self.visibility_timeout, query, now))
+        return token if cursor.rowcount == 1 else None
+
+    def complete(self, query, token):
+        """Remove a finished job (idempotent: a lost lease or second call is a no-op)"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM enhancer_jobs WHERE query = ? AND lease_token = ?", (query, token)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, query, token, retry_in=0, refund=False):
+        """Give a leased job back, claimable again after retry_in seconds
+
+        refund=True takes back the attempt the claim counted, for a job
+        that was never actually tried.
+        """
+        with self.lock:
+            self.conn.execute("""
+                UPDATE enhancer_jobs SET lease_token = NULL, available_at = ?,
+                    attempts = MAX(0, attempts - ?)
+                WHERE query = ? AND lease_token = ?
+            """, (time.time() + retry_in, 1 if refund else 0, query, token))
+
+    def ready(self, limit=100, exclude=()):
+        """Jobs that are not leased and due for (re)processing, best first"""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT query, question, raw_facts, raw_answer, tier, enqueued_at, attempts
+                FROM enhancer_jobs WHERE available_at <= ?
+                ORDER BY tier, enqueued_at LIMIT ?
+            """, (time.time(), limit + len(exclude))).fetchall()
+        return [dict(row) for row in rows if row['query'] not in exclude][:limit]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM enhancer_jobs").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
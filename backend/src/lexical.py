@@ -0,0 +1,71 @@
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Question scaffolding that would otherwise dominate short queries
+STOPWORDS = frozenset("""
+a an and are at be best can catanduanes do does for from get go how i in is it
+me my of on or should show tell the there this to what when where which who
+why will with you your
+ang ba mga na ng sa saan ano paano po
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+# ============================================================================
+# LEXICAL INDEX
+# ============================================================================
+class LexicalIndex:
+    """BM25 over the dataset's questions, answers, titles, topics and locations
+
+    A fallback retriever that needs no embedding model and no Chroma: the
+    postings fit in a few hundred KB and a query costs a dict lookup per
+    term. Used when the pipeline is overloaded and every vector search
+    would only lengthen the queue.
+    """
+    def __init__(self, entries, k1=1.5, b=0.75):
+        self.entries = entries
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)   # term -> [(entry index, term frequency)]
+        self.lengths = []
+        for index, entry in enumerate(entries):
+            terms = tokenize(' '.join(
+                entry.get(field, '') for field in ('input', 'output', 'title', 'topic', 'location')
+            ))
+            self.lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings[term].append((index, frequency))
+        self.average_length = sum(self.lengths) / max(1, len(self.lengths))
+        self.idf = {
+            term: math.log(1 + (len(entries) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    @classmethod
+    def from_dataset(cls, dataset_path):
+        with open(dataset_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls([item for item in data if 'input' in item and 'output' in item])
+
+    def search(self, query, k=3):
+        """Up to k (score, entry) pairs, best first; empty when no term matches"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.average_length)
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.entries[index]) for index, score in best]
+
+    def stats(self):
+        return {'entries': len(self.entries), 'terms': len(self.postings)}
@@ -0,0 +1,26 @@
+"""
+Tagalog/Bikol vocabulary for translation mode "off".
+
+When queries reach the rules untranslated, the English keyword, entity and
+intent lists miss most of them. The `lexicon:` section of config.yaml adds
+native words per topic, entity label and intent cue; these helpers merge it
+into the English lists without changing their order or labels.
+"""
+
+
+def merge_words(base, extra):
+    """base list followed by any words from extra it does not already contain"""
+    merged = list(base)
+    merged.extend(word for word in extra or [] if word not in merged)
+    return merged
+
+
+def merge_indicators(indicators, extra):
+    """{label: words} with extra's words for each known label appended"""
+    extra = extra or {}
+    return {label: merge_words(words, extra.get(label)) for label, words in indicators.items()}
+
+
+def merge_keywords(keywords, lexicon):
+    """Topic keywords from config with the lexicon's native words added"""
+    return merge_indicators(keywords, (lexicon or {}).get('keywords'))
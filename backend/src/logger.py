@@ -0,0 +1,208 @@
+"""
+Structured logging that stays off the request thread.
+
+    from logger import get_logger
+    log = get_logger("pipeline")
+    log.info("Cache hit", version="raw", latency_ms=3.2)
+
+Records go through a QueueHandler onto a bounded in-memory queue; a
+QueueListener thread formats them and writes to stdout (journald on the
+Pi). The caller pays for a level check and a queue put - nothing is
+formatted or written on its thread - and a disabled level costs only the
+check. Per-level sampling drops a fraction of records before they are
+queued, and a full queue drops instead of blocking.
+
+Level: LOG_LEVEL env, else logging.level in config.yaml (INFO).
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT = "pathfinder"
+
+_settings = {
+    'level': os.getenv('LOG_LEVEL', 'INFO').upper(),
+    'format': 'text',
+    'queue_size': 10000,
+    'sample': {},
+}
+_lock = threading.Lock()
+_listener = None
+_handler = None
+_configured_from = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keep each record with its level's configured probability (default 1)"""
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {logging.getLevelName(level.upper()): rate for level, rate in (rates or {}).items()}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener and never blocks"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue never leaves this process: pass the record through as is
+        # instead of formatting it on the caller's thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """2026-01-01 12:00:00 INFO  [pipeline] Cache hit version=raw latency_ms=3.2"""
+    def format(self, record):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        component = record.name[len(ROOT) + 1:] or ROOT
+        line = f"{timestamp} {record.levelname:<5} [{component}] {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={_text_value(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line for log shippers"""
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'component': record.name[len(ROOT) + 1:] or ROOT,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _text_value(value):
+    if isinstance(value, float):
+        return f"{value:.3f}".rstrip('0').rstrip('.')
+    text = str(value)
+    if not text or any(ch.isspace() for ch in text) or '=' in text:
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+def _start():
+    """(Re)build the queue, handler and listener for this process"""
+    global _listener, _handler
+    log_queue = queue.Queue(maxsize=_settings['queue_size'])
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(_settings['sample']))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if _settings['format'] == 'json' else TextFormatter())
+    listener = QueueListener(log_queue, output)
+
+    root = logging.getLogger(ROOT)
+    root.handlers = [handler]
+    root.setLevel(_settings['level'])
+    root.propagate = False
+
+    listener.start()
+    _listener, _handler = listener, handler
+
+
+def shutdown():
+    """Write out everything still queued; call before os._exit()"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_in_child():
+    # The listener thread does not survive fork(); give the child its own
+    global _listener, _configured_from
+    _listener = None
+    if _configured_from is not None:
+        _start()
+        _configured_from = os.getpid()
+
+
+def configure(config=None):
+    """Apply the logging: section of config; LOG_LEVEL still wins"""
+    global _configured_from
+    logging_conf = (config or {}).get('logging', {})
+    with _lock:
+        _settings['level'] = os.getenv('LOG_LEVEL', logging_conf.get('level', 'INFO')).upper()
+        _settings['format'] = logging_conf.get('format', 'text')
+        _settings['queue_size'] = logging_conf.get('queue_size', 10000)
+        _settings['sample'] = logging_conf.get('sample', {})
+        if _configured_from == os.getpid():
+            shutdown()
+        _start()
+        _configured_from = os.getpid()
+
+
+class StructuredLogger:
+    """Logger whose keyword arguments become structured fields"""
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        """error() with the current exception's traceback"""
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def is_debug(self):
+        return self._logger.isEnabledFor(logging.DEBUG)
+
+
+def get_logger(component):
+    """StructuredLogger for one component; starts the default setup on first use"""
+    global _configured_from
+    with _lock:
+        if _configured_from is None:
+            _start()
+            _configured_from = os.getpid()
+    return StructuredLogger(logging.getLogger(f"{ROOT}.{component}"))
+
+
+def dropped():
+    """Records dropped because the queue was full"""
+    return _handler.dropped if _handler is not None else 0
+
+
+atexit.register(shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
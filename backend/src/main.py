@@ -106,6 +106,7 @@ except Exception as e:
 try:
     from .routers import ai
     app.include_router(ai.router)
+    app.include_router(ai.metrics_router)
 except Exception as e:
     print(f"[WARNING] AI router failed to load: {str(e)[:100]}")
 
@@ -113,13 +114,37 @@ except Exception as e:
 async def health_check():
     return {"status": "ok", "message": "API is running"}
 
+def check_workers(workers):
+    """Refuse several workers that would each open the Chroma store on disk
+
+    Rate limits, the exact cache tier and enhancer jobs live in SQLite and
+    are safe to share, but Chroma's persistent client is not multi-process
+    safe: in inference.mode "local" every worker would write the semantic
+    cache and could rebuild the knowledge base at the same time. With the
+    sidecar one process owns Chroma and the workers only hold a socket.
+    """
+    if workers <= 1:
+        return
+    import yaml
+    config_path = os.path.join(os.path.dirname(__file__), "config", "config.yaml")
+    with open(config_path, 'r', encoding='utf-8') as f:
+        mode = (yaml.safe_load(f).get('inference') or {}).get('mode', 'local')
+    if mode != 'sidecar':
+        sys.exit(
+            f"WEB_CONCURRENCY={workers} needs inference.mode: sidecar (one process owns Chroma); "
+            "start inference_server.py first, or run a single worker"
+        )
+
 if __name__ == "__main__":
     import uvicorn
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    check_workers(workers)
     uvicorn.run(
-        app,
+        # Multiple workers must re-import the app by name in each process
+        app if workers == 1 else "src.main:app",
         host="0.0.0.0",
         port=8000,
-        workers=1,
+        workers=workers,
         limit_concurrency=50,
         limit_max_requests=1000,
         timeout_keep_alive=5
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ============================================================================
+# BOUNDED TTL MEMO TABLE
+# ============================================================================
+class TTLMemo:
+    """Thread-safe LRU memo table with a per-table TTL
+
+    Holds at most max_entries results, each for ttl seconds. Values are
+    shared between callers, so treat them as read-only. Two threads
+    missing the same key at once both compute it; the later result wins,
+    which is harmless for the deterministic stages memoized here.
+    """
+    def __init__(self, max_entries=1000, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    @classmethod
+    def from_config(cls, config, name, max_entries=1000, ttl=600):
+        memo_conf = (config or {}).get('memo', {}).get(name, {})
+        return cls(
+            max_entries=memo_conf.get('max_entries', max_entries),
+            ttl=memo_conf.get('ttl', ttl)
+        )
+
+    def get_or_compute(self, key, compute):
+        """The memoized value for key, calling compute() on a miss"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return entry[1]
+                del self.entries[key]
+                self.counters['expired'] += 1
+            self.counters['misses'] += 1
+
+        value = compute()
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evicted'] += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'max_entries': self.max_entries, 'ttl': self.ttl, **self.counters}
@@ -0,0 +1,231 @@
+import bisect
+import threading
+import time
+
+from logger import get_logger
+
+log = get_logger("metrics")
+
+# Upper bounds in seconds: 1 ms .. 10 s covers a cache hit up to a slow Pi search
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Prefix of metric rows in the SharedState counters table
+STORE_PREFIX = "m|"
+
+
+def _label_str(labels):
+    return ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+# ============================================================================
+# METRICS REGISTRY
+# ============================================================================
+class MetricsRegistry:
+    """Histograms and counters rendered in the Prometheus text format
+
+    Recording is a bisect and a few dict increments under one lock, cheap
+    enough to leave on for every request on a Pi. With a SharedState store
+    configured, a daemon thread pushes each worker's increments into the
+    shared counters table every flush_interval seconds, so /metrics on any
+    worker reports totals for all of them (less the last few seconds of
+    the others). Collectors add gauges computed at scrape time.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._meta = {}       # name -> (type, help)
+        self._values = {}     # (name, labels, field) -> number
+        self._flushed = {}    # same keys -> amount already pushed to the store
+        self._collectors = []
+        self.store = None
+        self.flush_interval = 10
+        self._flusher = None
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    def configure(self, store=None, flush_interval=10):
+        """Aggregate across worker processes through store (a SharedState)"""
+        self.store = store
+        self.flush_interval = flush_interval
+        if store is not None and self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def collector(self, fn):
+        """Register fn() -> [(name, type, help, [(labels, value), ...]), ...], called per scrape"""
+        self._collectors.append(fn)
+        return fn
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration in histogram name"""
+        key = (name, _label_str(labels))
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        values = self._values
+        with self.lock:
+            field = key + (bucket,)
+            values[field] = values.get(field, 0) + 1
+            field = key + ('sum',)
+            values[field] = values.get(field, 0.0) + seconds
+            field = key + ('count',)
+            values[field] = values.get(field, 0) + 1
+
+    def inc(self, name, amount=1, **labels):
+        """Add to counter name"""
+        field = (name, _label_str(labels), 'value')
+        with self.lock:
+            self._values[field] = self._values.get(field, 0) + amount
+
+    # ------------------------------------------------------------------------
+    # Cross-worker aggregation
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _store_name(key):
+        name, labels, field = key
+        if field == 'sum':
+            # The counters table holds integers: keep sums in microseconds
+            field = 'sum_us'
+        return f"{STORE_PREFIX}{name}|{labels}|{field}"
+
+    def flush(self):
+        """Push increments since the last flush to the store"""
+        if self.store is None:
+            return
+        with self._flush_lock:
+            with self.lock:
+                snapshot = dict(self._values)
+            amounts = {}
+            flushed = {}
+            for key, value in snapshot.items():
+                delta = value - self._flushed.get(key, 0)
+                if key[2] == 'sum':
+                    delta = int(delta * 1_000_000)
+                    value = self._flushed.get(key, 0) + delta / 1_000_000
+                if delta:
+                    amounts[self._store_name(key)] = delta
+                    flushed[key] = value
+            if amounts:
+                self.store.incr_many(amounts)
+                self._flushed.update(flushed)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("Metrics flush failed", error=str(e))
+
+    def _aggregated(self):
+        """(name, labels, field) -> value over every worker, or this one alone"""
+        if self.store is None:
+            with self.lock:
+                return dict(self._values)
+        self.flush()
+        values = {}
+        for store_name, value in self.store.counters().items():
+            if not store_name.startswith(STORE_PREFIX):
+                continue
+            name, labels, field = store_name[len(STORE_PREFIX):].split('|', 2)
+            if field == 'sum_us':
+                field, value = 'sum', value / 1_000_000
+            elif field not in ('count', 'value'):
+                field = int(field)
+            values[(name, labels, field)] = value
+        return values
+
+    # ------------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------------
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        families = {}
+        for (name, labels, field), value in self._aggregated().items():
+            families.setdefault(name, {}).setdefault(labels, {})[field] = value
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text = self._meta.get(name, ('untyped', ''))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, fields in sorted(families[name].items()):
+                if 'value' in fields:
+                    lines.append(f"{name}{{{labels}}} {_format_value(fields['value'])}" if labels else f"{name} {_format_value(fields['value'])}")
+                    continue
+                prefix = labels + ',' if labels else ''
+                cumulative = 0
+                for index, bound in enumerate(self.buckets + (float('inf'),)):
+                    cumulative += fields.get(index, 0)
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                suffix = f"{{{labels}}}" if labels else ''
+                lines.append(f"{name}_sum{suffix} {_format_value(float(fields.get('sum', 0.0)))}")
+                lines.append(f"{name}_count{suffix} {fields.get('count', 0)}")
+
+        for collect in self._collectors:
+            try:
+                gathered = collect()
+            except Exception as e:
+                log.error("Metrics collector failed", collector=getattr(collect, '__name__', repr(collect)), error=str(e))
+                continue
+            for name, kind, help_text, samples in gathered:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_str = _label_str(labels)
+                    lines.append(f"{name}{{{label_str}}} {_format_value(value)}" if label_str else f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# ============================================================================
+# STAGE CLOCK
+# ============================================================================
+class StageClock:
+    """Times consecutive stages of one request
+
+    lap(stage) closes the stage that has just run: its duration goes into
+    the stage histogram and into `timings` (milliseconds), which the API
+    layer turns into a Server-Timing header.
+    """
+    def __init__(self, timings=None, registry=None):
+        self.timings = {} if timings is None else timings
+        self.registry = registry or REGISTRY
+        self.started = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + elapsed * 1000, 2)
+        self.registry.observe('pathfinder_stage_seconds', elapsed, stage=stage)
+
+    def finish(self, outcome):
+        """Record the whole request under its outcome; returns seconds elapsed"""
+        elapsed = time.perf_counter() - self.started
+        self.timings['total'] = round(elapsed * 1000, 2)
+        self.registry.observe('pathfinder_request_seconds', elapsed, outcome=outcome)
+        return elapsed
+
+
+def server_timing(timings):
+    """Server-Timing header value for a {stage: milliseconds} dict"""
+    return ', '.join(f"{stage};dur={ms}" for stage, ms in timings.items())
+
+
+# One registry per process
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('pathfinder_stage_seconds', 'histogram', 'Time spent in each stage of answering a question')
+REGISTRY.describe('pathfinder_request_seconds', 'histogram', 'Time to answer a question, by how it was answered')
+REGISTRY.describe('pathfinder_pdf_seconds', 'histogram', 'Time spent generating itinerary PDFs, by step')
+REGISTRY.describe('pathfinder_degraded_total', 'counter', 'Optional pipeline stages skipped to meet a request deadline')
+REGISTRY.describe('pathfinder_admitted_total', 'counter', 'Requests admitted by the overload controller, by tier')
+REGISTRY.describe('pathfinder_deadline_exceeded_total', 'counter', 'Requests refused because their deadline passed while queued')
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def unit(vectors):
+    """Row-normalize so cosine similarity is a plain dot product"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def mmr(query_embedding, candidate_embeddings, k, diversity_weight=0.7):
+    """Indices of up to k candidates by maximal marginal relevance, in pick order
+
+    Each pick maximizes
+        w * sim(query, c) - (1 - w) * max(sim(c, s) for s already picked)
+    so w=1 is plain relevance order and lower w trades relevance for
+    novelty. All similarities come from one (n x n) matrix product; each
+    pick then updates a running max instead of rescanning the picks.
+    """
+    candidates = unit(candidate_embeddings)
+    count = len(candidates)
+    if count == 0 or k <= 0:
+        return []
+
+    relevance = candidates @ unit(query_embedding)
+    similarity = candidates @ candidates.T
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+
+    picked = []
+    for _ in range(min(k, count)):
+        scores = diversity_weight * relevance - (1 - diversity_weight) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
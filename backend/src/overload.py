@@ -0,0 +1,107 @@
+import math
+import threading
+import time
+
+from logger import get_logger
+from metrics import REGISTRY
+
+log = get_logger("overload")
+
+TIER_FULL = 'full'
+TIER_REDUCED = 'reduced'
+TIER_SHED = 'shed'
+TIERS = (TIER_FULL, TIER_REDUCED, TIER_SHED)
+
+
+# ============================================================================
+# OVERLOAD CONTROLLER
+# ============================================================================
+class OverloadController:
+    """Admission control for /api/ai in three tiers
+
+    full     the whole pipeline on the executor
+    reduced  exact cache tier plus lexical retrieval, off the executor
+    shed     an immediate 503 with Retry-After
+
+    The tier for a new request follows two signals: requests queued for a
+    pipeline thread right now, and a smoothed queue wait. The wait is an
+    exponentially weighted average of recent waits that also halves every
+    `half_life` seconds without a new sample, so once reduced-tier traffic
+    stops feeding the queue the estimate decays and full service resumes
+    on its own. The executor's max_queue remains the hard limit behind
+    all of this.
+    """
+    def __init__(self, executor, reduced_queue=4, shed_queue=12, reduced_wait=0.5, shed_wait=2.0,
+                 half_life=5.0, alpha=0.3):
+        self.executor = executor
+        self.reduced_queue = reduced_queue
+        self.shed_queue = shed_queue
+        self.reduced_wait = reduced_wait
+        self.shed_wait = shed_wait
+        self.half_life = half_life
+        self.alpha = alpha
+
+        self.lock = threading.Lock()
+        self._wait = 0.0
+        self._sampled_at = time.monotonic()
+        self.tier = TIER_FULL
+        self.admitted = {tier: 0 for tier in TIERS}
+        self.transitions = 0
+
+    @classmethod
+    def from_config(cls, config, executor):
+        overload_conf = (config or {}).get('overload', {})
+        return cls(
+            executor,
+            reduced_queue=overload_conf.get('reduced_queue', 4),
+            shed_queue=overload_conf.get('shed_queue', 12),
+            reduced_wait=overload_conf.get('reduced_wait', 0.5),
+            shed_wait=overload_conf.get('shed_wait', 2.0),
+            half_life=overload_conf.get('half_life', 5.0)
+        )
+
+    def _decayed(self, now):
+        return self._wait * math.pow(0.5, (now - self._sampled_at) / self.half_life)
+
+    def observe_wait(self, seconds):
+        """Feed the time one full-tier request waited for a pipeline thread"""
+        now = time.monotonic()
+        with self.lock:
+            self._wait = self._decayed(now) * (1 - self.alpha) + seconds * self.alpha
+            self._sampled_at = now
+
+    def queue_wait(self):
+        """Smoothed queue wait, in seconds"""
+        with self.lock:
+            return self._decayed(time.monotonic())
+
+    def admit(self):
+        """Tier for a request arriving now"""
+        queued = self.executor.stats()['queued']
+        wait = self.queue_wait()
+        if queued >= self.shed_queue or wait >= self.shed_wait:
+            tier = TIER_SHED
+        elif queued >= self.reduced_queue or wait >= self.reduced_wait:
+            tier = TIER_REDUCED
+        else:
+            tier = TIER_FULL
+
+        with self.lock:
+            self.admitted[tier] += 1
+            changed = tier != self.tier
+            if changed:
+                self.tier = tier
+                self.transitions += 1
+        if changed:
+            log.warning("Overload tier changed", tier=tier, queued=queued, queue_wait=round(wait, 3))
+        REGISTRY.inc('pathfinder_admitted_total', tier=tier)
+        return tier
+
+    def stats(self):
+        with self.lock:
+            return {
+                'tier': self.tier,
+                'queue_wait': round(self._decayed(time.monotonic()), 3),
+                'admitted': dict(self.admitted),
+                'transitions': self.transitions
+            }
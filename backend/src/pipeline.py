@@ -1,66 +1,139 @@
-import chromadb
-from chromadb.utils import embedding_functions
 import json
-import torch
-import requests
 import time
 import os
 from dotenv import load_dotenv
 import re
-import uuid
-from better_profanity import profanity
 import hashlib
 import yaml
+import numpy as np
 from pathlib import Path
 from controller import Controller
 from entity_extractor import EntityExtractor
-from sentence_transformers import SentenceTransformer
-from collections import deque
+from enhancer import BackgroundEnhancer
+from job_store import JobStore
+from shared_state import SharedState
+from inference import LocalEncoder, VectorStore, InferenceClient
+from translator import Translator
+from lexicon import merge_keywords
+from profanity_filter import ProfanityFilter
+from connectivity import get_monitor
+from metrics import REGISTRY, StageClock
+from deadline import DeadlineExceeded
+from lexical import LexicalIndex
+from memo import TTLMemo
+from mmr import mmr
+from canonical import QueryCanonicalizer
+from intent_classifier import IntentClassifier
+from logger import configure as configure_logging, get_logger
 import threading
-from queue import Queue
+
+log = get_logger("pipeline")
 
 BASE_DIR = Path(__file__).parent 
 DATASET = BASE_DIR / "dataset" / "dataset.json"
 CONFIG = BASE_DIR / "config" / "config.yaml"
 CHROMA_STORAGE = BASE_DIR.parent.parent / "chroma_storage" 
 
+# Queries asking for several results
+LISTING_WORDS = ['all', 'top', 'best', 'list', 'recommend', 'show me', 'what are', 'multiple']
+
+# Joins that make one message several questions ("surfing and food in Virac")
+CONJUNCTIONS = re.compile(r',|\b(?:and|also|then|saka|tsaka|tapos|asin)\b')
+
+# Optional stages of ask() and the spare budget (seconds) each needs to run
+STAGE_BUDGETS = {
+    'semantic_cache': 0.05,   # query embedding + Chroma lookup under the cache lock
+    'translate': 0.3,         # network round trip, capped at the spare budget
+}
+
 # ============================================================================
 # SEMANTIC CACHE - NEW COMPONENT (PERSISTENT)
 # ============================================================================
 class SemanticCache:
-    """Fast vector-based cache with ChromaDB persistence"""
-    def __init__(self, client, embedding_function, collection_name="query_cache", similarity_threshold=0.88):
+    """Fast vector-based cache with ChromaDB persistence
+
+    With a SharedState attached, an exact-match tier sits in front of the
+    vector lookup and holds the authoritative answer and version for every
+    cached query, so all worker processes see the same enhanced answers
+    even though each keeps its own Chroma index in memory.
+
+    The exact tier is keyed on the canonical cache key; the vector tier
+    embeds the question as asked (lowercased and trimmed), since the
+    embedding model understands sentences, not token bags. Each vector
+    entry records its cache key in the 'key' metadata field.
+    """
+    def __init__(self, cache_collection, similarity_threshold=0.88, shared_state=None):
         self.similarity_threshold = similarity_threshold
+        self.shared_state = shared_state
         self.lock = threading.Lock()
-        
-        # Try to get or create persistent cache collection
-        try:
-            self.cache_collection = client.get_collection(
-                name=collection_name,
-                embedding_function=embedding_function
-            )
-            print(f"[CACHE] Loaded existing cache collection with {self.cache_collection.count()} entries")
-        except Exception:
-            self.cache_collection = client.create_collection(
-                name=collection_name,
-                embedding_function=embedding_function,
-                metadata={"hnsw:space": "cosine"}  # Use cosine similarity
-            )
-            print(f"[CACHE] Created new cache collection")
+        # Separate from self.lock, which get() holds while it counts
+        self.counter_lock = threading.Lock()
+        self.counters = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+        # Local Chroma collection or a RemoteCollection served by the inference sidecar
+        self.cache_collection = cache_collection
     
-    def get(self, query):
-        """Check if similar query exists in cache"""
+    def _count(self, name):
+        with self.counter_lock:
+            self.counters[name] += 1
+        if self.shared_state is not None:
+            try:
+                self.shared_state.incr(f"cache_{name}")
+            except Exception as e:
+                log.error("Cache counter update failed", error=str(e))
+
+    def stats(self):
+        """Hit counters - summed over all workers when shared"""
+        if self.shared_state is not None:
+            shared = self.shared_state.counters()
+            counters = {name: shared.get(f"cache_{name}", 0) for name in self.counters}
+            counters['exact_entries'] = self.shared_state.exact_count()
+            return counters
+        with self.counter_lock:
+            return dict(self.counters)
+
+    @staticmethod
+    def _document(text):
+        """What the vector tier embeds for a question"""
+        return text.strip().lower()
+
+    def _exact(self, query):
+        if self.shared_state is None:
+            return None
+        try:
+            return self.shared_state.exact_get(query)
+        except Exception as e:
+            log.error("Exact cache lookup failed", error=str(e))
+            return None
+
+    def get(self, query, semantic=True, question=None):
+        """Check if similar query exists in cache; semantic=False stops after the exact tier
+
+        query is the cache key; question, the user's wording, is what the
+        vector tier compares (default: the key).
+        """
+        exact = self._exact(query)
+        if exact:
+            log.debug("Cache hit", tier="exact", version=exact[2], query=query[:50])
+            self._count('exact_hits')
+            return exact
+
+        if not semantic:
+            self._count('misses')
+            return None
+
         if self.cache_collection.count() == 0:
+            self._count('misses')
             return None
         
         with self.lock:
             try:
                 results = self.cache_collection.query(
-                    query_texts=[query],
+                    query_texts=[self._document(question or query)],
                     n_results=1
                 )
                 
                 if not results['documents'][0]:
+                    self._count('misses')
                     return None
                 
                 distance = results['distances'][0][0]
@@ -68,7 +141,8 @@ class SemanticCache:
                 
                 if similarity >= self.similarity_threshold:
                     metadata = results['metadatas'][0][0]
-                    cached_query = results['documents'][0][0]
+                    # Entries from before canonical keys store the key as their document
+                    cached_query = metadata.get('key', results['documents'][0][0])
                     answer = metadata.get('answer', '')
                     places = metadata.get('places', '[]')
                     # NEW: Get the version flag
@@ -80,20 +154,28 @@ class SemanticCache:
                     except:
                         places_list = []
                     
-                    print(f"[CACHE HIT] Similarity: {similarity:.3f} | Ver: {version} | '{cached_query[:30]}...'")
+                    # Another worker may have enhanced it since this index was loaded
+                    fresher = self._exact(cached_query)
+                    if fresher:
+                        answer, places_list, version = fresher
+                    
+                    log.debug("Cache hit", tier="semantic", similarity=similarity, version=version, query=cached_query[:50])
+                    self._count('semantic_hits')
                     
                     # NEW: Return version too
                     return (answer, places_list, version) 
                 
-                print(f"[CACHE MISS] Best similarity: {similarity:.3f}")
+                log.debug("Cache miss", similarity=similarity)
+                self._count('misses')
                 return None
                 
             except Exception as e:
-                print(f"[CACHE ERROR] {e}")
+                log.error("Cache lookup failed", error=str(e))
+                self._count('misses')
                 return None
     
-    def set(self, query, answer, places):
-        """Store query-answer pair in cache"""
+    def set(self, query, answer, places, question=None):
+        """Store query-answer pair in cache under the key query, embedding question"""
         import json
         
         with self.lock:
@@ -103,8 +185,9 @@ class SemanticCache:
                 
                 # Store in ChromaDB
                 self.cache_collection.add(
-                    documents=[query],
+                    documents=[self._document(question or query)],
                     metadatas=[{
+                        "key": query,
                         "answer": answer,
                         "places": json.dumps(places),  # Store as JSON string
                         "timestamp": time.time(),
@@ -113,26 +196,36 @@ class SemanticCache:
                     ids=[cache_id]
                 )
                 
-                print(f"[CACHE SET] Stored: '{query[:50]}...' (id: {cache_id})")
+                log.debug("Cache set", query=query[:50], cache_id=cache_id)
+                
+                if self.shared_state is not None:
+                    self.shared_state.exact_set(query, answer, places)
                 
             except Exception as e:
-                print(f"[CACHE SET ERROR] {e}")
+                log.error("Cache set failed", error=str(e))
     
-    def update(self, query, enhanced_answer):
-        """Update existing cache entry with enhanced version"""
+    def update(self, query, enhanced_answer, question=None):
+        """Update existing cache entry with enhanced version (see get() for question)"""
         import json
         
+        exact_updated = False
+        if self.shared_state is not None:
+            try:
+                exact_updated = self.shared_state.exact_update(query, enhanced_answer)
+            except Exception as e:
+                log.error("Cache update failed", tier="exact", error=str(e))
+        
         with self.lock:
             try:
                 # Find the most similar entry
                 results = self.cache_collection.query(
-                    query_texts=[query],
+                    query_texts=[self._document(question or query)],
                     n_results=1
                 )
                 
                 if not results['documents'][0]:
-                    print(f"[CACHE UPDATE FAILED] No entry found for: '{query[:50]}...'")
-                    return False
+                    log.warning("Cache update found no entry", query=query[:50])
+                    return exact_updated
                 
                 distance = results['distances'][0][0]
                 similarity = 1 - distance
@@ -140,11 +233,13 @@ class SemanticCache:
                 if similarity >= self.similarity_threshold:
                     cache_id = results['ids'][0][0]
                     old_metadata = results['metadatas'][0][0]
+                    cached_query = old_metadata.get('key', results['documents'][0][0])
                     
                     # Update the entry with enhanced answer
                     self.cache_collection.update(
                         ids=[cache_id],
                         metadatas=[{
+                            "key": cached_query,
                             "answer": enhanced_answer,
                             "places": old_metadata.get('places', '[]'),
                             "timestamp": time.time(),
@@ -152,195 +247,18 @@ class SemanticCache:
                         }]
                     )
                     
-                    print(f"[CACHE UPDATED] Enhanced: '{query[:50]}...' (id: {cache_id})")
-                    return True
-                
-                print(f"[CACHE UPDATE FAILED] Similarity too low: {similarity:.3f}")
-                return False
-                
-            except Exception as e:
-                print(f"[CACHE UPDATE ERROR] {e}")
-                return False
-
-
-# ============================================================================
-# BACKGROUND ENHANCER - NEW COMPONENT
-# ============================================================================
-class BackgroundEnhancer:
-    """Background worker for Gemini-based answer enhancement"""
-    def __init__(self, api_key, cache, config):
-        self.api_key = api_key
-        self.cache = cache
-        self.config = config
-        self.job_queue = Queue()
-        self.worker_thread = None
-        self.running = False
-    
-    def start(self):
-        """Start background worker thread"""
-        if self.worker_thread is not None:
-            print("[ENHANCER] Already running")
-            return
-        
-        self.running = True
-        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self.worker_thread.start()
-        print("[ENHANCER] Background worker started")
-    
-    def stop(self):
-        """Stop background worker"""
-        self.running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=2)
-        print("[ENHANCER] Background worker stopped")
-    
-    def enqueue(self, query, raw_facts, raw_answer):
-        """Add enhancement job to queue"""
-        job = {
-            'query': query,
-            'raw_facts': raw_facts,
-            'raw_answer': raw_answer,
-            'timestamp': time.time()
-        }
-        self.job_queue.put(job)
-        print(f"[ENHANCER] Job queued: '{query[:50]}...'")
-    
-    def _worker_loop(self):
-        """Main worker loop - processes jobs"""
-        print("[ENHANCER] Worker loop started")
-        while self.running:
-            try:
-                # Wait for job (timeout to check running flag)
-                job = self.job_queue.get(timeout=1)
-                
-                print(f"[ENHANCER] Processing: '{job['query'][:50]}...'")
-                
-                try:
-                    enhanced = self._enhance_with_gemini(job)
+                    if self.shared_state is not None and cached_query != query:
+                        self.shared_state.exact_update(cached_query, enhanced_answer)
                     
-                    if enhanced:
-                        # Filter profanity from enhanced response
-                        # Use the global profanity instance (already initialized in Pipeline.__init__)
-                        from better_profanity import profanity
-                        # Ensure profanity is initialized (in case it wasn't)
-                        if not profanity.CENSOR_WORDSET:
-                            profanity.load_censor_words()
-                            if 'profanity' in self.config:
-                                profanity.add_censor_words(self.config['profanity'])
-                        enhanced = profanity.censor(enhanced)
-                        
-                        # Update cache with enhanced version
-                        success = self.cache.update(job['query'], enhanced)
-                        if success:
-                            print(f"[ENHANCER] ✓ Job completed and cached")
-                        else:
-                            print(f"[ENHANCER] ⚠ Enhanced but cache update failed")
-                    else:
-                        print(f"[ENHANCER] ✗ Enhancement failed, keeping raw answer")
-                except Exception as job_error:
-                    print(f"[ENHANCER] Job processing error: {job_error}")
-                    import traceback
-                    traceback.print_exc()
+                    log.debug("Cache updated", version="enhanced", query=query[:50], cache_id=cache_id)
+                    return True
                 
-                self.job_queue.task_done()
+                log.warning("Cache update found no close entry", similarity=similarity)
+                return exact_updated
                 
             except Exception as e:
-                # Handle queue.Empty gracefully
-                if "Empty" not in str(type(e).__name__):
-                    print(f"[ENHANCER] Loop error: {type(e).__name__}: {e}")
-                continue
-        
-        print("[ENHANCER] Worker loop stopped")
-    
-    def _enhance_with_gemini(self, job):
-        """Final Robust Version: Handles Safety Refusals & Empty Responses"""
-        if not self.api_key:
-            return None
-        
-        # Use the alias that always points to the current stable model
-        model_name = "gemini-flash-latest"
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={self.api_key}"
-
-        prompt = f"""You are Pathfinder — a calm, polite, helpful, always excited Catanduanes tourism assistant. Your responses should sound gentle, clear, and factual, while maintaining a friendly tone.
-
-USER QUESTION: {job['query']}
-FACTUAL INFO: {job['raw_facts']}
-
-Respond in a helpful way using only the information from the facts. 
-If the facts partially match the query, answer as best as possible using the facts.
-Do not make up information not in the facts.
-Respond in the same language as the tourist's question.
-
-Use only the information from the facts. Summarize the facts into a cohesive answer. Do not just list them one by one.
-Give a single, concise, and natural-sounding sentence, include all the facts and the place mentioned.
-Connect the ideas naturally (e.g., use "You can also try..." instead of just a comma).
-Do not add greetings or extra commentary be direct yet kind. You may include exclamation marks to sound excited.
-If you detect any profanity in any language, return "I am unable to process that language. Please ask your question politely so I can assist you with Catanduanes tourism."""
-        
-        payload = {
-            'contents': [{'parts': [{'text': prompt}]}],
-            'generationConfig': {'temperature': 0.7, 'maxOutputTokens': 600}
-        }
-        
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Check if we have candidates
-                if 'candidates' not in result or not result['candidates']:
-                    return None
-                
-                candidate = result['candidates'][0]
-                
-                # CHECK 1: Did the model finish successfully?
-                if 'content' not in candidate:
-                    return None
-                    
-                # CHECK 2: Does the content have parts?
-                content = candidate['content']
-                if 'parts' not in content or not content['parts']:
-                    return None
-                    
-                # Success
-                return content['parts'][0]['text'].strip()
-
-            elif response.status_code == 503:
-                # print("[ENHANCER] Server Busy")
-                return None
-            else:
-                # print(f"[ENHANCER] API Error {response.status_code}")
-                return None
-
-        except Exception as e:
-            # print(f"[ENHANCER] Error: {e}")
-            return None
-
-# ============================================================================
-# RATE LIMITER (unchanged)
-# ============================================================================
-class RateLimiter:
-    def __init__(self, max_request, period_seconds):
-        self.max_request = max_request
-        self.period_seconds = period_seconds
-        self.timestamps = deque()
-
-    def is_allowed(self):
-        now = time.time()
-        while self.timestamps and self.timestamps[0] < now - self.period_seconds:
-            self.timestamps.popleft()
-        if len(self.timestamps) < self.max_request:
-            self.timestamps.append(now)
-            return True
-        return False
-    
-    def get_remaining_time(self):
-        if not self.timestamps:
-            return 0
-        now = time.time()
-        expiry = self.timestamps[0] + self.period_seconds
-        return max(0, int(expiry - now))
+                log.error("Cache update failed", tier="semantic", error=str(e))
+                return exact_updated
 
 
 # ============================================================================
@@ -350,179 +268,152 @@ class Pipeline:
     def __init__(self, dataset_path=str(DATASET), db_path=str(CHROMA_STORAGE), config_path=str(CONFIG)):
         
         self.config = self.load_config(config_path)
-        print(f"[INFO] Loaded config")
+        configure_logging(self.config)
+        log.info("Loaded config", path=config_path)
         load_dotenv()
-        self.internet_status = True
-        
-        # Initialize rate limiter
-        sec_conf = self.config.get('security', {})
-        rate_limit_conf = sec_conf.get('rate_limit', {})
-        max_req = rate_limit_conf.get('max_request', 5)
-        period = rate_limit_conf.get('period_seconds', 60)
-        self.limiter = RateLimiter(max_request=max_req, period_seconds=period)
-        print(f"[INFO] Rate limiter: {max_req}/{period}s")
-        
-        # Setup RAG model
-        RAG_MODEL = os.path.join(os.path.dirname(__file__), "..", "models", self.config['rag']['model_path'])
-        # Fallback to direct model name if local path doesn't exist
-        if not os.path.exists(RAG_MODEL):
-            RAG_MODEL = self.config['rag']['model_path']
-        
-        self.raw_model = SentenceTransformer(RAG_MODEL, device="cpu")
-        self.client = chromadb.PersistentClient(path=db_path)
-        self.embedding = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=RAG_MODEL, device="cpu"
+        # Probed in the background; network stages read it instead of timing out
+        self.connectivity = get_monitor(self.config)
+        # Cache keys: differently worded versions of one question share an entry
+        self.canonicalizer = QueryCanonicalizer.from_config(self.config)
+        # Names like "The Lumber Hotel and Resort" must not read as two questions
+        self.joined_names = sorted(
+            {self.squash(name) for name in [*self.config['places'], *self.config.get('protected_places', [])]
+             if CONJUNCTIONS.search(self.squash(name))},
+            key=len, reverse=True
+        )
+        
+        # Embedding model and vector store: in this process, or in the inference sidecar
+        inference_conf = self.config.get('inference', {})
+        self.inference_mode = inference_conf.get('mode', 'local')
+        if self.inference_mode == 'sidecar':
+            client = InferenceClient.from_config(self.config)
+            log.info("Connecting to inference sidecar", socket=client.socket_path)
+            client.ping()
+            self.encoder = client
+            self.collection = client.collection(self.config['rag']['collection_name'])
+            cache_collection = client.collection(self.config.get('cache', {}).get('collection_name', 'query_cache'))
+        else:
+            # Requests run concurrently on the pipeline executor; give each a share of
+            # the cores instead of letting every encode fan out across all of them
+            executor_conf = self.config.get('executor', {})
+            torch_threads = executor_conf.get('torch_threads')
+            if not torch_threads:
+                # WEB_CONCURRENCY: uvicorn worker processes sharing the machine
+                processes = int(os.getenv('WEB_CONCURRENCY', 1))
+                threads = executor_conf.get('workers') or os.cpu_count() or 1
+                torch_threads = max(1, (os.cpu_count() or 1) // (threads * processes))
+            
+            # One model instance, shared by the controller and both collections
+            self.encoder = LocalEncoder.from_config(self.config, torch_threads=torch_threads)
+            store = VectorStore(self.config, self.encoder, dataset_path, db_path)
+            self.collection = store.collection
+            cache_collection = store.cache_collection
+        log.info("Inference ready", mode=self.inference_mode)
+        
+        # State shared by every worker process (rate limits, exact cache tier, counters)
+        shared_conf = self.config.get('shared_state', {})
+        os.makedirs(db_path, exist_ok=True)
+        self.shared_state = SharedState(
+            os.path.join(db_path, shared_conf.get('path', 'shared_state.db')),
+            exact_max_entries=self.config.get('cache', {}).get('exact_max_entries', 5000),
+            prune_interval=shared_conf.get('prune_interval', 60)
+        )
+        # Stage histograms are summed across workers through the same store
+        REGISTRY.configure(
+            store=self.shared_state,
+            flush_interval=self.config.get('metrics', {}).get('flush_interval', 10)
         )
         
         # Initialize semantic cache (NEW - uses separate ChromaDB collection)
         cache_threshold = self.config.get('cache', {}).get('similarity_threshold', 0.88)
-        cache_collection_name = self.config.get('cache', {}).get('collection_name', 'query_cache')
         self.semantic_cache = SemanticCache(
-            client=self.client,
-            embedding_function=self.embedding,
-            collection_name=cache_collection_name,
-            similarity_threshold=cache_threshold
+            cache_collection,
+            similarity_threshold=cache_threshold,
+            shared_state=self.shared_state
         )
-        print(f"[INFO] Semantic cache initialized (threshold: {cache_threshold})")
+        log.info("Semantic cache initialized", threshold=cache_threshold)
+        
+        # Profanity filter - compiled once per process, read-only afterwards
+        self.profanity = ProfanityFilter.from_config(self.config)
         
         # Initialize background enhancer (NEW)
         gemini_key = os.getenv('GEMINI_API_KEY')
         if gemini_key:
-            print(f"[INFO] Gemini API key loaded (ends with: ...{gemini_key[-4:]})")
+            log.info("Gemini API key loaded", key_suffix=gemini_key[-4:])
         else:
-            print("[WARN] No GEMINI_API_KEY in environment - background enhancement disabled")
+            log.warning("No GEMINI_API_KEY in environment - Gemini enhancement disabled")
         
-        self.enhancer = BackgroundEnhancer(gemini_key, self.semantic_cache, self.config)
+        # Durable job store so pending enhancements survive restarts
+        enhancer_conf = self.config.get('enhancer', {})
+        job_store = JobStore(
+            os.path.join(db_path, enhancer_conf.get('job_store', 'enhancer_jobs.db')),
+            visibility_timeout=enhancer_conf.get('visibility_timeout', 120)
+        )
+        self.enhancer = BackgroundEnhancer(
+            gemini_key, self.semantic_cache, self.config,
+            job_store=job_store, connectivity=self.connectivity,
+            profanity=self.profanity
+        )
         self.enhancer.start()
-        print("[INFO] Background enhancer started")
-        
-        # Initialize controller and entity extractor
-        self.controller = Controller(self.config, self.raw_model)
-        print("[INFO] Rule-based controller initialized")
-        self.entity_extractor = EntityExtractor(self.config)
-        print("[INFO] Entity extractor initialized")
+        log.info("Background enhancer started")
         
-        # Profanity filter
-        profanity.load_censor_words()
-        profanity.add_censor_words(self.config['profanity'])
+        # Translation to English (fast path for English, cached, hard timeout).
+        # In "off" mode queries are embedded as typed (the model is multilingual)
+        # and the rules below get the Tagalog/Bikol lexicon instead.
+        self.translation_mode = str(self.config.get('translation', {}).get('mode', 'on')).lower()
+        self.translator = Translator.from_config(self.config, db_path)
+        self.lexicon = self.config.get('lexicon', {}) if self.translation_mode == 'off' else None
+        self.keywords = merge_keywords(self.config['keywords'], self.lexicon)
+        log.info("Translation configured", mode=self.translation_mode)
         
-        # Setup ChromaDB collection (unchanged logic)
-        current_data_hash = self.dataset_hash(dataset_path)
-        stored_hash = None
-        hash_file_path = os.path.join(db_path, self.config['system']['hash_file'])
+        # Request deadlines: optional stages are skipped when the budget runs low
+        self.stage_budgets = {**STAGE_BUDGETS, **self.config.get('deadline', {}).get('min_remaining', {})}
         
-        if os.path.exists(hash_file_path):
-            with open(hash_file_path, 'r') as f:
-                stored_hash = f.read().strip()
+        # Initialize controller and entity extractor
+        self.intent_classifier = IntentClassifier.from_config(self.config, dim=getattr(self.encoder, 'dim', None))
+        self.controller = Controller(self.config, self.encoder, lexicon=self.lexicon, classifier=self.intent_classifier)
+        log.info("Rule-based controller initialized")
+        self.entity_extractor = EntityExtractor(self.config, lexicon=self.lexicon)
+        log.info("Entity extractor initialized")
         
-        rebuild_required = (current_data_hash is None)
+        # Stage memo tables: differently worded queries that a semantic cache miss
+        # still translates to the same text reuse its entities and search results
+        self.entity_memo = TTLMemo.from_config(self.config, 'entities', max_entries=2000, ttl=3600)
+        self.search_memo = TTLMemo.from_config(self.config, 'search', max_entries=1000, ttl=600)
         
-        try:
-            # This is the STATIC collection (your original dataset)
-            self.collection = self.client.get_collection(
-                name=self.config['rag']['collection_name'],
-                embedding_function=self.embedding
-            )
-            if stored_hash == current_data_hash and current_data_hash is not None:
-                print("[INFO] Using existing STATIC dataset")
-                rebuild_required = False
-            else:
-                print("[INFO] STATIC dataset rebuild required")
-                rebuild_required = True
-        except Exception:
-            rebuild_required = True
-        
-        if rebuild_required:
-            try:
-                self.client.delete_collection(name=self.config['rag']['collection_name'])
-            except:
-                pass
-            
-            self.collection = self.client.create_collection(
-                name=self.config['rag']['collection_name'],
-                embedding_function=self.embedding
-            )
-            self.load_dataset(dataset_path)
-            
-            os.makedirs(db_path, exist_ok=True)
-            with open(hash_file_path, 'w') as f:
-                f.write(current_data_hash)
-            print("[INFO] STATIC dataset rebuilt and loaded")
+        # Model-free retriever for the overload controller's reduced tier
+        self.lexical = LexicalIndex.from_dataset(dataset_path)
+        log.info("Lexical index built", **self.lexical.stats())
+
+    @property
+    def internet_status(self):
+        return self.connectivity.online
 
     def load_config(self, config_path):
         try:
             with open(config_path, 'r', encoding='utf-8') as f:
                 return yaml.safe_load(f)
         except FileNotFoundError:
-            print(f"Config file not found: {config_path}")
+            log.error("Config file not found", path=config_path)
             exit(1)
         except yaml.YAMLError as e:
-            print(f"Invalid YAML: {e}")
+            log.error("Invalid YAML", path=config_path, error=str(e))
             exit(1)
 
-    def dataset_hash(self, dataset_path):
-        hasher = hashlib.md5()
-        try:
-            with open(dataset_path, 'rb') as f:
-                hasher.update(f.read())
-            return hasher.hexdigest()
-        except FileNotFoundError:
-            return None
-
-    def load_dataset(self, dataset_path):
-        try:
-            with open(dataset_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            print(f"Dataset not found: {dataset_path}")
-            exit(1)
-        except json.JSONDecodeError as e:
-            print(f"Invalid JSON: {e}")
-            exit(1)
-        
-        documents = []
-        metadatas = []
-        ids = []
-        
-        for idx, item in enumerate(data):
-            if 'input' not in item or 'output' not in item:
-                continue
-            
-            documents.append(item['input'])
-            
-            meta = {
-                "question": item['input'],
-                "answer": item['output'],
-                "title": item.get('title', 'General Info'),
-                "topic": item.get('topic', 'General'),
-                "summary_offline": item.get('summary_offline', item['output'])
-            }
-            
-            # Optional filters
-            for field in ['budget', 'location', 'activities', 'group_type', 'skill_level']:
-                if field in item:
-                    meta[field] = item[field]
-            
-            metadatas.append(meta)
-            ids.append(str(idx))
-        
-        self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
-        print(f"[INFO] Loaded {len(documents)} Q&A pairs")
-
     def check_profanity(self, text):
-        return profanity.contains_profanity(text)
+        return self.profanity.contains_profanity(text)
     
     def censor_profanity(self, text):
         """Censor profanity in text before returning to user"""
         if not text:
             return text
-        return profanity.censor(text)
+        return self.profanity.censor(text)
 
     def normalize_query(self, text):
-        """Simple normalization - lowercase and trim"""
-        return text.strip().lower()
+        """Canonical cache key: folded, stopwords dropped, stemmed, synonyms and places mapped"""
+        return self.canonicalizer.canonicalize(text)
 
-    def protect(self, user_input):
+    def protect(self, user_input, timeout=None):
         """Protect place names during translation"""
         if not user_input or not user_input.strip():
             return user_input or ""
@@ -532,8 +423,9 @@ class Pipeline:
 
         for place_name in self.config['protected_places']:
             if place_name.lower() in temp.lower():
-                # Use UUID to avoid collision
-                marker = f"__PLACE_{uuid.uuid4().hex[:8]}__"
+                # Numbered, not random, so the same wording always yields the
+                # same protected text and the translation cache can hit
+                marker = f"__PLACE_{len(markers)}__"
                 temp = re.sub(
                     re.escape(place_name), 
                     marker, 
@@ -543,17 +435,11 @@ class Pipeline:
                 )
                 markers[marker] = place_name
 
-        try:
-            from deep_translator import GoogleTranslator
-
-            
-            if self.internet_status: # Only try if we know we have internet
-                temp = GoogleTranslator(source='auto', target='en').translate(temp)
-                print(f"[TRANSLATE] '{user_input}' → '{temp}'")
-        except Exception as e:
-            print(f"[TRANSLATE ERROR] {e}")
-            # Fallback: Just use the original input if translation fails
-            temp = user_input
+        # Skips English, checks the persistent cache, and never waits past its timeout
+        translated = self.translator.translate(temp, online=self.internet_status, timeout=timeout)
+        if translated != temp:
+            log.debug("Translated", source=user_input, target=translated)
+        temp = translated
 
         # Restore place names
         for marker, place_input in markers.items():
@@ -566,7 +452,7 @@ class Pipeline:
         found = []
         question_lower = question.lower()
         
-        for topic, words in self.config['keywords'].items():
+        for topic, words in self.keywords.items():
             for word in words:
                 pattern = r'\b' + re.escape(word) + r'\b'
                 if re.search(pattern, question_lower):
@@ -575,52 +461,188 @@ class Pipeline:
         
         return found if found else ['general']
 
-    def search(self, question, where_filter=None):
-        """Core RAG search - returns raw facts"""
-        print(f"[RAG SEARCH] Query: '{question[:50]}...'")
+    def build_where_filter(self, entities):
+        """ChromaDB metadata filter from extracted entities, or None
+
+        Activities are left to the embedding: dataset entries carry no
+        'activities' field, so filtering on it would match nothing.
+        """
+        constraints = []
+        if entities.get('places'):
+            constraints.append({"location": entities['places'][0]})
+        if entities.get('budget'):
+            constraints.append({"budget": entities['budget']})
+        if entities.get('group_type'):
+            constraints.append({"group_type": entities['group_type']})
+        if entities.get('skill_level'):
+            constraints.append({"skill_level": entities['skill_level']})
+        
+        if len(constraints) > 1:
+            return {"$and": constraints}
+        elif len(constraints) == 1:
+            return constraints[0]
+        return None
+
+    @staticmethod
+    def squash(text):
+        """Lowercase without in-word punctuation, so "E-Crown" and "ECrown" compare equal"""
+        return re.sub(r"[-'.]", '', text.lower())
+
+    def decompose(self, question, entities):
+        """(topic, place) sub-queries for a question joining several topics or places, else []
+
+        Several matches alone are not enough: "Where is Twin Rock Beach
+        Resort?" hits beaches and accommodation but asks one thing. Only a
+        conjunction in the question splits it.
+        """
+        topics = entities.get('activities') or []
+        places = entities.get('places') or []
+        if len(topics) < 2 and len(places) < 2:
+            return []
+        question_lower = self.squash(question)
+        for name in self.joined_names:
+            question_lower = question_lower.replace(name, ' ')
+        if not CONJUNCTIONS.search(question_lower):
+            return []
+        max_topics = self.config['rag'].get('max_topics', 4)
+        return [(topic, place) for topic in topics or [None] for place in places or [None]][:max_topics]
+
+    @classmethod
+    def matches(cls, metadata, where):
+        """Whether metadata satisfies a Chroma where filter of equalities, $and and $or"""
+        if not where:
+            return True
+        if '$and' in where:
+            return all(cls.matches(metadata, clause) for clause in where['$and'])
+        if '$or' in where:
+            return any(cls.matches(metadata, clause) for clause in where['$or'])
+        return all(metadata.get(field) == value for field, value in where.items())
+
+    def search_topics(self, question, entities, subqueries):
+        """search() for a multi-topic query: one batched retrieval, the best facts per topic
+
+        Each sub-query is the question narrowed to one (topic, place), with its
+        own embedding and place filter. Chroma
+        runs them all in one call under the $or of those filters, so each row
+        is then narrowed back to its own filter. Every topic contributes up to
+        rag.results_per_topic facts within rag.multi_topic_threshold, merged
+        in topic order up to the usual result count.
+        """
+        log.debug("RAG multi-topic search", query=question[:50], subqueries=subqueries)
+        rag_conf = self.config['rag']
+
+        texts = []
+        filters = []
+        for topic, place in subqueries:
+            texts.append(' '.join(part for part in (question, topic, place) if part))
+            filters.append(self.build_where_filter({**entities, 'places': [place] if place else []}))
+        distinct = [f for i, f in enumerate(filters) if f is not None and f not in filters[:i]]
+        if None in filters or not distinct:
+            where_filter = None
+        elif len(distinct) == 1:
+            where_filter = distinct[0]
+        else:
+            where_filter = {"$or": distinct}
+
+        query_embeddings = self.encoder.encode(texts)
+        results = self.collection.query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=10,
+            where=where_filter,
+            include=['metadatas', 'distances', 'embeddings']
+        )
+
+        is_listing = any(word in question.lower() for word in LISTING_WORDS)
+        max_results = rag_conf.get('listing_results', 10) if is_listing else rag_conf.get('search_results', 3)
+        per_topic = rag_conf.get('results_per_topic', 1)
+
+        good_answers = []
+        for row, sub_filter in enumerate(filters):
+            metadatas = results['metadatas'][row]
+            good = [
+                i for i, distance in enumerate(results['distances'][row])
+                if distance <= rag_conf['multi_topic_threshold'] and self.matches(metadatas[i], sub_filter)
+            ]
+            picked = mmr(
+                query_embeddings[row], np.asarray(results['embeddings'][row])[good], per_topic,
+                diversity_weight=rag_conf.get('mmr_lambda', 0.7)
+            )
+            for index in picked:
+                metadata = metadatas[good[index]]
+                answer = metadata.get('summary_offline', metadata['answer'])
+                if answer not in good_answers:
+                    good_answers.append(answer)
+
+        good_answers = good_answers[:max_results]
+        if not good_answers:
+            return "I'm not sure about that. Can you rephrase or ask about Catanduanes tourism?"
+        log.debug("RAG multi-topic results", facts=len(good_answers), subqueries=len(subqueries))
+        return " ".join(good_answers)
+
+    def search(self, question, where_filter=None, query_embedding=None):
+        """Core RAG search - returns raw facts
+
+        query_embedding, if the caller already has it, saves embedding the question again.
+        Matches within the confidence threshold are diversified with MMR.
+        """
+        log.debug("RAG search", query=question[:50], where=where_filter)
         
         if len(question) < 3:
             return "Please ask a complete question."
         
         # Detect listing queries
-        listing_words = ['all', 'top', 'best', 'list', 'recommend', 'show me', 'what are', 'multiple']
-        is_listing = any(word in question.lower() for word in listing_words)
+        is_listing = any(word in question.lower() for word in LISTING_WORDS)
         n_results = 20 if is_listing else 10
         
+        if query_embedding is None:
+            query_embedding = self.encoder.encode([question])[0]
         results = self.collection.query(
-            query_texts=[question],
+            query_embeddings=[query_embedding.tolist()],
             n_results=n_results,
-            where=where_filter
+            where=where_filter,
+            include=['metadatas', 'distances', 'embeddings']
         )
         
-        if not results['documents'][0]:
+        if not results['metadatas'][0]:
             return "I don't have information about that. Ask about beaches, food, or activities in Catanduanes!"
         
-        # Collect good matches with deduplication
+        # Good matches, then the most relevant ones that do not repeat each other
+        rag_conf = self.config['rag']
+        good = [
+            i for i, distance in enumerate(results['distances'][0])
+            if distance <= rag_conf['confidence_threshold']
+        ]
+        max_results = rag_conf.get('listing_results', 10) if is_listing else rag_conf.get('search_results', 3)
+        picked = mmr(
+            query_embedding, np.asarray(results['embeddings'][0])[good], max_results,
+            diversity_weight=rag_conf.get('mmr_lambda', 0.7)
+        )
         good_answers = []
-        seen_places = set()
+        for index in picked:
+            metadata = results['metadatas'][0][good[index]]
+            good_answers.append(metadata.get('summary_offline', metadata['answer']))
         
-        for i, metadata in enumerate(results['metadatas'][0]):
-            confidence = results['distances'][0][i]
-            
-            if confidence <= self.config['rag']['confidence_threshold']:
-                answer = metadata.get('summary_offline', metadata['answer'])
-                
-                # Extract places for deduplication
-                places_in_answer = self.key_places(answer)
-                if places_in_answer and places_in_answer[0] in seen_places:
-                    continue
-                
-                good_answers.append(answer)
-                seen_places.update(places_in_answer)
-                
-                max_results = 10 if is_listing else 3
-                if len(good_answers) >= max_results:
-                    break
+        if not good_answers:
+            return "I'm not sure about that. Can you rephrase or ask about Catanduanes tourism?"
+        log.debug("RAG results", facts=len(good_answers), listing=is_listing)
+        return " ".join(good_answers)
+
+    def lexical_search(self, question):
+        """search() on the BM25 index: no embedding, no Chroma"""
+        good_answers = []
+        seen_places = set()
+        for _, entry in self.lexical.search(question, k=10):
+            answer = entry.get('summary_offline', entry['output'])
+            places_in_answer = self.key_places(answer)
+            if places_in_answer and places_in_answer[0] in seen_places:
+                continue
+            good_answers.append(answer)
+            seen_places.update(places_in_answer)
+            if len(good_answers) >= 3:
+                break
         
         if not good_answers:
             return "I'm not sure about that. Can you rephrase or ask about Catanduanes tourism?"
-        print(f"[RAG DEBUG] Retrieved {len(good_answers)} facts from database.")
         return " ".join(good_answers)
 
     def key_places(self, text):
@@ -655,87 +677,132 @@ class Pipeline:
     # ========================================================================
     # MAIN ASK METHOD - REFACTORED FOR SPEED
     # ========================================================================
-    def ask(self, user_input, municipality=None):
-
-        start_time = time.time()
-        
-        # GATEKEEPER 1: Rate limiting
-        if not self.limiter.is_allowed():
-            wait_time = self.limiter.get_remaining_time()
-            return (f"You are sending messages too fast! Please wait {wait_time} seconds.", [])
-        
-        # GATEKEEPER 2: Profanity check
-        if self.check_profanity(user_input):
+    def ask(self, user_input, municipality=None, meta=None, deadline=None):
+        """Answer a question, returning (answer, places)
+
+        If meta is a dict it is filled in with how the answer was produced:
+        cache_key, version ('raw'/'enhanced'), enhancing (a background
+        enhancement job is pending for cache_key), timings (milliseconds
+        per stage, for the Server-Timing header) and degraded (optional
+        stages skipped to meet the deadline).
+
+        With a Deadline, each optional stage runs only if the spare budget
+        covers it, and DeadlineExceeded is raised if the budget is gone
+        before retrieval starts. Degraded answers are not cached.
+        """
+        if meta is None:
+            meta = {}
+        meta['enhancing'] = False
+        degraded = meta['degraded'] = []
+        clock = StageClock(meta.setdefault('timings', {}))
+
+        def affordable(stage):
+            if deadline is None or deadline.allows(self.stage_budgets[stage]):
+                return True
+            degraded.append(stage)
+            REGISTRY.inc('pathfinder_degraded_total', stage=stage)
+            return False
+        
+        # GATEKEEPER 1: Profanity check (rate limiting happens per client in the API layer)
+        blocked = self.check_profanity(user_input)
+        clock.lap('profanity')
+        if blocked:
+            clock.finish('blocked')
             return ("I am unable to process that language. Please ask politely about Catanduanes tourism.", [])
         
         # Normalize input
         normalized = self.normalize_query(user_input)
+        meta['cache_key'] = normalized
         
-        # GATEKEEPER 3: Semantic cache check
-        cached = self.semantic_cache.get(normalized)
+        # GATEKEEPER 2: Semantic cache check
+        cached = self.semantic_cache.get(normalized, semantic=affordable('semantic_cache'), question=user_input)
+        clock.lap('cache')
         if cached:
             answer, places, version = cached
+            meta['version'] = version
             if version == 'raw':
-                print("[CACHE] Entry is RAW. Retrying background enhancement...")
-                self.enhancer.enqueue(normalized, answer, answer)
+                log.debug("Cached answer is raw, retrying enhancement", cache_key=normalized)
+                self.enhancer.enqueue(normalized, answer, answer, retry=True, question=user_input)
+                meta['enhancing'] = True
             
             # Filter profanity from cached response
             answer = self.censor_profanity(answer)
+            clock.lap('profanity')
                 
-            elapsed = time.time() - start_time
-            print(f"[RESPONSE TIME] {elapsed:.3f}s (CACHE HIT)")
+            elapsed = clock.finish('cache_hit')
+            log.info("Answered", outcome="cache_hit", version=version, latency_ms=round(elapsed * 1000, 1))
             return (answer, places)
         
-        # Protect place names and translate to English
-        translated_query = self.protect(user_input)
-        print(f"[QUERY] Original: '{user_input}' → Translated: '{translated_query}'")
+        # Waited too long for a thread: answering now would only arrive after the client gave up
+        if deadline is not None and deadline.expired():
+            clock.finish('deadline_exceeded')
+            raise DeadlineExceeded('translate')
+        
+        # Protect place names and translate to English (mode "on"), or use the query as typed
+        if self.translation_mode == 'off':
+            translated_query = user_input
+            log.debug("Query", text=user_input, translation="off")
+        elif affordable('translate'):
+            translated_query = self.protect(user_input, timeout=deadline.spare() if deadline else None)
+            log.debug("Query", text=user_input, translated=translated_query)
+        else:
+            translated_query = user_input
+            log.debug("Query", text=user_input, translation="skipped")
+        clock.lap('translate')
+        
+        # One embedding per query, shared by the intent classifier and the vector search
+        query_embedding = self.encoder.encode([translated_query])[0]
+        clock.lap('embed')
         
-        # Intent analysis (very fast, rule-based)
-        analysis = self.controller.analyze_query(translated_query)
-        print(f"[INTENT] {analysis['intent']} (confidence: {analysis['confidence']:.2f})")
+        # Intent analysis (classifier, or rules when it is unsure)
+        analysis = self.controller.analyze_query(translated_query, embedding=query_embedding)
+        log.debug("Intent", intent=analysis['intent'], confidence=analysis['confidence'], reason=analysis.get('reason'), topic=analysis.get('topic'))
+        clock.lap('intent')
         
         if analysis['intent'] == 'greeting':
             response = self.controller.get_greeting_response()
             response = self.censor_profanity(response)
+            clock.finish('greeting')
             return (response, [])
         
         if analysis['intent'] == 'nonsense':
             response = self.controller.get_nonsense_response()
             response = self.censor_profanity(response)
+            clock.finish('nonsense')
             return (response, [])
         
-        # Entity extraction (fast, regex-based)
-        entities = self.entity_extractor.extract(translated_query)
-        print(f"[ENTITIES] {entities}")
+        # Entity extraction (fast, regex-based; memoized on the translated text)
+        stage_key = ' '.join(translated_query.lower().split())
+        entities = self.entity_memo.get_or_compute(
+            stage_key, lambda: self.entity_extractor.extract(translated_query)
+        )
+        if log.is_debug():
+            log.debug("Entities", **{name: value for name, value in entities.items() if value})
+        clock.lap('entities')
         
         # Build ChromaDB filter
-        constraints = []
-        if entities.get('places'):
-            constraints.append({"location": entities['places'][0]})
-        if entities.get('budget'):
-            constraints.append({"budget": entities['budget']})
-        if entities.get('activities') and len(entities['activities']) > 0:
-            constraints.append({"activities": entities['activities'][0]})
-        if entities.get('group_type'):
-            constraints.append({"group_type": entities['group_type']})
-        if entities.get('skill_level'):
-            constraints.append({"skill_level": entities['skill_level']})
-        
-        where_filter = None
-        if len(constraints) > 1:
-            where_filter = {"$and": constraints}
-        elif len(constraints) == 1:
-            where_filter = constraints[0]
+        where_filter = self.build_where_filter(entities)
         
-        # RAG retrieval (fast, vector search)
-        raw_facts = self.search(translated_query, where_filter=where_filter)
+        # RAG retrieval (vector search; memoized on the translated text and filter).
+        # A query naming several topics or places is split into one sub-query each
+        subqueries = self.decompose(translated_query, entities)
+        if subqueries:
+            retrieve = lambda: self.search_topics(translated_query, entities, subqueries)
+        else:
+            retrieve = lambda: self.search(translated_query, where_filter=where_filter, query_embedding=query_embedding)
+        raw_facts = self.search_memo.get_or_compute(
+            (stage_key, json.dumps(where_filter, sort_keys=True)), retrieve
+        )
+        clock.lap('search')
         
         # Extract places
         places = self.key_places(raw_facts)[:5]
+        clock.lap('places')
         
         # Check if error response
         if "don't have information" in raw_facts.lower() or "not sure" in raw_facts.lower():
             raw_facts = self.censor_profanity(raw_facts)
+            clock.finish('no_results')
             return (raw_facts, [])
         
         # Construct raw answer (no LLM, just facts)
@@ -743,19 +810,78 @@ class Pipeline:
         
         # Filter profanity from response before caching and returning
         raw_answer = self.censor_profanity(raw_answer)
+        clock.lap('profanity')
+        meta['version'] = 'raw'
+        
+        if degraded:
+            # Not cached: the next asker should get the full pipeline's answer
+            elapsed = clock.finish('degraded')
+            log.info("Answered", outcome="degraded", degraded=','.join(degraded), latency_ms=round(elapsed * 1000, 1))
+            return (raw_answer, places)
         
         # Store in cache (RAW version)
-        self.semantic_cache.set(normalized, raw_answer, places)
+        self.semantic_cache.set(normalized, raw_answer, places, question=user_input)
         
         # Enqueue background enhancement job
-        self.enhancer.enqueue(normalized, raw_facts, raw_answer)
+        self.enhancer.enqueue(normalized, raw_facts, raw_answer, question=user_input)
+        meta['enhancing'] = True
+        clock.lap('store')
         
-        elapsed = time.time() - start_time
-        print(f"[RESPONSE TIME] {elapsed:.3f}s (RAW + QUEUED)")
+        elapsed = clock.finish('raw')
+        log.info("Answered", outcome="raw", version="raw", latency_ms=round(elapsed * 1000, 1))
         
         # Return RAW answer immediately (already censored)
         return (raw_answer, places)
 
+    def ask_lite(self, user_input, municipality=None, meta=None):
+        """ask() for the overload controller's reduced tier
+
+        Exact cache tier, rule-only intent and lexical retrieval: no
+        translation, no embedding and no Chroma, so it answers in
+        milliseconds without touching the pipeline executor. Answers are
+        marked degraded and not cached.
+        """
+        if meta is None:
+            meta = {}
+        meta['enhancing'] = False
+        meta['degraded'] = ['overload']
+        clock = StageClock(meta.setdefault('timings', {}))
+        
+        blocked = self.check_profanity(user_input)
+        clock.lap('profanity')
+        if blocked:
+            clock.finish('blocked')
+            return ("I am unable to process that language. Please ask politely about Catanduanes tourism.", [])
+        
+        normalized = self.normalize_query(user_input)
+        meta['cache_key'] = normalized
+        cached = self.semantic_cache.get(normalized, semantic=False)
+        clock.lap('cache')
+        if cached:
+            answer, places, meta['version'] = cached
+            answer = self.censor_profanity(answer)
+            clock.finish('cache_hit')
+            return (answer, places)
+        
+        analysis = self.controller.analyze_query(user_input, semantic=False)
+        clock.lap('intent')
+        if analysis['intent'] == 'greeting':
+            clock.finish('greeting')
+            return (self.censor_profanity(self.controller.get_greeting_response()), [])
+        if analysis['intent'] == 'nonsense':
+            clock.finish('nonsense')
+            return (self.censor_profanity(self.controller.get_nonsense_response()), [])
+        
+        raw_facts = self.lexical_search(user_input)
+        clock.lap('lexical')
+        places = self.key_places(raw_facts)[:5]
+        meta['version'] = 'raw'
+        answer = self.censor_profanity(raw_facts)
+        clock.lap('profanity')
+        elapsed = clock.finish('reduced')
+        log.info("Answered", outcome="reduced", latency_ms=round(elapsed * 1000, 1))
+        return (answer, places)
+
     def guide_question(self):
         """Interactive CLI"""
         messages = self.config['messages']
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineOverloaded(Exception):
+    """Raised when the pipeline executor's queue is full"""
+    def __init__(self, retry_after):
+        super().__init__(f"Pipeline overloaded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ============================================================================
+# PIPELINE EXECUTOR
+# ============================================================================
+class PipelineExecutor:
+    """Bounded thread pool that keeps blocking Pipeline work off the event loop
+
+    At most `workers` calls run at once and at most `max_queue` more wait
+    for a thread; anything beyond that is refused immediately with
+    PipelineOverloaded rather than queueing without limit. A slot is only
+    freed when the thread finishes, even if the awaiting request was
+    cancelled, so the limit reflects real CPU work.
+    """
+    def __init__(self, workers=None, max_queue=16, retry_after=2):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_config(cls, config):
+        executor_conf = (config or {}).get('executor', {})
+        return cls(
+            workers=executor_conf.get('workers'),
+            max_queue=executor_conf.get('max_queue', 16),
+            retry_after=executor_conf.get('retry_after', 2)
+        )
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a pipeline thread"""
+        with self._lock:
+            if self._submitted >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PipelineOverloaded(self.retry_after)
+            self._submitted += 1
+
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future):
+        with self._lock:
+            self._submitted -= 1
+
+    def stats(self):
+        with self._lock:
+            submitted = self._submitted
+        return {
+            'workers': self.workers,
+            'in_flight': min(submitted, self.workers),
+            'queued': max(0, submitted - self.workers),
+            'max_queue': self.max_queue,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
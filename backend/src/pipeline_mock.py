@@ -107,7 +107,7 @@ class MockPipeline:
         self.geojson_cache[municipality] = features
         return features
     
-    def ask(self, user_input: str, municipality: str = None) -> Tuple[str, List[str]]:
+    def ask(self, user_input: str, municipality: str = None, meta: Dict = None, deadline=None) -> Tuple[str, List[str]]:
         """
         Generate AI response based on user input.
         Returns (answer, list_of_place_names)
@@ -115,6 +115,8 @@ class MockPipeline:
         Args:
             user_input: The user's query
             municipality: Optional municipality to filter places (e.g., "VIRAC")
+            meta: Optional dict, accepted for Pipeline compatibility (nothing is enhanced here)
+            deadline: Optional Deadline, accepted for Pipeline compatibility (nothing is skipped here)
         """
         
         place_names = []
@@ -0,0 +1,179 @@
+"""
+Preload-and-fork launcher: warm one parent, fork the web workers from it.
+
+    python inference_server.py &
+    cd backend
+    python -m src.preload --workers 4
+
+Needs inference.mode: sidecar. The sidecar is the one process that owns the
+embedding model and Chroma (including the query_cache writes), so every
+forked worker is a thin HTTP worker that reaches both over its socket.
+
+The parent imports the web stack, compiles the profanity filter and waits
+for the sidecar to answer, then gc.freeze()s and forks uvicorn workers that
+all accept on one listening socket. A worker recycled after
+limit_max_requests is re-forked from the warm parent instead of starting a
+fresh interpreter. SQLite, the sidecar connection and the enhancer's
+threads are not fork-safe, so each worker opens them itself after the fork.
+
+Linux/macOS only; on Windows use python -m src.main.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from inference import InferenceClient, InferenceError
+
+BASE_DIR = Path(__file__).parent
+CONFIG = BASE_DIR / "config" / "config.yaml"
+
+# A worker that dies sooner than this after being forked is crash-looping
+MIN_WORKER_LIFETIME = 2.0
+
+
+def preload(config):
+    """Import and load everything that is safe to share across fork()"""
+    # Import only - no clients, connections or threads are created here
+    import fastapi  # noqa: F401
+    import uvicorn  # noqa: F401
+    import httpx  # noqa: F401
+
+    # Compiled once here, the profanity DFA is shared copy-on-write like the model
+    from profanity_filter import ProfanityFilter
+    ProfanityFilter.from_config(config)
+
+
+def wait_for_sidecar(config):
+    """Block until the sidecar answers, so workers are not forked into a connect wait"""
+    client = InferenceClient.from_config(config)
+    started = time.time()
+    try:
+        client.ping()
+    except InferenceError as e:
+        print(f"[PRELOAD] {e}")
+        return False
+    finally:
+        # The parent's socket must not be inherited by every child
+        client.close()
+    print(f"[PRELOAD] Inference sidecar ready in {time.time() - started:.1f}s (dim {client.dim})")
+    return True
+
+
+def run_worker(sock, args):
+    """Child process: serve the app on the inherited socket until recycled"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    import uvicorn
+
+    exit_code = 0
+    try:
+        server = uvicorn.Server(uvicorn.Config(
+            "src.main:app",
+            limit_concurrency=args.limit_concurrency,
+            limit_max_requests=args.max_requests,
+            timeout_keep_alive=5,
+        ))
+        server.run(sockets=[sock])
+    except BaseException as e:
+        print(f"[PRELOAD] Worker {os.getpid()} crashed: {e}")
+        exit_code = 1
+    finally:
+        # os._exit() skips atexit: drain the log queue by hand
+        from logger import shutdown as flush_logs
+        flush_logs()
+        sys.stdout.flush()
+        os._exit(exit_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm one parent, then fork uvicorn workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-requests", type=int, default=1000, help="Recycle a worker after this many requests")
+    parser.add_argument("--limit-concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("Preload mode needs os.fork(); run python -m src.main instead")
+
+    with open(CONFIG, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    if config.get('inference', {}).get('mode', 'local') != 'sidecar':
+        # In local mode every worker would open its own Chroma client on the same store
+        sys.exit("Preload mode forks thin workers; set inference.mode: sidecar and start inference_server.py")
+
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
+    preload(config)
+    if not wait_for_sidecar(config):
+        sys.exit(1)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Everything allocated so far lives as long as the parent: keep the
+    # collector from touching (and so copying) those pages in every child
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    running = True
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(sock, args)
+        children[pid] = (slot, time.time())
+        print(f"[PRELOAD] Worker {slot} started (pid {pid})")
+
+    def shutdown(signum, frame):
+        nonlocal running
+        running = False
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"[PRELOAD] Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    for slot in range(args.workers):
+        spawn(slot)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot, started = children.pop(pid, (None, 0))
+        if slot is None or not running:
+            continue
+
+        lifetime = time.time() - started
+        print(f"[PRELOAD] Worker {slot} exited (code {os.waitstatus_to_exitcode(status)}) after {lifetime:.0f}s, re-forking")
+        if lifetime < MIN_WORKER_LIFETIME:
+            time.sleep(MIN_WORKER_LIFETIME)
+        spawn(slot)
+
+    sock.close()
+    print("[PRELOAD] All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Profanity filter compiled once into a DFA.
+
+Drop-in for better_profanity's contains_profanity()/censor() with the same
+word list, the same leetspeak substitutions and the same word/phrase
+semantics, without its per-word scan of ~900 VaryingString comparisons.
+
+At startup the censor words go into a trie. Each text character stands for
+one or more trie characters ('*' for any vowel, '1' for i or l, ...), so the
+trie is an NFA; subset construction turns it into a DFA whose transitions
+are one dict lookup per character. A request then makes a single pass: one
+regex finditer splits the text into words, and each word (plus at most
+max_combination following words, for phrases like "son of a bitch") is run
+through the DFA until it dies - usually within a few characters.
+"""
+
+import re
+import threading
+
+from better_profanity.constants import ALLOWED_CHARACTERS
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+
+from logger import get_logger
+
+log = get_logger("profanity")
+
+# Same substitutions as better_profanity.Profanity.CHARS_MAPPING
+CHARS_MAPPING = {
+    "a": ("a", "@", "*", "4"),
+    "i": ("i", "*", "l", "1"),
+    "o": ("o", "*", "0", "@"),
+    "u": ("u", "*", "v"),
+    "v": ("v", "*", "u"),
+    "l": ("l", "1"),
+    "e": ("e", "*", "3"),
+    "s": ("s", "$", "5"),
+    "t": ("t", "7"),
+}
+
+REPLACEMENT_LENGTH = 4
+
+
+def default_words():
+    return list(read_wordlist(get_complete_path_of_file("profanity_wordlist.txt")))
+
+
+# ============================================================================
+# PROFANITY FILTER
+# ============================================================================
+class ProfanityFilter:
+    """Detect and censor profanity in one pass over the text
+
+    Results match better_profanity: words are maximal runs of its allowed
+    characters; a word is censored when it (case-insensitively, with
+    substitutions) equals a censor word, and a run of up to max_combination
+    following words is censored as a whole when it spells a multi-word
+    entry with or without the separators in between.
+    """
+    def __init__(self, words):
+        words = {word.lower() for word in words if word}
+        # Longest phrase, in separators (better_profanity's MAX_NUMBER_COMBINATIONS)
+        self.max_combination = max(
+            [1] + [sum(ch not in ALLOWED_CHARACTERS for ch in word) for word in words]
+        )
+        self._word_re = re.compile(
+            '[' + ''.join(re.escape(ch) for ch in sorted(ALLOWED_CHARACTERS)) + ']+'
+        )
+        self._delta, self._accept = self._compile(words)
+        self.num_words = len(words)
+        self.num_states = len(self._delta)
+
+    @classmethod
+    def from_config(cls, config):
+        """Default list plus config['profanity'], shared by every caller in the process"""
+        return compiled(tuple(config.get('profanity', [])))
+
+    # ------------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------------
+    @staticmethod
+    def _compile(words):
+        """Trie of the words -> DFA over text characters ([{char: state}], [accepting])"""
+        children = [{}]
+        terminal = set()
+        for word in words:
+            node = 0
+            for ch in word:
+                nxt = children[node].get(ch)
+                if nxt is None:
+                    nxt = len(children)
+                    children[node][ch] = nxt
+                    children.append({})
+                node = nxt
+            terminal.add(node)
+
+        # Text character -> the censor characters it can stand for
+        stands_for = {}
+        for ch in {ch for word in words for ch in word}:
+            for variant in CHARS_MAPPING.get(ch, (ch,)):
+                stands_for.setdefault(variant, set()).add(ch)
+
+        start = frozenset([0])
+        index = {start: 0}
+        delta = [{}]
+        accept = [False]
+        pending = [start]
+        while pending:
+            nodes = pending.pop()
+            transitions = delta[index[nodes]]
+            for text_ch, censor_chars in stands_for.items():
+                target = frozenset(
+                    children[node][ch]
+                    for node in nodes
+                    for ch in censor_chars
+                    if ch in children[node]
+                )
+                if not target:
+                    continue
+                state = index.get(target)
+                if state is None:
+                    state = index[target] = len(delta)
+                    delta.append({})
+                    accept.append(not terminal.isdisjoint(target))
+                    pending.append(target)
+                transitions[text_ch] = state
+        return delta, accept
+
+    def _feed(self, state, text):
+        """DFA state after text, or None once no censor word can match"""
+        delta = self._delta
+        for ch in text:
+            if state is None:
+                return None
+            state = delta[state].get(ch)
+        return state
+
+    # ------------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------------
+    def _spans(self, text):
+        """(start, end) of every stretch of text to censor, left to right"""
+        words = [match.span() for match in self._word_re.finditer(text)]
+        last = len(text) - 1
+        # better_profanity ignores a text, or a trailing word, that is one character at the very end
+        if not words or words[0][0] >= last:
+            return
+        accept = self._accept
+        i = 0
+        while i < len(words):
+            start, end = words[i]
+            state = self._feed(0, text[start:end].lower())
+
+            # Phrases first: this word joined to the next few, bare or with their separators
+            joined = separated = state
+            phrase_end = None
+            for j in range(i + 1, min(len(words), i + 1 + self.max_combination)):
+                next_start, next_end = words[j]
+                if next_start >= last or (joined is None and separated is None):
+                    break
+                word = text[next_start:next_end].lower()
+                joined = self._feed(joined, word)
+                separated = self._feed(separated, text[words[j - 1][1]:next_start].lower() + word)
+                if (joined is not None and accept[joined]) or (separated is not None and accept[separated]):
+                    phrase_end = j
+                    break
+
+            if phrase_end is not None:
+                yield start, words[phrase_end][1]
+                i = phrase_end + 1
+                continue
+            if state is not None and accept[state]:
+                yield start, end
+            i += 1
+
+    def contains_profanity(self, text):
+        """True if censor() would change text"""
+        replacement = '*' * REPLACEMENT_LENGTH
+        return any(text[start:end] != replacement for start, end in self._spans(text))
+
+    def censor(self, text, censor_char='*'):
+        """text with every censored word or phrase replaced by four censor_char"""
+        if not isinstance(text, str):
+            text = str(text)
+        replacement = str(censor_char) * REPLACEMENT_LENGTH
+        parts = []
+        position = 0
+        for start, end in self._spans(text):
+            parts.append(text[position:start])
+            parts.append(replacement)
+            position = end
+        if not parts:
+            return text
+        parts.append(text[position:])
+        return ''.join(parts)
+
+    def stats(self):
+        return {'words': self.num_words, 'states': self.num_states, 'max_combination': self.max_combination}
+
+
+# One compiled filter per word list per process; preload builds it before forking
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def compiled(extra_words=()):
+    """The filter for the default list plus extra_words, compiled on first use"""
+    key = tuple(extra_words)
+    with _compiled_lock:
+        profanity = _compiled.get(key)
+        if profanity is None:
+            profanity = _compiled[key] = ProfanityFilter(default_words() + list(key))
+            log.info("Profanity filter compiled", **profanity.stats())
+        return profanity
@@ -0,0 +1,94 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+# ============================================================================
+# PER-CLIENT TOKEN BUCKET
+# ============================================================================
+class TokenBucketLimiter:
+    """Token bucket per client (authenticated user or IP address)
+
+    Each client holds `capacity` tokens that refill continuously at
+    `refill_per_second`; a request spends one. State is two floats per
+    client kept in an OrderedDict in least-recently-seen order, so expiry
+    only ever looks at the front. A bucket idle for longer than it takes
+    to refill completely is indistinguishable from a new one, so dropping
+    it loses nothing.
+
+    With a SharedState store the buckets live in SQLite instead, so every
+    uvicorn worker process draws from the same bucket for a client.
+    """
+    def __init__(self, capacity, refill_per_second, idle_ttl=None, max_clients=10000, store=None):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        # Default: forget a client once its bucket would be full again
+        self.idle_ttl = idle_ttl or self.capacity / self.refill_per_second
+        self.max_clients = max_clients
+        self.store = store
+        self.buckets = OrderedDict()  # client_id -> [tokens, last_seen]
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    @classmethod
+    def from_config(cls, config, store=None):
+        rate_limit_conf = (config or {}).get('security', {}).get('rate_limit', {})
+        max_req = rate_limit_conf.get('max_request', 5)
+        period = rate_limit_conf.get('period_seconds', 60)
+        return cls(
+            capacity=rate_limit_conf.get('burst', max_req),
+            refill_per_second=max_req / period,
+            idle_ttl=rate_limit_conf.get('idle_ttl'),
+            max_clients=rate_limit_conf.get('max_clients', 10000),
+            store=store
+        )
+
+    def acquire(self, client_id):
+        """Spend one token; returns (allowed, seconds until a token is available)"""
+        if self.store is not None:
+            allowed, retry_after = self.store.take_token(
+                client_id, self.capacity, self.refill_per_second, self.idle_ttl, self.max_clients
+            )
+            if not allowed:
+                with self.lock:
+                    self.rejected += 1
+            return allowed, retry_after
+
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+
+            bucket = self.buckets.get(client_id)
+            if bucket is None:
+                bucket = self.buckets[client_id] = [self.capacity, now]
+            else:
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+                bucket[1] = now
+                self.buckets.move_to_end(client_id)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+
+            self.rejected += 1
+            return False, math.ceil((1 - bucket[0]) / self.refill_per_second)
+
+    def _expire(self, now):
+        """Drop idle buckets from the front, and the oldest ones past max_clients"""
+        while self.buckets:
+            client_id, (_, last_seen) = next(iter(self.buckets.items()))
+            if now - last_seen < self.idle_ttl and len(self.buckets) < self.max_clients:
+                break
+            self.buckets.popitem(last=False)
+
+    def stats(self):
+        clients = self.store.bucket_count() if self.store is not None else None
+        with self.lock:
+            return {
+                'shared': self.store is not None,
+                'clients': clients if clients is not None else len(self.buckets),
+                'capacity': self.capacity,
+                'refill_per_second': self.refill_per_second,
+                'rejected': self.rejected
+            }
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+import asyncio
+import json
 import sys
 import os
+import time
 import warnings
 
 # Suppress warnings for Python 3.14+
@@ -11,7 +15,27 @@ if sys.version_info >= (3, 14):
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from pipeline_executor import PipelineExecutor, PipelineOverloaded
+from rate_limit import TokenBucketLimiter
+from singleflight import SingleFlight
+from deadline import Deadline, DeadlineExceeded
+from overload import OverloadController, TIERS, TIER_REDUCED, TIER_SHED
+from metrics import CONTENT_TYPE, REGISTRY, server_timing
+from logger import dropped as logs_dropped, get_logger
+
+log = get_logger("api")
+
+# Signed-in users are rate limited by account; without auth (no jose or no
+# database configured) every client is keyed by IP
+try:
+    from jose import JWTError, jwt
+    from ..auth import SECRET_KEY, ALGORITHM
+except (ImportError, ValueError):
+    jwt = None
+
 router = APIRouter(prefix="/api/ai", tags=["ai"])
+# Prometheus scrape endpoint, mounted at the root (/metrics)
+metrics_router = APIRouter(tags=["metrics"])
 
 # Initialize pipeline at startup with better error handling
 _pipeline = None
@@ -22,15 +46,16 @@ def _init_pipeline_safely():
     global _pipeline, _pipeline_error
     
     try:
-        print("[INFO] Starting AI Pipeline initialization...")
+        log.info("Starting AI pipeline initialization")
         from pipeline import Pipeline
         
         dataset_path = os.path.join(os.path.dirname(__file__), "..", "dataset", "dataset.json")
         config_path = os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml")
         
-        print(f"[DEBUG] Dataset path: {dataset_path}")
-        print(f"[DEBUG] Config path: {config_path}")
-        print(f"[DEBUG] Files exist - Dataset: {os.path.exists(dataset_path)}, Config: {os.path.exists(config_path)}")
+        log.debug(
+            "Pipeline files", dataset=dataset_path, config=config_path,
+            dataset_exists=os.path.exists(dataset_path), config_exists=os.path.exists(config_path)
+        )
         
         # Check if files exist
         if not os.path.exists(dataset_path):
@@ -38,25 +63,24 @@ def _init_pipeline_safely():
         if not os.path.exists(config_path):
             raise FileNotFoundError(f"Config not found: {config_path}")
         
-        print("[INFO] Required files found, initializing Pipeline...")
+        log.info("Required files found, initializing pipeline")
         _pipeline = Pipeline(dataset_path=dataset_path, config_path=config_path)
-        print("[INFO] [OK] AI Pipeline initialized successfully!")
+        log.info("AI pipeline initialized")
         return _pipeline
         
     except Exception as e:
         _pipeline_error = str(e)
-        print(f"[WARNING] Full Pipeline initialization failed: {type(e).__name__}: {e}")
-        print("[INFO] Falling back to Mock Pipeline...")
+        log.warning("Full pipeline initialization failed, falling back to mock pipeline", error=f"{type(e).__name__}: {e}")
         
         try:
             from pipeline_mock import MockPipeline
             dataset_path = os.path.join(os.path.dirname(__file__), "..", "dataset", "dataset.json")
             config_path = os.path.join(os.path.dirname(__file__), "..", "config", "config.yaml")
             _pipeline = MockPipeline(dataset_path=dataset_path, config_path=config_path)
-            print("[INFO] [OK] Mock Pipeline initialized successfully!")
+            log.info("Mock pipeline initialized")
             return _pipeline
         except Exception as mock_error:
-            print(f"[ERROR] Mock Pipeline also failed: {mock_error}")
+            log.error("Mock pipeline also failed", error=str(mock_error))
             _pipeline = False
             return None
 
@@ -66,9 +90,115 @@ def get_pipeline():
     return _pipeline if _pipeline is not False else None
 
 # Initialize pipeline on module import
-print("[INFO] Loading AI router...")
+log.info("Loading AI router")
 _init_pipeline_safely()
 
+# Pipeline.ask is blocking (translation, encoding, Chroma) - run it on a
+# bounded thread pool so it never stalls the event loop
+_executor = PipelineExecutor.from_config(getattr(get_pipeline(), 'config', None))
+log.info("Pipeline executor ready", workers=_executor.workers, max_queue=_executor.max_queue)
+
+async def run_pipeline(fn, *args, **kwargs):
+    """Run blocking pipeline work on the executor, mapping overload to a 503"""
+    try:
+        return await _executor.run(fn, *args, **kwargs)
+    except PipelineOverloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Pathfinder is busy right now. Please try again in a moment.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+# Steps down from the full pipeline to cache + lexical answers to fast 503s as the queue grows
+_overload = OverloadController.from_config(getattr(get_pipeline(), 'config', None), _executor)
+
+# Per-client token buckets, checked before any pipeline work is queued
+_limiter = TokenBucketLimiter.from_config(
+    getattr(get_pipeline(), 'config', None),
+    store=getattr(get_pipeline(), 'shared_state', None)
+)
+log.info("Rate limiter ready", capacity=_limiter.capacity, refill_per_second=_limiter.refill_per_second)
+
+def client_key(request: Request):
+    """Rate-limit key: the signed-in user if the request carries a valid token, else the client IP"""
+    auth_header = request.headers.get("Authorization", "")
+    if jwt is not None and SECRET_KEY and auth_header.startswith("Bearer "):
+        try:
+            payload = jwt.decode(auth_header[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def enforce_rate_limit(request: Request):
+    """Dependency: reject with 429 once this client's bucket is empty
+
+    Plain def so FastAPI runs it on its threadpool: with shared state the
+    check is a SQLite transaction that may briefly wait on another worker.
+    """
+    allowed, retry_after = _limiter.acquire(client_key(request))
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"You are sending messages too fast! Please wait {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+# Identical questions arriving together (a tour group asking the same thing)
+# share one pipeline run instead of each missing the cache separately
+_singleflight = SingleFlight()
+
+async def ask_pipeline(pipeline, message, municipality=None):
+    """pipeline.ask, coalesced with any identical request in flight; returns (answer, places, meta)
+
+    Admission goes through the overload controller first: shed requests
+    get a 503 at once, and reduced ones are answered by ask_lite on the
+    default thread pool instead of waiting in the pipeline queue.
+    """
+    tier = _overload.admit()
+    if tier == TIER_SHED:
+        raise HTTPException(
+            status_code=503,
+            detail="Pathfinder is busy right now. Please try again in a moment.",
+            headers={"Retry-After": str(_executor.retry_after)}
+        )
+    if tier == TIER_REDUCED and hasattr(pipeline, 'ask_lite'):
+        meta = {'timings': {}}
+        answer, places = await asyncio.to_thread(pipeline.ask_lite, message, municipality, meta)
+        return answer, places, meta
+
+    normalize = getattr(pipeline, 'normalize_query', None)
+    key = (normalize(message) if normalize else message.strip().lower(), municipality)
+
+    async def call():
+        meta = {'timings': {}}
+        queued_at = time.perf_counter()
+        # The budget starts now, so time spent queued for a thread counts against it
+        deadline = Deadline.from_config(getattr(pipeline, 'config', None))
+
+        def timed_ask():
+            # Time spent waiting for a pipeline thread
+            waited = time.perf_counter() - queued_at
+            meta['timings']['queue'] = round(waited * 1000, 2)
+            REGISTRY.observe('pathfinder_stage_seconds', waited, stage='queue')
+            _overload.observe_wait(waited)
+            return pipeline.ask(message, municipality, meta=meta, deadline=deadline)
+
+        try:
+            answer, places = await run_pipeline(timed_ask)
+        except DeadlineExceeded:
+            REGISTRY.inc('pathfinder_deadline_exceeded_total')
+            raise HTTPException(
+                status_code=503,
+                detail="Pathfinder is busy right now. Please try again in a moment.",
+                headers={"Retry-After": str(_executor.retry_after)}
+            )
+        return answer, places, meta
+
+    answer, places, meta = await _singleflight.do(key, call)
+    return answer, places, dict(meta)
+
 class ChatMessage(BaseModel):
     message: str
     preferences: Optional[List[str]] = None  # User preferences like ["Swimming", "Hiking"]
@@ -91,15 +221,30 @@ class ChatResponse(BaseModel):
     answer: str
     places: List[PlaceInfo] = []
     suggested_itinerary: Optional[Dict] = None
+    degraded: List[str] = []  # Optional stages skipped to answer within the deadline
+
+def _place_infos(pipeline, places, municipality):
+    """Convert place names to PlaceInfo objects"""
+    places_data = pipeline.get_place_data(places, municipality)
+    return [
+        PlaceInfo(
+            name=p['name'],
+            lat=p['lat'],
+            lng=p['lng'],
+            type=p['type'],
+            coordinates={"lat": p['lat'], "lng": p['lng']}
+        )
+        for p in places_data
+    ]
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_with_pathfinder(request: ChatMessage):
+@router.post("/chat", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit)])
+async def chat_with_pathfinder(request: ChatMessage, response: Response):
     """Chat with Pathfinder AI and get recommendations"""
     pipeline = get_pipeline()
     
     # Fallback response if pipeline isn't ready
     if pipeline is None:
-        print("[WARNING] Pipeline not available, returning fallback response")
+        log.warning("Pipeline not available, returning fallback response")
         return ChatResponse(
             answer="The AI system is initializing. Please try again in a moment. In the meantime, you can manually select attractions from the map.",
             places=[]
@@ -107,30 +252,22 @@ async def chat_with_pathfinder(request: ChatMessage):
     
     try:
         # Get AI response from pipeline, passing municipality if available
-        answer, places = pipeline.ask(request.message, request.municipality)
-        
-        # Convert places to PlaceInfo objects
-        places_data = pipeline.get_place_data(places, request.municipality)
-        place_infos = [
-            PlaceInfo(
-                name=p['name'],
-                lat=p['lat'],
-                lng=p['lng'],
-                type=p['type'],
-                coordinates={"lat": p['lat'], "lng": p['lng']}
-            )
-            for p in places_data
-        ]
+        answer, places, meta = await ask_pipeline(pipeline, request.message, request.municipality)
+        if meta.get('timings'):
+            response.headers["Server-Timing"] = server_timing(meta['timings'])
+        if meta.get('degraded'):
+            response.headers["X-Degraded"] = ','.join(meta['degraded'])
         
         return ChatResponse(
             answer=answer,
-            places=place_infos
+            places=_place_infos(pipeline, places, request.municipality),
+            degraded=meta.get('degraded', [])
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"[ERROR] Chat endpoint error: {error_details}")
+        log.exception("Chat endpoint error")
         
         # Return fallback response with error info
         return ChatResponse(
@@ -138,7 +275,94 @@ async def chat_with_pathfinder(request: ChatMessage):
             places=[]
         )
 
-@router.post("/generate-itinerary", response_model=Dict)
+def _sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _shared_enhanced(pipeline, cache_key):
+    """Enhanced answer for cache_key from the cross-worker exact tier, if there is one yet"""
+    shared_state = getattr(pipeline, 'shared_state', None)
+    if shared_state is None:
+        return None
+    entry = shared_state.exact_get(cache_key)
+    if entry and entry[2] == 'enhanced':
+        return entry[0]
+    return None
+
+@router.post("/chat/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_with_pathfinder_stream(request: ChatMessage):
+    """Chat over server-sent events: the raw answer first, then the enhanced one
+
+    Events: 'answer' ({answer, places}) as soon as the pipeline responds,
+    'enhanced' ({answer}) if background enhancement finishes before the
+    deadline, and 'done' to close the stream. Comment lines keep idle
+    connections alive while waiting.
+    """
+    pipeline = get_pipeline()
+    meta = {}
+
+    # Answer before opening the stream so overload can still be a plain 503
+    if pipeline is None:
+        first = {
+            "answer": "The AI system is initializing. Please try again in a moment. In the meantime, you can manually select attractions from the map.",
+            "places": []
+        }
+    else:
+        try:
+            answer, places, meta = await ask_pipeline(pipeline, request.message, request.municipality)
+            first = {
+                "answer": answer,
+                "places": [p.model_dump() for p in _place_infos(pipeline, places, request.municipality)],
+                "version": meta.get("version"),
+                "degraded": meta.get("degraded", [])
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.exception("Chat stream error")
+            first = {"answer": f"An error occurred: {str(e)}. Please refresh and try again.", "places": []}
+            meta = {}
+
+    async def events():
+        yield _sse("answer", first)
+
+        enhancer = getattr(pipeline, 'enhancer', None)
+        if meta.get('enhancing') and enhancer is not None:
+            stream_conf = pipeline.config.get('enhancer', {})
+            deadline = stream_conf.get('stream_deadline', 15)
+            keepalive = stream_conf.get('stream_keepalive', 5)
+
+            waiter = asyncio.wrap_future(enhancer.subscribe(meta['cache_key']))
+            loop = asyncio.get_running_loop()
+            give_up_at = loop.time() + deadline
+            while not waiter.done():
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    waiter.cancel()
+                    break
+                await asyncio.wait({waiter}, timeout=min(keepalive, remaining))
+                if not waiter.done():
+                    # The job may be running in another worker process
+                    shared = await asyncio.to_thread(_shared_enhanced, pipeline, meta['cache_key'])
+                    if shared:
+                        waiter.cancel()
+                        yield _sse("enhanced", {"answer": shared})
+                        break
+                    yield ": keep-alive\n\n"
+
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                yield _sse("enhanced", {"answer": waiter.result()})
+
+        yield _sse("done", {})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if meta.get('timings'):
+        headers["Server-Timing"] = server_timing(meta['timings'])
+    if meta.get('degraded'):
+        headers["X-Degraded"] = ','.join(meta['degraded'])
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@router.post("/generate-itinerary", response_model=Dict, dependencies=[Depends(enforce_rate_limit)])
 async def generate_ai_itinerary(request: ItineraryRequest):
     """Generate an AI-powered itinerary based on preferences and location"""
     pipeline = get_pipeline()
@@ -164,11 +388,10 @@ async def generate_ai_itinerary(request: ItineraryRequest):
         query = f"best attractions in {request.municipality} for {', '.join(request.preferences)}"
         
         # Get AI recommendations, passing municipality
-        answer, place_names = pipeline.ask(query, request.municipality)
+        answer, place_names, _ = await ask_pipeline(pipeline, query, request.municipality)
         places_data = pipeline.get_place_data(place_names, request.municipality)
         
-        print(f"[INFO] Generated {len(place_names)} place names: {place_names}")
-        print(f"[INFO] Got {len(places_data)} places data")
+        log.debug("Itinerary places", names=len(place_names), with_data=len(places_data))
         
         # Create itinerary structure with better distribution
         itinerary_days = {}
@@ -196,7 +419,7 @@ async def generate_ai_itinerary(request: ItineraryRequest):
                     "activities": [p['type'] for p in day_places]
                 }
                 
-                print(f"[INFO] Day {day}: {len(day_places)} places")
+                log.debug("Itinerary day", day=day, places=len(day_places))
         else:
             # No places found, create empty days
             for day in range(1, request.days + 1):
@@ -219,10 +442,12 @@ async def generate_ai_itinerary(request: ItineraryRequest):
             "total_places": len(places_data)
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/place-details")
+@router.post("/place-details", dependencies=[Depends(enforce_rate_limit)])
 async def get_place_details(place_name: str):
     """Get detailed information about a specific place"""
     pipeline = get_pipeline()
@@ -232,7 +457,7 @@ async def get_place_details(place_name: str):
     try:
         # Query the pipeline for details about the place
         query = f"Tell me about {place_name}"
-        answer, _ = pipeline.ask(query)
+        answer, _, _ = await ask_pipeline(pipeline, query)
         
         # Get coordinates if available
         if place_name in pipeline.config['places']:
@@ -251,6 +476,8 @@ async def get_place_details(place_name: str):
             "type": pipeline.config['places'].get(place_name, {}).get('type', 'unknown')
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -295,8 +522,73 @@ async def get_available_municipalities():
 async def health_check():
     """Check AI service health"""
     pipeline = get_pipeline()
+    enhancer = getattr(pipeline, 'enhancer', None)
+    cache = getattr(pipeline, 'semantic_cache', None)
+    translator = getattr(pipeline, 'translator', None)
     return {
         "status": "ok",
         "pipeline_ready": pipeline is not None,
-        "message": "AI service is available" if pipeline else "AI pipeline initializing on first use..."
+        "message": "AI service is available" if pipeline else "AI pipeline initializing on first use...",
+        "enhancer": enhancer.stats() if enhancer else None,
+        "cache": cache.stats() if cache else None,
+        "translation": translator.stats() if translator else None,
+        "memo": {
+            name: getattr(pipeline, f"{name}_memo").stats()
+            for name in ('entity', 'search') if hasattr(pipeline, f"{name}_memo")
+        },
+        "translation_mode": getattr(pipeline, 'translation_mode', None),
+        "connectivity": pipeline.connectivity.stats() if getattr(pipeline, 'connectivity', None) else None,
+        "worker_pid": os.getpid(),
+        "inference_mode": getattr(pipeline, 'inference_mode', None),
+        "executor": _executor.stats(),
+        "overload": _overload.stats(),
+        "rate_limit": _limiter.stats(),
+        "singleflight": _singleflight.stats(),
+        "logs_dropped": logs_dropped()
     }
+
+@REGISTRY.collector
+def _cache_metrics():
+    """Hit counts and per-tier hit ratios for the answer and translation caches"""
+    pipeline = get_pipeline()
+    cache = getattr(pipeline, 'semantic_cache', None)
+    translator = getattr(pipeline, 'translator', None)
+    if cache is None:
+        return []
+
+    counts = cache.stats()
+    exact, semantic, misses = counts['exact_hits'], counts['semantic_hits'], counts['misses']
+    lookups = exact + semantic + misses
+    ratios = [
+        # Each tier's ratio is over the lookups that reached it
+        ({'tier': 'exact'}, exact / lookups if lookups else 0.0),
+        ({'tier': 'semantic'}, semantic / (semantic + misses) if semantic + misses else 0.0),
+    ]
+    if translator is not None:
+        translation = translator.stats()
+        attempts = sum(translation[name] for name in ('cache_hits', 'translated', 'timeouts', 'errors', 'offline'))
+        ratios.append(({'tier': 'translation'}, translation['cache_hits'] / attempts if attempts else 0.0))
+
+    return [
+        ('pathfinder_cache_lookups_total', 'counter', 'Answer cache lookups by result, all workers',
+         [({'result': 'exact_hit'}, exact), ({'result': 'semantic_hit'}, semantic), ({'result': 'miss'}, misses)]),
+        ('pathfinder_cache_hit_ratio', 'gauge', 'Hit ratio of each cache tier (translation: this worker)', ratios),
+    ]
+
+@REGISTRY.collector
+def _overload_metrics():
+    """Admission tier and smoothed queue wait of this worker"""
+    stats = _overload.stats()
+    worker = str(os.getpid())
+    return [
+        ('pathfinder_overload_tier', 'gauge', 'Admission tier in effect (1) per worker',
+         [({'worker': worker, 'tier': tier}, int(tier == stats['tier'])) for tier in TIERS]),
+        ('pathfinder_queue_wait_seconds', 'gauge', 'Smoothed wait for a pipeline thread per worker',
+         [({'worker': worker}, stats['queue_wait'])]),
+    ]
+
+@metrics_router.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of stage latencies and cache hit ratios"""
+    body = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(body, media_type=CONTENT_TYPE)
@@ -2,11 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict
+import asyncio
 import io
 import os
 import sys
 from pathlib import Path
-import traceback
+import time
 import warnings
 
 # Suppress warnings for Python 3.14
@@ -18,6 +19,14 @@ import base64
 from datetime import datetime
 from io import BytesIO  # ✅ MISSING!
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from connectivity import get_monitor
+from metrics import REGISTRY
+from logger import get_logger
+
+log = get_logger("pdf")
+
 # ============================================
 # WeasyPrint DLL Setup for Windows
 # ============================================
@@ -26,9 +35,9 @@ if sys.platform == 'win32':
     if os.path.exists(dll_dir):
         os.environ['WEASYPRINT_DLL_DIRECTORIES'] = dll_dir
         os.environ['PATH'] = dll_dir + os.pathsep + os.environ.get('PATH', '')
-        print(f"✅ Set WeasyPrint DLL directory: {dll_dir}")
+        log.info("Set WeasyPrint DLL directory", path=dll_dir)
     else:
-        print(f"⚠️  Warning: DLL directory not found: {dll_dir}")
+        log.warning("WeasyPrint DLL directory not found", path=dll_dir)
 
 from weasyprint import HTML
 
@@ -57,7 +66,7 @@ def _initialize_firebase():
         
         # Check if Firebase is already initialized by another process
         if firebase_admin._apps:
-            print("✅ Firebase already initialized")
+            log.info("Firebase already initialized")
             _firebase_modules = (firebase_admin, credentials, storage)
             _firebase_initialized = True
             return _firebase_modules
@@ -73,11 +82,9 @@ def _initialize_firebase():
         else:
             firebase_credentials_path = Path(firebase_credentials_path)
         
-        print(f"[DEBUG] Looking for Firebase credentials at: {firebase_credentials_path}")
-        print(f"[DEBUG] File exists: {firebase_credentials_path.exists()}")
+        log.debug("Looking for Firebase credentials", path=str(firebase_credentials_path), exists=firebase_credentials_path.exists())
         
         if firebase_credentials_path.exists():
-            print(f"[DEBUG] Loading Firebase credentials from: {firebase_credentials_path}")
             try:
                 cred = credentials.Certificate(str(firebase_credentials_path))
                 
@@ -90,29 +97,25 @@ def _initialize_firebase():
                         creds_data = json.load(f)
                         bucket_name = creds_data.get('project_id', '') + '.appspot.com'
                 
-                print(f"[DEBUG] Using bucket: {bucket_name}")
+                log.debug("Using Firebase bucket", bucket=bucket_name)
                 
                 firebase_admin.initialize_app(cred, {
                     'storageBucket': bucket_name
                 })
-                print("✅ Firebase initialized successfully")
+                log.info("Firebase initialized", bucket=bucket_name)
                 _firebase_modules = (firebase_admin, credentials, storage)
             except Exception as init_error:
-                print(f"❌ Failed to initialize Firebase: {type(init_error).__name__}: {init_error}")
-                import traceback
-                traceback.print_exc()
+                log.exception("Failed to initialize Firebase", error=f"{type(init_error).__name__}: {init_error}")
                 _firebase_modules = (None, None, None)
         else:
-            print(f"⚠️ Firebase credentials not found at: {firebase_credentials_path}")
+            log.warning("Firebase credentials not found", path=str(firebase_credentials_path))
             _firebase_modules = (None, None, None)
         
         _firebase_initialized = True
         return _firebase_modules
     except Exception as e:
         _firebase_error = str(e)
-        print(f"⚠️ Firebase initialization error: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Firebase initialization error", error=f"{type(e).__name__}: {e}")
         _firebase_initialized = True  # Mark as attempted to avoid retries
         _firebase_modules = (None, None, None)
         return _firebase_modules
@@ -125,7 +128,7 @@ router = APIRouter(prefix="/api/pdf", tags=["pdf"])
 
 # Get template directory path
 TEMPLATE_DIR = Path(__file__).parent.parent / "templates"
-print(f"📁 Template directory: {TEMPLATE_DIR}")
+log.info("Template directory", path=str(TEMPLATE_DIR))
 
 # ============================================
 # Pydantic Models
@@ -152,23 +155,18 @@ def load_template(template_name: str) -> str:
     """Load HTML template from file"""
     template_path = TEMPLATE_DIR / template_name
     
-    print(f"📂 Looking for template at: {template_path}")
-    
     if not template_path.exists():
-        print(f"❌ Template NOT found at: {template_path}")
+        log.error("Template not found", path=str(template_path))
         raise FileNotFoundError(f"Template not found: {template_path}")
     
-    print(f"✅ Template found!")
-    
     with open(template_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    print(f"📄 Template loaded: {len(content)} characters")
+    log.debug("Template loaded", path=str(template_path), chars=len(content))
     return content
 
 def generate_days_html(days: List[DayItinerary]) -> str:
     """Generate HTML for all days in the itinerary using calendar design"""
-    print(f"🗓️  Generating HTML for {len(days)} days...")
     days_html = ""
     
     for day_data in days:
@@ -250,7 +248,7 @@ def generate_days_html(days: List[DayItinerary]) -> str:
         </div>
         """
     
-    print(f"✅ Days HTML generated: {len(days_html)} characters")
+    log.debug("Days HTML generated", days=len(days), chars=len(days_html))
     return days_html
 
 
@@ -258,8 +256,6 @@ def generate_days_html(days: List[DayItinerary]) -> str:
 def generate_html_from_template(data: ItineraryPDFRequest) -> str:
     """Generate final HTML by loading template and replacing placeholders"""
     
-    print("🔄 Starting HTML generation from template...")
-    
     # Load the template file
     template = load_template("itinerary.html")
     
@@ -288,7 +284,7 @@ def generate_html_from_template(data: ItineraryPDFRequest) -> str:
     for placeholder, value in replacements.items():
         html = html.replace(placeholder, value)
     
-    print(f"✅ Final HTML generated: {len(html)} characters")
+    log.debug("HTML generated", chars=len(html))
     return html
 
 # ============================================
@@ -305,23 +301,20 @@ async def generate_itinerary_pdf(
     try:
         firebase_admin, credentials, storage = _initialize_firebase()  # Get Firebase modules
         
-        print("\n" + "="*60)
-        print("🔐 AUTHENTICATED PDF GENERATION")
-        print("="*60)
-        
         # Generate HTML from template
+        started = time.perf_counter()
         html_content = generate_html_from_template(pdf_data)
+        REGISTRY.observe('pathfinder_pdf_seconds', time.perf_counter() - started, step='template')
         
         # Convert HTML to PDF
-        print("🖨️  Converting HTML to PDF...")
+        started = time.perf_counter()
         pdf_bytes = HTML(string=html_content).write_pdf()
-        print(f"✅ PDF generated: {len(pdf_bytes)} bytes")
+        rendered = time.perf_counter() - started
+        REGISTRY.observe('pathfinder_pdf_seconds', rendered, step='render')
         
         # Create filename
         filename = f"Catanduanes_Itinerary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        
-        print(f"📥 Sending PDF: {filename}")
-        print("="*60 + "\n")
+        log.info("PDF generated", route="generate", bytes=len(pdf_bytes), render_ms=round(rendered * 1000, 1), filename=filename)
         
         # Return PDF as download
         return StreamingResponse(
@@ -333,14 +326,7 @@ async def generate_itinerary_pdf(
         )
     
     except Exception as e:
-        print("\n" + "="*60)
-        print("❌ ERROR IN AUTHENTICATED PDF GENERATION")
-        print("="*60)
-        print(f"Error Type: {type(e).__name__}")
-        print(f"Error Message: {str(e)}")
-        print("\nFull Traceback:")
-        print(traceback.format_exc())
-        print("="*60 + "\n")
+        log.exception("Authenticated PDF generation failed", error=f"{type(e).__name__}: {e}")
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -405,23 +391,29 @@ async def debug_template():
 @router.post("/generate-public")
 async def generate_pdf_qr_public(data: ItineraryPDFRequest):
     try:
-        print("\n" + "="*60)
-        print("🚀 Starting PDF + Firebase + QR generation...")
-        print("="*60)
-        
         firebase_admin, credentials, storage = _initialize_firebase()  # Get Firebase modules
         
-        print(f"[DEBUG] Firebase modules returned: firebase_admin={firebase_admin is not None}, credentials={credentials is not None}, storage={storage is not None}")
+        log.debug("Firebase modules", firebase_admin=firebase_admin is not None, storage=storage is not None)
         
         # 1. Generate HTML using YOUR existing function
+        started = time.perf_counter()
         html_content = generate_html_from_template(data)
+        REGISTRY.observe('pathfinder_pdf_seconds', time.perf_counter() - started, step='template')
+        started = time.perf_counter()
         html = HTML(string=html_content)
         pdf_bytes = html.write_pdf()
-        print(f"✅ PDF generated: {len(pdf_bytes)} bytes")
+        rendered = time.perf_counter() - started
+        REGISTRY.observe('pathfinder_pdf_seconds', rendered, step='render')
+        log.info("PDF generated", route="generate-public", bytes=len(pdf_bytes), render_ms=round(rendered * 1000, 1))
         
-        # 2. Upload to Firebase Storage
-        if storage is None:
-            print("⚠️ Firebase not initialized, returning PDF without upload")
+        # 2. Upload to Firebase Storage (skipped outright while offline).
+        # The first get_monitor() call runs a blocking probe: keep it off the event loop
+        online = (await asyncio.to_thread(get_monitor)).online
+        if storage is None or not online:
+            if storage is None:
+                log.warning("Firebase not initialized, returning PDF without upload")
+            else:
+                log.info("Offline, returning PDF without upload")
             # Return base64 encoded PDF instead
             pdf_base64 = base64.b64encode(pdf_bytes).decode()
             
@@ -436,33 +428,34 @@ async def generate_pdf_qr_public(data: ItineraryPDFRequest):
                 "pdfUrl": f"data:application/pdf;base64,{pdf_base64}",
                 "qrCodeBase64": f"data:image/png;base64,{qr_base64}",
                 "filename": "itinerary.pdf",
-                "message": "PDF generated but Firebase not available. Download directly."
+                "message": (
+                    "PDF generated but Firebase not available. Download directly." if storage is None
+                    else "PDF generated offline. Download directly."
+                )
             }
         
         # Firebase is initialized - proceed with upload
-        print("[DEBUG] Firebase is initialized, attempting upload...")
         try:
             bucket = storage.bucket()
-            print(f"[DEBUG] Bucket: {bucket.name}")
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"itineraries/catanduanes_{timestamp}.pdf"
             blob = bucket.blob(filename)
             
-            print(f"[DEBUG] Uploading {len(pdf_bytes)} bytes to {filename}...")
+            started = time.perf_counter()
             blob.upload_from_string(pdf_bytes, content_type='application/pdf')
-            print(f"[DEBUG] Upload complete, making public...")
             blob.make_public()
+            uploaded = time.perf_counter() - started
+            REGISTRY.observe('pathfinder_pdf_seconds', uploaded, step='upload')
             
             pdf_url = blob.public_url
-            print(f"✅ PDF uploaded to Firebase: {pdf_url}")
+            log.info("PDF uploaded to Firebase", bucket=bucket.name, url=pdf_url, upload_ms=round(uploaded * 1000, 1))
             
             # 3. Generate QR code with segno (NO Pillow!)
             qr = segno.make(pdf_url)
             img_buffer = BytesIO()
             qr.save(img_buffer, scale=10, kind='png')
             qr_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-            print("✅ QR code generated successfully!")
             
             return {
                 "success": True,
@@ -471,12 +464,8 @@ async def generate_pdf_qr_public(data: ItineraryPDFRequest):
                 "filename": filename
             }
         except Exception as firebase_error:
-            print(f"❌ Firebase upload error: {type(firebase_error).__name__}: {firebase_error}")
-            import traceback
-            traceback.print_exc()
-            
             # Fallback to base64 if Firebase upload fails
-            print("⚠️ Firebase upload failed, falling back to base64 PDF...")
+            log.exception("Firebase upload failed, falling back to base64 PDF", error=f"{type(firebase_error).__name__}: {firebase_error}")
             pdf_base64 = base64.b64encode(pdf_bytes).decode()
             qr = segno.make("Itinerary PDF - Save locally")
             img_buffer = BytesIO()
@@ -492,7 +481,5 @@ async def generate_pdf_qr_public(data: ItineraryPDFRequest):
             }
         
     except Exception as e:
-        print(f"❌ Error generating PDF+QR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("PDF+QR generation failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"PDF+QR failed: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,184 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from logger import get_logger
+
+log = get_logger("shared")
+
+
+# ============================================================================
+# SHARED STATE (CROSS-WORKER)
+# ============================================================================
+class SharedState:
+    """State every uvicorn worker process must agree on, in one SQLite (WAL) file
+
+    Holds the per-client rate-limit buckets, the exact-match answer cache
+    and cache hit counters. WAL lets readers in every process run alongside
+    the single writer; read-modify-write steps (spending a token) run in
+    BEGIN IMMEDIATE transactions so two workers never both spend the last
+    token. Enhancer jobs live in the JobStore, which is shared the same way.
+    """
+    def __init__(self, db_path, exact_max_entries=5000, prune_interval=60):
+        self.db_path = str(db_path)
+        self.exact_max_entries = exact_max_entries
+        self.prune_interval = prune_interval
+        self.lock = threading.Lock()
+        self._last_prune = 0
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                client_id TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_rate_buckets_updated ON rate_buckets (updated_at);
+
+            CREATE TABLE IF NOT EXISTS exact_cache (
+                cache_key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                places TEXT NOT NULL,
+                version TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_exact_cache_updated ON exact_cache (updated_at);
+
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        log.info("Shared state ready", path=self.db_path)
+
+    # ------------------------------------------------------------------------
+    # Rate limiting
+    # ------------------------------------------------------------------------
+    def take_token(self, client_id, capacity, refill_per_second, idle_ttl, max_clients):
+        """Spend one token from client_id's bucket; returns (allowed, retry_after)"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE client_id = ?", (client_id,)
+                ).fetchone()
+                if row is None:
+                    tokens = capacity
+                else:
+                    tokens = min(capacity, row['tokens'] + (now - row['updated_at']) * refill_per_second)
+
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.conn.execute("""
+                    INSERT INTO rate_buckets (client_id, tokens, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(client_id) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+                """, (client_id, tokens, now))
+
+                if now - self._last_prune >= self.prune_interval:
+                    self._last_prune = now
+                    self._prune_buckets(now, idle_ttl, max_clients)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        if allowed:
+            return True, 0
+        return False, math.ceil((1 - tokens) / refill_per_second)
+
+    def _prune_buckets(self, now, idle_ttl, max_clients):
+        # Idle buckets have refilled completely, so forgetting them is lossless
+        self.conn.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - idle_ttl,))
+        self.conn.execute("""
+            DELETE FROM rate_buckets WHERE client_id IN (
+                SELECT client_id FROM rate_buckets ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (max_clients,))
+
+    def bucket_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+    # ------------------------------------------------------------------------
+    # Exact-match cache tier
+    # ------------------------------------------------------------------------
+    def exact_get(self, cache_key):
+        """(answer, places, version) stored under exactly this key, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT answer, places, version FROM exact_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return (row['answer'], json.loads(row['places']), row['version'])
+
+    def exact_set(self, cache_key, answer, places, version="raw"):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO exact_cache (cache_key, answer, places, version, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    answer = excluded.answer, places = excluded.places,
+                    version = excluded.version, updated_at = excluded.updated_at
+            """, (cache_key, answer, json.dumps(places), version, now))
+            if now - self._last_prune >= self.prune_interval:
+                self._last_prune = now
+                self.conn.execute("""
+                    DELETE FROM exact_cache WHERE cache_key IN (
+                        SELECT cache_key FROM exact_cache ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.exact_max_entries,))
+
+    def exact_update(self, cache_key, answer, version="enhanced"):
+        """Replace the answer for an existing key, keeping its places; returns whether it existed"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE exact_cache SET answer = ?, version = ?, updated_at = ? WHERE cache_key = ?",
+                (answer, version, time.time(), cache_key)
+            )
+        return cursor.rowcount == 1
+
+    def exact_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM exact_cache").fetchone()[0]
+
+    # ------------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------------
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO counters (name, value) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+            """, (name, amount))
+
+    def incr_many(self, amounts):
+        """Add {name: amount} to several counters in one transaction"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("""
+                    INSERT INTO counters (name, value) VALUES (?, ?)
+                    ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+                """, list(amounts.items()))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def counters(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT name, value FROM counters").fetchall()
+        return {row['name']: row['value'] for row in rows}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
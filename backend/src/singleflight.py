@@ -0,0 +1,48 @@
+import asyncio
+
+
+# ============================================================================
+# SINGLEFLIGHT (REQUEST COALESCING)
+# ============================================================================
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and get the same result (or
+    exception). The task is shielded, so a leader whose client disconnects
+    does not cancel the work the followers are waiting on. Only calls that
+    overlap in time are merged; nothing is cached once the task finishes.
+    Runs on one event loop and is not thread-safe.
+    """
+    def __init__(self):
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs), sharing it with any identical call in flight"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        total = self.executed + self.coalesced
+        return {
+            'in_flight': len(self._calls),
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'coalesce_ratio': round(self.coalesced / total, 3) if total else 0.0
+        }
@@ -0,0 +1,173 @@
+"""
+Train the intent + topic classifier used by Controller.analyze_query.
+
+    python train_intent.py [--epochs 300] [--holdout 0.2]
+
+Training examples come from the dataset questions (tourism_query, topic from
+the config keywords), the config and lexicon keywords themselves, synthetic
+greetings, greetings followed by a question, and synthetic nonsense. Every
+example is embedded with the configured model and a softmax regression is
+fitted per head on the unit-normalized embeddings; the topic head only
+learns from tourism queries. Writes backend/models/<intent_classifier.model_file>.
+Retrain whenever the embedding model, the dataset or the keywords change.
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from controller import Controller
+from inference import MODELS_DIR, LocalEncoder
+from intent_classifier import IntentClassifier
+from lexicon import merge_keywords, merge_words
+
+BASE_DIR = Path(__file__).parent
+CONFIG = BASE_DIR / "config" / "config.yaml"
+DATASET = BASE_DIR / "dataset" / "dataset.json"
+
+INTENTS = ['tourism_query', 'greeting', 'nonsense']
+GENERAL_TOPIC = 'general'
+
+GREETING_TEMPLATES = ["{}", "{}!", "{} po", "{} there", "{}, how are you?", "{} po!", "oh {}"]
+GREETED_QUESTIONS = [
+    "{}! where can I surf?", "{}, what food should I try?", "{} po, saan pwede mag-swimming?",
+    "{}! how do I get to Virac?", "{}, any hotels near the beach?", "{} po, magkano ang pamasahe?",
+]
+KEYBOARD_ROWS = ['qwertyuiop', 'asdfghjkl', 'zxcvbnm']
+CONSONANTS = 'bcdfghjklmnpqrstvwxyz'
+
+
+def load_config():
+    with open(CONFIG, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def topic_of(text, keywords):
+    """First config topic with a keyword in text, else the general topic"""
+    lowered = text.lower()
+    for topic, words in keywords.items():
+        if any(word in lowered for word in words):
+            return topic
+    return GENERAL_TOPIC
+
+
+def nonsense(rng, count):
+    samples = []
+    for _ in range(count):
+        kind = rng.randrange(3)
+        if kind == 0:
+            row = rng.choice(KEYBOARD_ROWS)
+            start = rng.randrange(len(row) - 3)
+            word = row[start:start + rng.randint(4, len(row) - start)]
+        elif kind == 1:
+            word = ''.join(rng.choice(CONSONANTS) for _ in range(rng.randint(4, 9)))
+        else:
+            word = rng.choice(string.ascii_lowercase) * rng.randint(4, 8)
+        if rng.random() < 0.4:
+            word += ' ' + ''.join(rng.choice(CONSONANTS) for _ in range(rng.randint(3, 6)))
+        samples.append(word)
+    return samples
+
+
+def build_examples(config, seed=13):
+    """(text, intent, topic) triples; topic is None outside tourism_query"""
+    rng = random.Random(seed)
+    lexicon = config.get('lexicon', {})
+    keywords = merge_keywords(config['keywords'], lexicon)
+
+    examples = []
+    with open(DATASET, 'r', encoding='utf-8') as f:
+        for item in json.load(f):
+            if item.get('input'):
+                examples.append((item['input'], 'tourism_query', topic_of(item['input'], keywords)))
+    for topic, words in keywords.items():
+        for word in words:
+            examples.append((word, 'tourism_query', topic))
+
+    # The controller's own greeting list, so classifier and rules agree on what a greeting is
+    greetings = merge_words(Controller.GREETINGS, lexicon.get('greetings'))
+    for greeting in greetings:
+        for template in GREETING_TEMPLATES:
+            examples.append((template.format(greeting).capitalize(), 'greeting', None))
+        for template in rng.sample(GREETED_QUESTIONS, 2):
+            text = template.format(greeting).capitalize()
+            examples.append((text, 'tourism_query', topic_of(text, keywords)))
+
+    count = sum(1 for _, intent, _ in examples if intent == 'greeting')
+    examples.extend((text, 'nonsense', None) for text in nonsense(rng, count))
+    rng.shuffle(examples)
+    return examples, sorted(keywords) + [GENERAL_TOPIC]
+
+
+def fit_head(features, labels, classes, epochs, learning_rate=0.5, l2=1e-4):
+    """Class-balanced softmax regression by full-batch gradient descent"""
+    count, dim = features.shape
+    weights = np.zeros((classes, dim), dtype=np.float32)
+    bias = np.zeros(classes, dtype=np.float32)
+    onehot = np.eye(classes, dtype=np.float32)[labels]
+    frequency = np.bincount(labels, minlength=classes).astype(np.float32)
+    sample_weight = (count / (classes * np.maximum(frequency, 1)))[labels][:, None]
+
+    for _ in range(epochs):
+        scores = features @ weights.T + bias
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=1, keepdims=True)
+        error = (probs - onehot) * sample_weight / count
+        weights -= learning_rate * (error.T @ features + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+    return weights, bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the embedding intent classifier")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction kept back to report accuracy")
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    config = load_config()
+    examples, topics = build_examples(config, args.seed)
+    encoder = LocalEncoder.from_config(config)
+    features = Controller._unit(encoder.encode([text for text, _, _ in examples]))
+    intent_labels = np.array([INTENTS.index(intent) for _, intent, _ in examples])
+    topic_labels = np.array([topics.index(topic) if topic else -1 for _, _, topic in examples])
+
+    split = int(len(examples) * (1 - args.holdout))
+    train, test = slice(0, split), slice(split, None)
+
+    def fit(rows):
+        intent_w, intent_b = fit_head(features[rows], intent_labels[rows], len(INTENTS), args.epochs)
+        has_topic = topic_labels[rows] >= 0
+        topic_w, topic_b = fit_head(
+            features[rows][has_topic], topic_labels[rows][has_topic], len(topics), args.epochs
+        )
+        return IntentClassifier(
+            np.vstack([intent_w, topic_w]), np.concatenate([intent_b, topic_b]), INTENTS, topics,
+            min_confidence=config.get('intent_classifier', {}).get('min_confidence', 0.75)
+        )
+
+    if args.holdout > 0:
+        classifier = fit(train)
+        predictions = [classifier.predict(vector) for vector in features[test]]
+        intent_hits = sum(p[0] == INTENTS[label] for p, label in zip(predictions, intent_labels[test]))
+        topic_pairs = [(p[2], label) for p, label in zip(predictions, topic_labels[test]) if label >= 0]
+        confident = sum(p[1] >= classifier.min_confidence for p in predictions)
+        print(f"held out {len(predictions)}: intent {intent_hits / len(predictions):.3f}, "
+              f"topic {sum(t == topics[l] for t, l in topic_pairs) / max(1, len(topic_pairs)):.3f}, "
+              f"confident {confident / len(predictions):.3f}")
+
+    classifier = fit(slice(None))
+    path = os.path.join(MODELS_DIR, config.get('intent_classifier', {}).get('model_file', 'intent_classifier.npz'))
+    classifier.save(path)
+    print(f"{len(examples)} examples, {len(INTENTS)} intents, {len(topics)} topics -> {path}")
+
+
+if __name__ == "__main__":
+    main()
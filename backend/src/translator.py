@@ -0,0 +1,245 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from logger import get_logger
+
+log = get_logger("translate")
+
+# Function words that only occur in English queries. Words shared with
+# Tagalog/Bikol spellings ('at', 'an', 'may', 'no') are left out of both lists.
+ENGLISH_WORDS = {
+    'the', 'is', 'are', 'was', 'were', 'be', 'what', 'where', 'when', 'which', 'who',
+    'why', 'how', 'can', 'could', 'would', 'should', 'will', 'do', 'does', 'did',
+    'i', 'me', 'my', 'we', 'our', 'you', 'your', 'they', 'there', 'here', 'this',
+    'that', 'these', 'those', 'a', 'of', 'to', 'in', 'on', 'for', 'with', 'from',
+    'and', 'or', 'near', 'best', 'some', 'any', 'good', 'nice', 'around', 'about',
+    'tell', 'show', 'find', 'want', 'like', 'go', 'visit', 'see', 'try', 'recommend',
+    'please', 'it', 'its', 'have', 'has', 'get', 'much', 'many', 'place', 'places',
+    'spot', 'spots', 'top', 'list', 'all'
+}
+
+# Tagalog and Bikol (Catandunganon/Central Bikol) function and question words
+NATIVE_WORDS = {
+    # Tagalog
+    'ang', 'ng', 'mga', 'sa', 'na', 'ay', 'ano', 'saan', 'paano', 'kailan', 'sino',
+    'bakit', 'alin', 'po', 'ba', 'ko', 'ako', 'mo', 'ikaw', 'kami', 'tayo', 'sila',
+    'yung', 'iyong', 'ito', 'iyan', 'doon', 'dito', 'meron', 'mayroon', 'wala',
+    'gusto', 'pwede', 'puwede', 'hindi', 'di', 'lang', 'naman', 'din', 'rin', 'pa',
+    'nga', 'kasi', 'para', 'kung', 'pero', 'magandang', 'maganda', 'masarap',
+    'kumusta', 'kamusta', 'musta', 'salamat', 'nasaan', 'pupunta', 'punta',
+    # Bikol
+    'kan', 'si', 'sin', 'hain', 'sain', 'saen', 'digdi', 'duman', 'igwa',
+    'mayo', 'tabi', 'dae', 'daw', 'baga', 'tano', 'pano', 'arin', 'sisay', 'iyo',
+    'kita', 'magayon', 'masiram', 'baybayon', 'dagat', 'harong'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-zñ']+")
+MARKER_PATTERN = re.compile(r"__PLACE_\d+__")
+
+
+def detect_language(text):
+    """'en', 'native' (Tagalog/Bikol) or 'unknown', from function words alone
+
+    Cheap enough to run on every query. Only answers 'en' when there is
+    English evidence and no native evidence, so mixed (Taglish) queries
+    still go to the translator.
+    """
+    text = MARKER_PATTERN.sub(' ', text).lower()
+    if any(ch.isalpha() and not ch.isascii() and ch != 'ñ' for ch in text):
+        return 'unknown'
+
+    tokens = TOKEN_PATTERN.findall(text)
+    english = sum(1 for token in tokens if token in ENGLISH_WORDS)
+    native = sum(1 for token in tokens if token in NATIVE_WORDS)
+    if native:
+        return 'native'
+    if english:
+        return 'en'
+    return 'unknown'
+
+
+# ============================================================================
+# PERSISTENT TRANSLATION CACHE
+# ============================================================================
+class TranslationCache:
+    """SQLite (WAL) backed LRU of source text -> English translation
+
+    Keys are the place-protected text, so a question about any place with
+    the same wording shares one entry. Shared by every worker process.
+    A hit only rewrites last_used once it is touch_interval seconds old, so
+    a popular entry costs one write per interval instead of one per read;
+    eviction order only needs to be that coarse.
+    """
+    def __init__(self, db_path, max_entries=5000, prune_every=100, touch_interval=300):
+        self.db_path = str(db_path)
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.touch_interval = touch_interval
+        self.lock = threading.Lock()
+        self._writes = 0
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                source TEXT PRIMARY KEY,
+                target TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+
+    def get(self, source):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT target, last_used FROM translations WHERE source = ?", (source,)
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                if now - row[1] >= self.touch_interval:
+                    self.conn.execute("UPDATE translations SET last_used = ? WHERE source = ?", (now, source))
+        return row[0] if row else None
+
+    def put(self, source, target):
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO translations (source, target, last_used) VALUES (?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET target = excluded.target, last_used = excluded.last_used
+            """, (source, target, time.time()))
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                # Evict least recently used entries beyond the cap
+                self.conn.execute("""
+                    DELETE FROM translations WHERE source IN (
+                        SELECT source FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+
+# ============================================================================
+# TRANSLATOR
+# ============================================================================
+class Translator:
+    """Translate-to-English with a local fast path and a hard deadline
+
+    English queries skip the network entirely; everything else is looked up
+    in the persistent cache before calling Google Translate. The remote call
+    runs on a small thread pool and is abandoned after `timeout` seconds,
+    falling back to the untranslated text. An abandoned call that finishes
+    later still fills the cache for the next asker.
+
+    deep-translator sets no socket timeout, so an abandoned call can hold
+    its thread for as long as the connection hangs. While every thread is
+    taken, new queries use the original text at once instead of queueing
+    behind the hung calls.
+    """
+    def __init__(self, cache=None, timeout=1.5, workers=2):
+        self.cache = cache
+        self.timeout = timeout
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+        self.lock = threading.Lock()
+        self._running = 0
+        self.counters = {
+            'skipped_english': 0, 'cache_hits': 0, 'translated': 0,
+            'timeouts': 0, 'errors': 0, 'offline': 0, 'busy': 0
+        }
+
+    @classmethod
+    def from_config(cls, config, db_path):
+        translation_conf = config.get('translation', {})
+        cache = TranslationCache(
+            os.path.join(db_path, translation_conf.get('cache_file', 'translations.db')),
+            max_entries=translation_conf.get('cache_size', 5000),
+            touch_interval=translation_conf.get('touch_interval', 300)
+        )
+        return cls(
+            cache=cache,
+            timeout=translation_conf.get('timeout', 1.5),
+            workers=translation_conf.get('workers', 2)
+        )
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def translate(self, text, online=True, timeout=None):
+        """English version of text, or text itself when it cannot be had in time
+
+        timeout, if given, shortens the configured wait (a request's remaining budget).
+        """
+        key = ' '.join(text.split())
+        # Nothing but place names, or plain English: no network needed
+        if not MARKER_PATTERN.sub('', key).strip() or detect_language(key) == 'en':
+            self._count('skipped_english')
+            return text
+
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count('cache_hits')
+                return cached
+
+        if not online:
+            self._count('offline')
+            return text
+
+        with self.lock:
+            if self._running >= self.workers:
+                self.counters['busy'] += 1
+                busy = True
+            else:
+                self._running += 1
+                busy = False
+        if busy:
+            log.warning("Translation workers busy, using original text", workers=self.workers)
+            return text
+
+        wait = self.timeout if timeout is None else min(self.timeout, timeout)
+        future = self._executor.submit(self._remote, key)
+        future.add_done_callback(lambda done: self._store(key, done))
+        try:
+            translated = future.result(timeout=wait)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            log.warning("Translation timed out, using original text", timeout=wait)
+            return text
+        except Exception as e:
+            self._count('errors')
+            log.error("Translation failed", error=str(e))
+            return text
+
+        self._count('translated')
+        return translated or text
+
+    def _remote(self, text):
+        from deep_translator import GoogleTranslator
+        return GoogleTranslator(source='auto', target='en').translate(text)
+
+    def _store(self, key, future):
+        with self.lock:
+            self._running -= 1
+        if self.cache is None or future.cancelled() or future.exception() is not None:
+            return
+        if future.result():
+            try:
+                self.cache.put(key, future.result())
+            except sqlite3.Error as e:
+                log.error("Translation cache write failed", error=str(e))
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        if self.cache is not None:
+            counters['cache_entries'] = self.cache.count()
+        return counters
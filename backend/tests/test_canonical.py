@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+
+from canonical import QueryCanonicalizer
+
+
+def canonicalizer():
+    return QueryCanonicalizer(
+        places=['Puraran Beach', 'Binurong Point'],
+        keywords={'activities': ['surf', 'surfing'], 'accommodation': ['hotel', 'stay']},
+        other_places=['Virac', 'Baras']
+    )
+
+
+class CanonicalKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.key = canonicalizer().canonicalize
+
+    def assertSameKey(self, first, second):
+        self.assertEqual(self.key(first), self.key(second))
+
+    def assertDifferentKey(self, first, second):
+        self.assertNotEqual(self.key(first), self.key(second))
+
+    def test_rewordings_share_a_key(self):
+        self.assertSameKey("Where can I surf in Puraran?", "where to surf puraran")
+        self.assertSameKey("Where can I surf in Puraran?", "saan pwede mag-surf sa Puraran")
+        self.assertSameKey("What can I do in Puraran?", "What is there to do in Puraran")
+
+    def test_activity_verbs_stay_in_the_key(self):
+        self.assertDifferentKey("What is Puraran?", "What can I do in Puraran?")
+        self.assertDifferentKey("What is Puraran?", "What is there to do in Puraran")
+        self.assertDifferentKey("Where is Virac?", "Where to stay in Virac?")
+
+    def test_auxiliary_do_is_dropped(self):
+        self.assertSameKey("Where do I surf in Puraran?", "Where can I surf in Puraran?")
+
+    def test_direction_needs_a_place_right_after_it(self):
+        self.assertNotIn('to:', self.key("What is there to do in Puraran"))
+        self.assertNotIn('to:', self.key("How do I go to the Puraran Beach"))
+        self.assertIn('to:place:baras', self.key("from Virac to Baras"))
+
+    def test_opposite_routes_differ(self):
+        self.assertDifferentKey("How do I get from Virac to Baras?", "How do I get from Baras to Virac?")
+
+
+if __name__ == "__main__":
+    unittest.main()